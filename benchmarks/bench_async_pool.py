@@ -0,0 +1,95 @@
+"""Latência de comandos simulados: chamadas síncronas no event loop vs. repository assíncrono.
+
+Uso: python benchmarks/bench_async_pool.py [--invocations 500] [--characters 200]
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+
+from common import Timer, report, seed_characters, temporary_database
+
+import database
+import repository
+
+
+# Caminho antigo: uma conexão nova por chamada, executada no próprio event loop
+def legacy_find_character_id(user_id, system, campaign, char_name):
+    conn = sqlite3.connect(database.DB_NAME)
+    result = conn.execute(
+        "SELECT id FROM characters WHERE user_id = ? AND lower(system) = ? AND lower(campaign) = ? AND lower(character_name) = ?",
+        (user_id, system.lower(), campaign.lower(), char_name.lower())).fetchone()
+    conn.close()
+    return result[0] if result else None
+
+
+def legacy_modify_money(char_id, amount):
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.execute("UPDATE characters SET money = money + ? WHERE id = ?", (amount, char_id))
+    conn.commit()
+    conn.close()
+
+
+async def legacy_command(name: str):
+    char_id = legacy_find_character_id(1, "tormenta20", "bench", name)
+    legacy_modify_money(char_id, 1)
+    await asyncio.sleep(0)  # ctx.respond
+
+
+async def pooled_command(name: str):
+    char_id = await repository.find_character_id(1, "tormenta20", "bench", name)
+    await repository.modify_money(char_id, 1)
+    await asyncio.sleep(0)
+
+
+async def drive(command, names, invocations: int):
+    latencies = []
+
+    async def invoke(name):
+        start = time.perf_counter()
+        await command(name)
+        latencies.append(time.perf_counter() - start)
+
+    with Timer() as timer:
+        await asyncio.gather(*(invoke(random.choice(names)) for _ in range(invocations)))
+    return latencies, timer.elapsed
+
+
+async def heartbeat_lag(command, names, invocations: int):
+    # Mede o atraso de um "heartbeat" agendado enquanto os comandos rodam
+    lags = []
+    running = True
+
+    async def beat():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    task = asyncio.create_task(beat())
+    await drive(command, names, invocations)
+    running = False
+    await task
+    return max(lags) if lags else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invocations", type=int, default=500)
+    parser.add_argument("--characters", type=int, default=200)
+    args = parser.parse_args()
+
+    with temporary_database():
+        seed_characters(args.characters)
+        names = [f"personagem {i}" for i in range(args.characters)]
+        for label, command in (("antes (sync no loop)", legacy_command), ("depois (pool assíncrono)", pooled_command)):
+            latencies, elapsed = asyncio.run(drive(command, names, args.invocations))
+            report(label, latencies, elapsed)
+            lag = asyncio.run(heartbeat_lag(command, names, args.invocations))
+            print(f"{'':<28} maior atraso do heartbeat: {lag * 1000:.2f}ms")
+        repository.shutdown()
+
+
+if __name__ == "__main__":
+    main()
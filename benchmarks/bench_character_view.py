@@ -0,0 +1,90 @@
+"""Custo por visualização de ficha/inventário: caminho antigo vs. get_character_view/get_character_page.
+
+Uso: python benchmarks/bench_character_view.py [--views 2000]
+"""
+import argparse
+import random
+import sqlite3
+
+from common import Timer, report, seed_characters, statement_counter, temporary_database
+
+import database
+
+
+# Caminho antigo: find_character_id + get_character_sheet + get_inventory, cada um com conexão própria
+def legacy_view(user_id, system, campaign, name, counts):
+    def open_conn():
+        conn = sqlite3.connect(database.DB_NAME)
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(lambda _sql: counts.__setitem__("statements", counts["statements"] + 1))
+        counts["connections"] += 1
+        return conn
+
+    conn = open_conn()
+    row = conn.execute("SELECT id FROM characters WHERE user_id = ? AND lower(system) = ? AND lower(campaign) = ? "
+                       "AND lower(character_name) = ?", (user_id, system, campaign, name)).fetchone()
+    conn.close()
+    char_id = row[0]
+    conn = open_conn()
+    sheet = dict(conn.execute("SELECT * FROM characters WHERE id = ?", (char_id,)).fetchone())
+    sheet["attributes"] = {r["name"]: r["value"] for r in
+                           conn.execute("SELECT name, value FROM attributes WHERE character_id = ?", (char_id,))}
+    conn.close()
+    conn = open_conn()
+    sheet["inventory"] = [dict(r) for r in conn.execute(
+        "SELECT item_name, quantity, description FROM inventory WHERE character_id = ? ORDER BY item_name", (char_id,))]
+    conn.close()
+    return sheet
+
+
+def pooled_view(user_id, system, campaign, name, counts):
+    char_id = database.find_character_id(user_id, system, campaign, name)
+    sheet = database.get_character_sheet(char_id)
+    sheet["inventory"] = database.get_inventory(char_id)
+    sheet["effects"] = database.get_effects(char_id)
+    return sheet
+
+
+def composite_view(user_id, system, campaign, name, counts):
+    return database.get_character_view(user_id, system, campaign, name)
+
+
+# O caminho de /inventario ver: o id e depois ficha, efeitos e a primeira página do inventário numa consulta
+def page_view(user_id, system, campaign, name, counts):
+    return database.get_character_page(database.find_character_id(user_id, system, campaign, name), 10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--views", type=int, default=2000)
+    parser.add_argument("--characters", type=int, default=500)
+    args = parser.parse_args()
+
+    with temporary_database():
+        char_ids = seed_characters(args.characters)
+        for char_id in char_ids:
+            for item in range(8): database.add_item(char_id, f"item {item}", 1, "descrição")
+            database.apply_effect(char_id, "Envenenado", 3, 1)
+        names = [f"personagem {random.randrange(args.characters)}" for _ in range(args.views)]
+
+        for label, view, cached in (("antigo (3 conexões)", legacy_view, False),
+                                    ("funções separadas", pooled_view, False),
+                                    ("get_character_view", composite_view, False),
+                                    ("get_character_view (cache)", composite_view, True),
+                                    ("get_character_page", page_view, False),
+                                    ("get_character_page (cache)", page_view, True)):
+            with statement_counter() as counts:
+                latencies = []
+                with Timer() as total:
+                    for name in names:
+                        if not cached: database.clear_caches()
+                        with Timer() as timer:
+                            view(1, "tormenta20", "bench", name, counts)
+                        latencies.append(timer.elapsed)
+            report(label, latencies, total.elapsed)
+            print(f"{'':<28} statements/view={counts['statements'] / len(names):.2f} "
+                  f"conexões abertas={counts['connections']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Vazão do rolador: list comprehension com random.randint (antigo) vs. dice.roll_many.
+
+Uso: python benchmarks/bench_dice.py
+"""
+import random
+import re
+
+from common import Timer
+
+import dice
+
+
+def legacy_roll(notacao: str) -> int:
+    pattern = re.compile(r"(\d+)?d(\d+)([+-]\d+)?")
+    match = pattern.fullmatch(notacao.lower().strip())
+    num_dados_str, num_faces_str, mod_str = match.groups()
+    num_dados = int(num_dados_str) if num_dados_str else 1
+    rolagens = [random.randint(1, int(num_faces_str)) for _ in range(num_dados)]
+    return sum(rolagens) + (int(mod_str) if mod_str else 0)
+
+
+def main():
+    backend = "NumPy" if dice._get_numpy() else "Python puro"
+    print(f"backend: {backend}")
+    for notation, repeats in (("1d20+5", 50_000), ("8d6", 20_000), ("100d6", 2_000), ("10000d6", 50)):
+        results = {}
+        for label, roller in (("antigo", legacy_roll), ("dice.roll", dice.roll)):
+            with Timer() as timer:
+                for _ in range(repeats): roller(notation)
+            results[label] = timer.elapsed
+        dice_per_call = dice.parse(notation)[0].count
+        old, new = results["antigo"], results["dice.roll"]
+        print(f"{notation:<10} antigo={repeats * dice_per_call / old / 1e6:7.2f}M dados/s "
+              f"novo={repeats * dice_per_call / new / 1e6:7.2f}M dados/s ({old / new:.1f}x)")
+    with Timer() as timer:
+        dice.distribution("10d20kh3 + 4d6! + 100d6")
+    print(f"distribuição exata de 10d20kh3 + 4d6! + 100d6: {timer.elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
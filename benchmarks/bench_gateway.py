@@ -0,0 +1,265 @@
+"""Carga mista nos comandos do RPGCog, disparados por um gateway falso (fake_gateway.py).
+
+Milhares de jogadores espalhados por servidores (cada servidor com um mestre, um sistema e uma campanha) mandam
+comandos ao mesmo tempo, como o gateway faria: ver ficha e inventário, itens, dinheiro, dano e cura, efeitos,
+rodadas de iniciativa, rolagens e criação de fichas pelo formulário e pelo chat. Cada jogador manda um comando por
+vez. Mede vazão, latência por comando, comandos SQL (no total e por função de database.py) e o atraso do event
+loop, e confere que toda interação foi respondida.
+
+Com --max-p99 (ms) ou --max-statements (média de comandos SQL por comando de barra) sai com erro se o limite for
+ultrapassado, para pegar regressões em database.py ou no cog.
+
+Uso: python benchmarks/bench_gateway.py [--users 2000] [--guilds 50] [--commands 20000] [--concurrency 64]
+                                        [--write-behind] [--shards 1] [--seed 7]
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from typing import Dict, List
+
+from common import Timer, percentile, report, temporary_database
+from fake_gateway import (FakeChannel, FakeContext, FakeGuild, FakeInteraction, FakeMember, FakeMessage, invoke,
+                          load_cog, submit_modal)
+
+import database
+import metrics
+import repository
+import systems
+from cogs.rpg_commands import RPGCog
+
+ITEMS = ("Poção de Cura", "Flecha", "Corda", "Tocha", "Ração de Viagem", "Adaga")
+NOTATIONS = ("1d20", "2d6+3", "4d6kh3", "d20adv", "3d6!", "1d100")
+MAX_COMBATANTS = 12  # o mestre zera a iniciativa quando a mesa passa disso
+# (comando, peso): a proporção de cada comando na carga
+MIX = (("ficha ver", 22), ("inventario ver", 14), ("inventario adicionar", 9), ("inventario remover", 5),
+       ("ficha dano", 7), ("ficha curar", 7), ("dinheiro adicionar", 4), ("efeito aplicar", 3), ("rolar", 15),
+       ("iniciativa adicionar", 5), ("iniciativa proximo", 4), ("iniciativa ver", 3), ("ficha criar", 2),
+       ("campanha grupo", 1))
+
+
+def answers(schema: systems.SystemSchema, name: str) -> Dict[str, str]:
+    # Um valor válido para cada campo perguntado na criação, pelo nome em minúsculas
+    values = {}
+    for attribute in schema.attributes:
+        if attribute.derived: continue
+        if attribute.numeric: values[attribute.key] = str(int(database.clamp(10, attribute.minimum, attribute.maximum)))
+        else: values[attribute.key] = name if attribute.key == "nome" else "bench"
+    return values
+
+
+class Simulation:
+    def __init__(self, cog: RPGCog, users: int, guilds: int, rng: random.Random):
+        self.cog = cog
+        self.rng = rng
+        schemas = [systems.registry.get(name) for name in systems.registry.names()]
+        self.guilds = [FakeGuild(number) for number in range(1, guilds + 1)]
+        self.channels = {guild.id: FakeChannel(10_000 + guild.id, guild) for guild in self.guilds}
+        self.schemas = {guild.id: schemas[guild.id % len(schemas)] for guild in self.guilds}
+        self.campaigns = {guild.id: f"campanha {guild.id}" for guild in self.guilds}
+        # Os primeiros jogadores de cada servidor são os mestres
+        self.members = [FakeMember(user_id, self.guilds[(user_id - 1) % guilds], master=user_id <= guilds)
+                        for user_id in range(1, users + 1)]
+        self.masters = {member.guild.id: member for member in self.members[:guilds]}
+        self.combatants = {guild.id: 0 for guild in self.guilds}
+        self.items: Dict[int, Dict[str, int]] = {member.id: {} for member in self.members}
+        self.names = itertools.count()
+        self.locks: Dict[int, asyncio.Lock] = {}
+        self.samples: Dict[str, List[float]] = {label: [] for label, _ in MIX}
+        self.rejected: Dict[str, int] = {label: 0 for label, _ in MIX}
+        self.unanswered = 0
+        self.errors: List[str] = []
+
+    def seed(self):
+        for member in self.members:
+            schema = self.schemas[member.guild.id]
+            database.create_character_sheet(member.id, schema.key, self.campaigns[member.guild.id],
+                                            self.character(member), answers(schema, self.character(member)))
+
+    @staticmethod
+    def character(member: FakeMember) -> str:
+        return f"personagem {member.id}"
+
+    def sheet(self, member: FakeMember) -> dict:
+        # Opções que apontam para a ficha do jogador
+        return {"sistema": self.schemas[member.guild.id].key, "campanha": self.campaigns[member.guild.id],
+                "personagem": self.character(member)}
+
+    def context(self, member: FakeMember) -> FakeContext:
+        return FakeContext(FakeInteraction(member, self.channels[member.guild.id]))
+
+    def numeric_attribute(self, member: FakeMember) -> str:
+        schema = self.schemas[member.guild.id]
+        return next(attribute.name for attribute in schema.attributes if attribute.numeric and not attribute.derived)
+
+    async def command(self, label: str, member: FakeMember) -> List[FakeInteraction]:
+        cog, rng, guild_id = self.cog, self.rng, member.guild.id
+        ctx, master = self.context(member), self.context(self.masters[guild_id])
+        sheet = self.sheet(member)
+        if label == "ficha ver":
+            await invoke(cog, cog.ver, ctx, system=sheet["sistema"], campaign=sheet["campanha"],
+                         name=sheet["personagem"])
+        elif label == "inventario ver":
+            await invoke(cog, cog.inv_view, ctx, **sheet)
+        elif label == "inventario adicionar":
+            item, quantity = rng.choice(ITEMS), rng.randint(1, 3)
+            await invoke(cog, cog.inv_add, master, jogador=member, item=item, quantidade=quantity, **sheet)
+            self.items[member.id][item] = self.items[member.id].get(item, 0) + quantity
+            ctx = master
+        elif label == "inventario remover":
+            # O jogador remove algo que tem; com o inventário vazio, tenta um item qualquer e é recusado
+            owned = [item for item, quantity in self.items[member.id].items() if quantity]
+            item = rng.choice(owned or ITEMS)
+            await invoke(cog, cog.inv_remove, ctx, item=item, **sheet)
+            if owned: self.items[member.id][item] -= 1
+        elif label in ("ficha dano", "ficha curar"):
+            command = cog.dano if label == "ficha dano" else cog.curar
+            await invoke(cog, command, ctx, valor=rng.randint(1, 6), atributo=self.numeric_attribute(member), **sheet)
+        elif label == "dinheiro adicionar":
+            await invoke(cog, cog.money_add, master, jogador=member, quantidade=rng.choice((5, 10, 25.5)), **sheet)
+            ctx = master
+        elif label == "efeito aplicar":
+            await invoke(cog, cog.effect_apply, master, jogador=member, efeito="Envenenado",
+                         duracao=rng.randint(1, 3), **sheet)
+            ctx = master
+        elif label == "rolar":
+            await invoke(cog, cog.rolar, ctx, notacao=rng.choice(NOTATIONS))
+        elif label == "iniciativa adicionar":
+            interactions = []
+            if self.combatants[guild_id] >= MAX_COMBATANTS:
+                await invoke(cog, cog.iniciativa_clear, master)
+                self.combatants[guild_id] = 0
+                interactions.append(master.interaction)
+            self.combatants[guild_id] += 1
+            await invoke(cog, cog.iniciativa_add, ctx, nome=sheet["personagem"], valor=rng.randint(1, 20), **sheet)
+            return interactions + [ctx.interaction]
+        elif label == "iniciativa proximo":
+            await invoke(cog, cog.iniciativa_next, master)
+            ctx = master
+        elif label == "iniciativa ver":
+            await invoke(cog, cog.iniciativa_ver, ctx)
+        elif label == "ficha criar":
+            return await self.create(ctx)
+        elif label == "campanha grupo":
+            await invoke(cog, cog.campaign_roster, master, sistema=sheet["sistema"], campanha=sheet["campanha"])
+            ctx = master
+        return [ctx.interaction]
+
+    async def create(self, ctx: FakeContext) -> List[FakeInteraction]:
+        # Primeira parte pelo formulário, o resto respondido no chat
+        member, channel = ctx.author, ctx.channel
+        schema, name = self.schemas[member.guild.id], f"nova {next(self.names)}"
+        await invoke(self.cog, self.cog.criar, ctx, system=schema.name, campaign=self.campaigns[member.guild.id])
+        if ctx.sent[0].kind != "modal": return [ctx.interaction]
+        values = answers(schema, name)
+        modal_interaction = FakeInteraction(member, channel)
+        await submit_modal(ctx.sent[0].kwargs["modal"], modal_interaction,
+                           {item.label: values[item.label.lower()] for item in ctx.sent[0].kwargs["modal"].children})
+        for _ in schema.fields:
+            session = self.cog.creation.get(member.id, channel.id)
+            if session is None or session.finished: break
+            await self.cog.on_message(FakeMessage(member, channel, values[session.pending().lower()]))
+        else:
+            raise RuntimeError(f"a criação de {name} não terminou")
+        return [ctx.interaction, modal_interaction]
+
+    async def dispatch(self, label: str, member: FakeMember, semaphore: asyncio.Semaphore):
+        lock = self.locks.setdefault(member.id, asyncio.Lock())
+        async with lock, semaphore:
+            start = time.perf_counter()
+            try:
+                interactions = await self.command(label, member)
+            except Exception as e:
+                self.errors.append(f"{label}: {type(e).__name__}: {e}")
+                return
+            self.samples[label].append(time.perf_counter() - start)
+        for interaction in interactions:
+            if not interaction.response.is_done(): self.unanswered += 1
+            if any((sent.content or "").startswith("❌") for sent in interaction.sent): self.rejected[label] += 1
+
+    async def run(self, commands: int, concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+        labels = self.rng.choices([label for label, _ in MIX], [weight for _, weight in MIX], k=commands)
+        await asyncio.gather(*(self.dispatch(label, self.rng.choice(self.members), semaphore) for label in labels))
+        await repository.flush()
+
+
+async def simulate(args) -> bool:
+    cog = load_cog(RPGCog)
+    simulation = Simulation(cog, args.users, args.guilds, random.Random(args.seed))
+    with Timer() as seeding:
+        await repository.run(simulation.seed)
+    print(f"{args.users} fichas em {args.guilds} servidores criadas em {seeding.elapsed:.1f}s")
+
+    metrics.reset()
+    lag_monitor = metrics.LoopLagMonitor(interval=0.05)
+    lag_monitor.start()
+    with Timer() as timer:
+        await simulation.run(args.commands, args.concurrency)
+    lag_monitor.stop()
+    cog.bot.remove_cog(cog.qualified_name)
+
+    for label, _ in MIX:
+        if not simulation.samples[label]: continue
+        report(label, simulation.samples[label], timer.elapsed)
+        if simulation.rejected[label]: print(f"{'':<28} recusados (❌)={simulation.rejected[label]}")
+    done = sum(map(len, simulation.samples.values()))
+    statements = metrics.counter_value(metrics.DB_STATEMENTS)
+    connections = metrics.counter_value(metrics.DB_CONNECTIONS)
+    print(f"total: {done / timer.elapsed:.0f} comandos/s  statements={statements:.0f} "
+          f"({statements / max(1, done):.2f}/comando)  conexões abertas={connections:.0f}")
+    top = sorted(((label, child.value) for label, child in metrics.DB_STATEMENTS.items()), key=lambda row: -row[1])
+    print("statements por função: " + ", ".join(f"{label}={value:.0f}" for label, value in top[:8]))
+    lag = metrics.LOOP_LAG.labels()
+    print("atraso do event loop: " + " / ".join(f"p{int(q * 100)} {lag.quantile(q) * 1000:.1f}"
+                                                 for q in metrics.QUANTILES) + " ms")
+
+    ok = not simulation.errors and not simulation.unanswered
+    for error in simulation.errors[:10]: print(f"ERRO {error}")
+    if simulation.unanswered: print(f"FALHA {simulation.unanswered} interações sem resposta")
+    if args.max_statements is not None and statements / max(1, done) > args.max_statements:
+        print(f"FALHA {statements / max(1, done):.2f} statements/comando (limite {args.max_statements})")
+        ok = False
+    slow = [label for label, samples in simulation.samples.items()
+            if args.max_p99 is not None and samples and percentile(samples, 99) * 1000 > args.max_p99]
+    if slow:
+        print(f"FALHA p99 acima de {args.max_p99}ms: {', '.join(slow)}")
+        ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--commands", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-p99", type=float, help="Latência p99 máxima por comando, em ms")
+    parser.add_argument("--max-statements", type=float, help="Média máxima de comandos SQL por comando de barra")
+    args = parser.parse_args()
+    if args.guilds > args.users: parser.error("--guilds não pode passar de --users")
+
+    # Antes de abrir o pool: toda conexão precisa do trace callback que conta os comandos SQL
+    metrics.instrument_database()
+    previous = database.SHARD_COUNT
+    database.SHARD_COUNT = args.shards
+    try:
+        with temporary_database():
+            if args.write_behind: repository.enable_write_behind()
+            try:
+                ok = asyncio.run(simulate(args))
+            finally:
+                repository.disable_write_behind()
+                repository.shutdown()
+    finally:
+        database.SHARD_COUNT = previous
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Escritas concorrentes de várias campanhas: um arquivo só vs. um shard por grupo de campanhas.
+
+Cada thread é o mestre de uma campanha e grava dinheiro e itens nas fichas dela. Com um arquivo, todas disputam
+o mesmo lock de escrita do SQLite (e as mesmas conexões do pool); com shards, só as campanhas do mesmo shard.
+Confere no fim que nenhuma escrita se perdeu.
+
+Uso: python benchmarks/bench_sharding.py [--campaigns 8] [--shards 8] [--operations 400] [--characters 4]
+"""
+import argparse
+import sys
+import threading
+import time
+
+from common import Timer, report, seed_characters, temporary_database
+
+import database
+
+
+def campaign_names(count: int, shards: int) -> list:
+    # Nomes que o roteador espalha por igual entre os shards, como muitas campanhas reais fariam
+    router = database.StorageRouter(database.DB_NAME, shards)
+    names, per_shard, candidate = [], {}, 0
+    while len(names) < count:
+        name = f"campanha {candidate}"
+        shard = router.for_campaign("tormenta20", name)
+        if per_shard.get(shard, 0) < -(-count // shards):
+            per_shard[shard] = per_shard.get(shard, 0) + 1
+            names.append(name)
+        candidate += 1
+    return names
+
+
+def run(args, shards: int) -> bool:
+    database.SHARD_COUNT = shards
+    with temporary_database():
+        campaigns = {name: seed_characters(args.characters, campaign=name)
+                     for name in campaign_names(args.campaigns, shards)}
+        barrier = threading.Barrier(len(campaigns))
+        samples, errors = [], []
+
+        def master(char_ids):
+            barrier.wait()
+            try:
+                for number in range(args.operations):
+                    char_id = char_ids[number % len(char_ids)]
+                    start = time.perf_counter()
+                    if number % 2: database.modify_money(char_id, 1)
+                    else: database.add_item(char_id, "Flecha", 1, "")
+                    samples.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(e)
+
+        with Timer() as timer:
+            threads = [threading.Thread(target=master, args=(char_ids,)) for char_ids in campaigns.values()]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+        if errors: raise errors[0]
+        report(f"{shards} shard(s), {len(campaigns)} campanhas", samples, timer.elapsed)
+
+        expected_items = sum(-(-args.operations // 2) for _ in campaigns)
+        expected_money = sum(args.operations // 2 for _ in campaigns)
+        items = sum(item["quantity"] for char_ids in campaigns.values() for char_id in char_ids
+                    for item in database.get_inventory(char_id))
+        money = sum(database.get_character_sheet(char_id)["money"]
+                    for char_ids in campaigns.values() for char_id in char_ids)
+        ok = (items, money) == (expected_items, expected_money)
+        if not ok: print(f"FALHA itens={items} (esperado {expected_items}) dinheiro={money} (esperado {expected_money})")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaigns", type=int, default=8)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=400)
+    parser.add_argument("--characters", type=int, default=4)
+    args = parser.parse_args()
+
+    previous = database.SHARD_COUNT
+    try:
+        ok = run(args, 1) & run(args, args.shards)
+    finally:
+        database.SHARD_COUNT = previous
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
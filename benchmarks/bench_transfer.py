@@ -0,0 +1,60 @@
+"""Importação/exportação em lote de 100 mil personagens.
+
+Uso: python benchmarks/bench_transfer.py [--characters 100000] [--format ndjson|csv] [--memory]
+
+Com --memory o pico de memória é medido via tracemalloc (o que deixa tudo ~3x mais lento).
+"""
+import argparse
+import io
+import os
+import tracemalloc
+
+from common import Timer, temporary_database
+
+import transfer
+
+
+def generate(count: int):
+    for i in range(count):
+        yield {"type": "character", "user_id": i % 500, "system": "tormenta20", "campaign": f"campanha {i % 50}",
+               "character_name": f"personagem {i}", "money": i % 1000,
+               "attributes": {"nome": f"Personagem {i}", "pv": "20", "mana": "8", "força": "12", "destreza": "14"},
+               "inventory": [{"item_name": "Espada", "quantity": 1, "description": "Longa"},
+                             {"item_name": "Poção", "quantity": 3, "description": None}],
+               "effects": [{"effect_name": "Abençoado", "duration": 3, "caster_id": 1}]}
+
+
+class NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+def measure(label: str, func, trace_memory: bool):
+    if trace_memory: tracemalloc.start()
+    with Timer() as timer:
+        result = func()
+    memory = ""
+    if trace_memory:
+        memory = f" pico de memória={tracemalloc.get_traced_memory()[1] / 1024 / 1024:6.2f}MiB"
+        tracemalloc.stop()
+    print(f"{label:<10} {timer.elapsed:7.2f}s{memory} -> {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--characters", type=int, default=100_000)
+    parser.add_argument("--format", choices=transfer.FORMATS, default="ndjson")
+    parser.add_argument("--memory", action="store_true")
+    args = parser.parse_args()
+
+    with temporary_database() as path:
+        measure("importar", lambda: transfer.import_records(generate(args.characters)), args.memory)
+        size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        print(f"{'':<10} banco: {size / 1024 / 1024:.1f}MiB")
+        measure("exportar", lambda: transfer.export_to(NullWriter(), args.format), args.memory)
+        measure("campanha", lambda: transfer.export_to(NullWriter(), args.format, campaign="campanha 7"),
+                args.memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Combate simulado: dinheiro, dano e efeitos gravados um a um vs. pela fila write-behind.
+
+Confere também a leitura das próprias escritas: cada leitura no meio do combate precisa ver tudo o que veio antes.
+
+Uso: python benchmarks/bench_write_behind.py [--actions 3000] [--characters 6] [--read-every 10]
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from common import Timer, seed_characters, statement_counter, temporary_database
+
+import database
+import repository
+
+
+async def combat(char_ids, actions: int, read_every: int) -> bool:
+    rng = random.Random(7)
+    money = {char_id: 0.0 for char_id in char_ids}
+    hp = {char_id: 20 for char_id in char_ids}
+    effects = {char_id: 0 for char_id in char_ids}
+    ok = True
+    for number in range(1, actions + 1):
+        char_id = rng.choice(char_ids)
+        action = rng.random()
+        if action < 0.4:
+            delta = rng.randint(-5, 5)
+            hp[char_id] += delta
+            await repository.adjust_attribute(char_id, "pv", delta)
+        elif action < 0.8:
+            money[char_id] += 1
+            await repository.modify_money(char_id, 1)
+        else:
+            effects[char_id] += 1
+            await repository.apply_effect(char_id, "Atordoado", 3, 99)
+        if number % read_every == 0:
+            target = rng.choice(char_ids)
+            sheet = await repository.get_character_sheet(target)
+            current = await repository.get_effects(target)
+            if (sheet["money"], int(sheet["attributes"]["pv"]), len(current)) != \
+                    (money[target], hp[target], effects[target]):
+                ok = False
+    await repository.flush()
+    for char_id in char_ids:
+        sheet = database.get_character_sheet(char_id)
+        ok &= sheet["money"] == money[char_id] and int(sheet["attributes"]["pv"]) == hp[char_id]
+        ok &= len(database.get_effects(char_id)) == effects[char_id]
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=3000)
+    parser.add_argument("--characters", type=int, default=6)
+    parser.add_argument("--read-every", type=int, default=10)
+    args = parser.parse_args()
+
+    all_ok = True
+    for label, write_behind in (("antes (uma transação por ação)", False), ("depois (write-behind)", True)):
+        with temporary_database():
+            char_ids = seed_characters(args.characters)
+            if write_behind: repository.enable_write_behind()
+            with statement_counter() as counts, Timer() as timer:
+                ok = asyncio.run(combat(char_ids, args.actions, args.read_every))
+            repository.disable_write_behind()
+            repository.shutdown()
+        all_ok &= ok
+        print(f"{label:<32} {args.actions / timer.elapsed:8.0f} ações/s  commits={counts['commits']:<6} "
+              f"statements={counts['statements']:<6} leituras consistentes={'sim' if ok else 'NÃO'}")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
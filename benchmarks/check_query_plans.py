@@ -0,0 +1,56 @@
+"""Confere via EXPLAIN QUERY PLAN que as buscas quentes usam índice (sai com código 1 se alguma fizer SCAN
+ou precisar ordenar numa B-tree temporária).
+
+Uso: python benchmarks/check_query_plans.py
+"""
+import sys
+
+from common import temporary_database
+
+import database
+
+LOOKUPS = {
+    "find_character_id": ("SELECT id FROM characters WHERE user_id = ? AND lower(system) = ? AND lower(campaign) = ? "
+                          "AND lower(character_name) = ?", (1, "s", "c", "n")),
+    "list_characters": ("SELECT campaign, character_name FROM characters WHERE user_id = ? AND lower(system) = ?",
+                        (1, "s")),
+    "get_character_sheet": ("SELECT name, value FROM attributes WHERE character_id = ?", (1,)),
+    "update_attribute": ("UPDATE attributes SET value = ? WHERE character_id = ? AND lower(name) = ?", ("1", 1, "pv")),
+    "remove_item": ("UPDATE inventory SET quantity = quantity - 1 WHERE character_id = ? AND lower(item_name) = ? "
+                    "AND quantity > 1", (1, "espada")),
+    "get_inventory": ("SELECT item_name, quantity, description FROM inventory WHERE character_id = ?", (1,)),
+    "get_character_page": (database.CHARACTER_VIEW_QUERY.format(where="c.id = ?"), (10, 20, 1)),
+    "get_character_view": (database.CHARACTER_VIEW_QUERY.format(where=database.VIEW_BY_NAME), (-1, 0, 1, "s", "c", "n")),
+    "get_effects": ("SELECT id, effect_name, duration FROM status_effects WHERE character_id = ?", (1,)),
+    "remove_effect": ("DELETE FROM status_effects WHERE character_id = ? AND lower(effect_name) = ?", (1, "x")),
+    "get_npc": ("SELECT name, stats FROM npcs WHERE user_id = ? AND lower(name) = ?", (1, "x")),
+    "delete_npc": ("DELETE FROM npcs WHERE user_id = ? AND lower(name) = ?", (1, "x")),
+    "campaign_roster": (database.CAMPAIGN_ROSTER_QUERY.format(names="?, ?"),
+                        ("pv", "mana", "s", "c", "n", "n", 1, "[1, 2]", 11)),
+    "campaign_richest": (database.CAMPAIGN_RICHEST_QUERY, ("s", "c", 100, 1, "[1, 2]", 11)),
+    "campaign_item_holders": (database.CAMPAIGN_ITEMS_QUERY, ("s", "c", "n", 1, 11, "espada", "espadb", "[1, 2]")),
+    "campaign_effects": (database.CAMPAIGN_EFFECTS_QUERY, ("s", "c", "n", "n", 1, "[1, 2]", 11)),
+}
+# Ordenam os poucos atributos de uma ficha por id (a ordem do sistema), como _load_character_sheet; o resto do
+# plano ainda tem que usar índice
+SORTS_ATTRIBUTES = {"get_character_page", "get_character_view"}
+
+
+def main() -> int:
+    failures = 0
+    with temporary_database():
+        with database.connect() as conn:
+            for label, (query, params) in LOOKUPS.items():
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+                # SCAN (subquery-N) lê as linhas já filtradas de uma subconsulta, não uma tabela
+                ok = all("INDEX" in step or "PRIMARY KEY" in step for step in plan
+                         if step.startswith(("SCAN", "SEARCH")) and not step.startswith("SCAN (subquery"))
+                sorts = sum("TEMP B-TREE" in step for step in plan)
+                ok &= sorts <= (label in SORTS_ATTRIBUTES)
+                failures += not ok
+                print(f"{'ok ' if ok else 'SCAN'} {label:<23} {' | '.join(plan)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+
+
+@contextmanager
+def temporary_database() -> Iterator[str]:
+    # Os benchmarks nunca tocam o rpg_data.db do projeto
+    with tempfile.TemporaryDirectory(prefix="rpg-bench-") as directory:
+        previous = database.DB_NAME
+        database.DB_NAME = os.path.join(directory, "bench.db")
+        database.clear_caches()
+        try:
+            database.setup_database()
+            yield database.DB_NAME
+        finally:
+            database.close_pools()
+            database.clear_caches()
+            database.DB_NAME = previous
+
+
+def seed_characters(count: int, user_id: int = 1, system: str = "tormenta20", campaign: str = "bench") -> List[int]:
+    attributes = {"nome": "", "pv": "20", "mana": "10", "força": "12", "destreza": "14"}
+    for i in range(count):
+        database.create_character_sheet(user_id, system, campaign, f"personagem {i}", dict(attributes, nome=str(i)))
+    return [database.find_character_id(user_id, system, campaign, f"personagem {i}") for i in range(count)]
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered: return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label: str, samples: Sequence[float], elapsed: float):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<28} n={len(ms):<6} p50={percentile(ms, 50):8.2f}ms p99={percentile(ms, 99):8.2f}ms "
+          f"max={max(ms):8.2f}ms throughput={len(ms) / elapsed:9.1f}/s")
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+@contextmanager
+def statement_counter() -> Iterator[dict]:
+    # Conta conexões abertas, statements e commits executados pelo pool durante o bloco
+    counts = {"connections": 0, "statements": 0, "commits": 0}
+    original_open = database.ConnectionPool._open
+
+    def trace(sql: str):
+        counts["statements"] += 1
+        if sql.startswith("COMMIT"): counts["commits"] += 1
+
+    def counting_open(pool):
+        conn = original_open(pool)
+        counts["connections"] += 1
+        conn.set_trace_callback(trace)
+        return conn
+
+    database.close_pools()
+    database.ConnectionPool._open = counting_open
+    try:
+        yield counts
+    finally:
+        database.ConnectionPool._open = original_open
+        database.close_pools()
@@ -0,0 +1,170 @@
+"""Gateway falso: roda os comandos do RPGCog sem conexão com o Discord.
+
+As classes imitam só o que os comandos usam de discord.ApplicationContext, Interaction e Message, e guardam cada
+resposta (respond, defer, followup, modal, mensagem no canal) em vez de enviá-la. O callback do comando é chamado
+direto, então checks como has_permissions não rodam.
+"""
+import inspect
+import itertools
+from typing import Dict, List, NamedTuple, Optional
+
+import discord
+from discord.commands import Option
+
+_snowflakes = itertools.count(1 << 40)
+
+
+class Sent(NamedTuple):
+    kind: str  # message, defer, modal, edit, followup ou channel
+    content: Optional[str]
+    kwargs: dict
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.members: List["FakeMember"] = []  # o cache de membros; cada FakeMember se inscreve no seu servidor
+
+    def get_member(self, user_id: int) -> Optional["FakeMember"]:
+        return next((member for member in self.members if member.id == user_id), None)
+
+
+class FakePermissions:
+    def __init__(self, manage_guild: bool = False):
+        self.manage_guild = manage_guild
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild: FakeGuild, master: bool = False):
+        self.id = user_id
+        self.guild = guild
+        self.bot = False
+        self.name = self.display_name = f"jogador{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = FakePermissions(manage_guild=master)
+        guild.members.append(self)
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, guild: FakeGuild):
+        self.id = channel_id
+        self.guild = guild
+        self.sent: List[Sent] = []
+
+    async def send(self, content: str = None, **kwargs):
+        self.sent.append(Sent("channel", content, kwargs))
+
+
+class FakeMessage:
+    def __init__(self, author: FakeMember, channel: FakeChannel, content: str):
+        self.id = next(_snowflakes)
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.deleted = False
+
+    async def delete(self):
+        self.deleted = True
+
+
+# Como no Discord, a interação aceita uma única resposta inicial; o resto vai pelo followup
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    def _record(self, kind: str, content: Optional[str], kwargs: dict):
+        if self._done: raise discord.InteractionResponded(self._interaction)
+        self._done = True
+        self._interaction.sent.append(Sent(kind, content, kwargs))
+
+    async def send_message(self, content: str = None, **kwargs):
+        self._record("message", content, kwargs)
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        self._record("defer", None, dict(kwargs, ephemeral=ephemeral))
+
+    async def send_modal(self, modal: discord.ui.Modal):
+        self._record("modal", None, {"modal": modal})
+
+    async def edit_message(self, content: str = None, **kwargs):
+        self._record("edit", content, kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: str = None, **kwargs):
+        # O webhook do followup só existe depois da resposta inicial
+        if not self._interaction.response.is_done(): raise RuntimeError("followup antes de responder à interação")
+        self._interaction.sent.append(Sent("followup", content, kwargs))
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, channel: FakeChannel):
+        self.id = next(_snowflakes)
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id
+        self.created_at = discord.utils.utcnow()
+        self.sent: List[Sent] = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeContext:
+    def __init__(self, interaction: FakeInteraction):
+        self.interaction = interaction
+        self.author = self.user = interaction.user
+        self.channel = interaction.channel
+        self.guild = interaction.guild
+
+    @property
+    def followup(self) -> FakeFollowup:
+        return self.interaction.followup
+
+    @property
+    def sent(self) -> List[Sent]:
+        return self.interaction.sent
+
+    async def respond(self, content: str = None, **kwargs):
+        if self.interaction.response.is_done(): return await self.interaction.followup.send(content, **kwargs)
+        return await self.interaction.response.send_message(content, **kwargs)
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        await self.interaction.response.defer(ephemeral=ephemeral, **kwargs)
+
+    async def send_modal(self, modal: discord.ui.Modal):
+        await self.interaction.response.send_modal(modal)
+
+
+def load_cog(cog_class) -> discord.Cog:
+    # Um Bot de verdade, sem conexão, para o cog ser registrado como no load_extension (os comandos precisam
+    # conhecer o cog para chamar uns aos outros). O bot nunca fica pronto: tarefas com before_loop não rodam.
+    bot = discord.Bot()
+    cog = cog_class(bot)
+    bot.add_cog(cog)
+    return cog
+
+
+def option_defaults(command) -> Dict[str, object]:
+    # Os padrões ficam nas anotações Option(...); o py-cord os preenche ao converter as opções da interação
+    return {name: parameter.annotation.default
+            for name, parameter in inspect.signature(command.callback).parameters.items()
+            if isinstance(parameter.annotation, Option) and not parameter.annotation.required}
+
+
+async def invoke(cog: discord.Cog, command, ctx: FakeContext, **options):
+    await command.callback(cog, ctx, **dict(option_defaults(command), **options))
+
+
+async def submit_modal(modal: discord.ui.Modal, interaction: FakeInteraction, values: Dict[str, str]):
+    # values usa os rótulos dos campos, como o jogador os vê no formulário
+    for item in modal.children: item.value = values.get(item.label, "")
+    await modal.callback(interaction)
@@ -0,0 +1,138 @@
+"""Teste de estresse do inventário: várias threads concedendo e retirando o mesmo item ao mesmo tempo.
+
+Confere que nenhuma atualização se perde, que não surgem linhas duplicadas e que o loot em lote é aplicado
+por inteiro. Com --legacy roda também o antigo SELECT-then-UPDATE, que perde atualizações e duplica linhas.
+Sai com código 1 se o caminho atual falhar.
+
+Uso: python benchmarks/stress_inventory.py [--threads 8] [--operations 300] [--party 4] [--legacy]
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+
+from common import Timer, seed_characters, temporary_database
+
+import database
+
+ITEM = "Poção"
+INITIAL_STOCK = 1_000_000
+
+
+# Caminho antigo: leitura e escrita em instruções separadas, sem unicidade por item
+def legacy_add_item(char_id: int, item_name: str, quantity: int, description: str):
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    item = conn.execute("SELECT id, quantity FROM inventory WHERE character_id = ? AND lower(item_name) = ?",
+                        (char_id, item_name.lower())).fetchone()
+    if item:
+        conn.execute("UPDATE inventory SET quantity = ? WHERE id = ?", (item[1] + quantity, item[0]))
+    else:
+        conn.execute("INSERT INTO inventory (character_id, item_name, quantity, description) VALUES (?, ?, ?, ?)",
+                     (char_id, item_name, quantity, description))
+    conn.commit()
+    conn.close()
+
+
+def hammer(threads: int, work) -> float:
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(number: int):
+        barrier.wait()
+        try:
+            work(number)
+        except Exception as e:
+            errors.append(e)
+
+    with Timer() as timer:
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in pool: thread.start()
+        for thread in pool: thread.join()
+    if errors: raise errors[0]
+    return timer.elapsed
+
+
+def inventory_rows(char_id: int) -> list:
+    with database.connect() as conn:
+        return conn.execute("SELECT item_name, quantity FROM inventory WHERE character_id = ? AND lower(item_name) = ?",
+                            (char_id, ITEM.lower())).fetchall()
+
+
+def check(label: str, rows: list, expected: int, elapsed: float, operations: int) -> bool:
+    total = sum(quantity for _, quantity in rows)
+    ok = len(rows) == 1 and total == expected
+    print(f"{'ok  ' if ok else 'FALHA'} {label:<34} linhas={len(rows):<3} quantidade={total:<9} esperado={expected:<9} "
+          f"{operations / elapsed:8.0f} ops/s")
+    return ok
+
+
+def run_current(args) -> bool:
+    ok = True
+    char_ids = seed_characters(args.party + 1)
+    target, party = char_ids[0], char_ids[1:]
+
+    # Concessões simultâneas no mesmo item: cada thread soma 1 por operação
+    elapsed = hammer(args.threads, lambda _: [database.add_item(target, ITEM, 1, "") for _ in range(args.operations)])
+    ok &= check("add_item concorrente", inventory_rows(target), args.threads * args.operations, elapsed,
+                args.threads * args.operations)
+
+    # Metade das threads retira, metade concede: o saldo final é exato
+    database.add_item(target, ITEM, INITIAL_STOCK, "")
+    start = sum(q for _, q in inventory_rows(target))
+
+    def mixed(number: int):
+        for _ in range(args.operations):
+            if number % 2: database.remove_item(target, ITEM, 1)
+            else: database.add_item(target, ITEM, 2, "")
+
+    elapsed = hammer(args.threads, mixed)
+    granted, taken = (args.threads + 1) // 2 * 2, args.threads // 2
+    ok &= check("add_item + remove_item", inventory_rows(target), start + (granted - taken) * args.operations,
+                elapsed, args.threads * args.operations)
+
+    # Loot do grupo em lote: cada transação dá 1 item e 1 de dinheiro para todo o grupo
+    def loot(_):
+        for _ in range(args.operations):
+            database.apply_deltas([(char_id, ITEM, 1) for char_id in party], [(char_id, 1) for char_id in party])
+
+    elapsed = hammer(args.threads, loot)
+    expected = args.threads * args.operations
+    for char_id in party:
+        ok &= check(f"apply_deltas (ficha {char_id})", inventory_rows(char_id), expected, elapsed,
+                    args.threads * args.operations)
+        money = database.get_character_sheet(char_id)["money"]
+        if money != expected:
+            print(f"FALHA dinheiro da ficha {char_id}: {money} (esperado {expected})")
+            ok = False
+    return ok
+
+
+def run_legacy(args):
+    (target,) = seed_characters(1, campaign="legacy")
+    elapsed = hammer(args.threads, lambda _: [legacy_add_item(target, ITEM, 1, "") for _ in range(args.operations)])
+    check("antes: SELECT-then-UPDATE", inventory_rows(target), args.threads * args.operations, elapsed,
+          args.threads * args.operations)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=300)
+    parser.add_argument("--party", type=int, default=4)
+    parser.add_argument("--legacy", action="store_true", help="Roda também o caminho antigo, sem índice único")
+    args = parser.parse_args()
+
+    if args.legacy:
+        with temporary_database():
+            # O caminho antigo não tinha o índice único; sem ele as linhas duplicadas aparecem
+            with database.connect() as conn:
+                conn.execute("DROP INDEX idx_inventory_lookup")
+                conn.execute("CREATE INDEX idx_inventory_lookup ON inventory (character_id, lower(item_name))")
+            run_legacy(args)
+    with temporary_database():
+        ok = run_current(args)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
+import time
+STARTED = time.perf_counter()
+
 import os
 import discord
 from dotenv import load_dotenv
 import database
+import repository
+import systems
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
@@ -13,14 +18,49 @@ intents.message_content = True
 
 bot = discord.Bot(intents=intents)
 
+# WRITE_BEHIND=1 agrupa dinheiro, dano/cura e efeitos em gravações a cada meio segundo
+if os.getenv('WRITE_BEHIND'):
+    repository.enable_write_behind()
+
+# SHARDS=N espalha campanhas, servidores e NPCs por N arquivos (use shard_tool.py para dividir um banco existente)
+if os.getenv('SHARDS'):
+    database.SHARD_COUNT = int(os.getenv('SHARDS'))
+
 @bot.event
 async def on_ready():
+    # Roda de novo a cada reconexão; o banco já foi preparado antes do bot.run
     print(f'Conectado como {bot.user}')
     print('------')
-    print("Configurando o banco de dados...")
-    database.setup_database()
-    print("Banco de dados pronto.")
 
-bot.load_extension('cogs.rpg_commands')
+# Inicialização medida etapa a etapa: (etapa, segundos)
+startup = [('imports', time.perf_counter() - STARTED)]
+
+def step(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    startup.append((label, time.perf_counter() - start))
+    return result
+
+def load_extensions():
+    # O cog de métricas vem primeiro: ele instrumenta o banco antes de qualquer conexão abrir
+    bot.load_extension('cogs.metrics')
+    bot.load_extension('cogs.rpg_commands')
+
+# Tudo pronto antes de conectar: o primeiro comando já encontra as tabelas, o pool aberto e o estado em memória
+step('cogs e sistemas', load_extensions)
+step('migrações', database.setup_database)
+connections = step('conexões', database.warm_up)
+rpg = bot.get_cog('RPGCog')
+initiatives = step('iniciativas', database.load_initiatives)
+cached = step('fichas em combate', database.preload_characters, rpg.initiative.preload(initiatives))
+step('rascunhos', lambda: rpg.creation.preload(database.load_creation_drafts()))
+print(f"Inicialização em {(time.perf_counter() - STARTED) * 1000:.0f} ms: "
+      + ", ".join(f"{label} {seconds * 1000:.1f} ms" for label, seconds in startup))
+print(f"{connections} conexões abertas, {len(systems.registry.names())} sistemas, {len(initiatives)} iniciativas, "
+      f"{cached} fichas e {len(rpg.creation)} rascunhos em memória.")
 
-bot.run(TOKEN)
\ No newline at end of file
+try:
+    bot.run(TOKEN)
+finally:
+    # Grava o que ainda estiver na fila e fecha as conexões, também ao sair por Ctrl+C ou SIGTERM
+    repository.shutdown()
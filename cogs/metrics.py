@@ -0,0 +1,86 @@
+import discord
+from discord.ext import commands, tasks
+import asyncio
+import os
+import sys
+import traceback
+import database
+import metrics
+
+# METRICS_FILE: arquivo .prom para o textfile collector do node_exporter
+# METRICS_PORT: porta local servindo /metrics para o Prometheus
+EXPORT_INTERVAL = 15
+
+
+def format_rows(rows: list) -> str:
+    lines = [f"`{label[:28]}` {count}x • p50 {p50 * 1000:.1f} / p95 {p95 * 1000:.1f} / p99 {p99 * 1000:.1f} ms"
+             for label, count, _, p50, p95, p99 in rows]
+    return "\n".join(lines)[:1024] or "Sem dados ainda."
+
+
+class MetricsCog(commands.Cog):
+    def __init__(self, bot, path: str = None, port: int = None):
+        self.bot = bot
+        self.path = path
+        self.port = port
+        self.server = None
+        self.lag_monitor = metrics.LoopLagMonitor()
+        if self.path: self.write_metrics.start()
+
+    def cog_unload(self):
+        self.lag_monitor.stop()
+        self.write_metrics.cancel()
+        if self.server: self.server.close()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.lag_monitor.start()
+        if self.port and self.server is None:
+            self.server = await metrics.start_http_server(self.port)
+            print(f"Métricas em http://127.0.0.1:{self.port}/metrics")
+
+    @tasks.loop(seconds=EXPORT_INTERVAL)
+    async def write_metrics(self):
+        await asyncio.to_thread(metrics.write_textfile, self.path)
+
+    @commands.Cog.listener()
+    async def on_application_command(self, ctx: discord.ApplicationContext):
+        metrics.command_started(ctx.interaction.id)
+
+    @commands.Cog.listener()
+    async def on_application_command_completion(self, ctx: discord.ApplicationContext):
+        metrics.command_finished(ctx.interaction.id, ctx.command.qualified_name)
+
+    @commands.Cog.listener()
+    async def on_application_command_error(self, ctx: discord.ApplicationContext, error: Exception):
+        metrics.command_finished(ctx.interaction.id, ctx.command.qualified_name, failed=True)
+        # Com um listener registrado o py-cord deixa de imprimir o erro; mantém o comportamento padrão
+        print(f"Ignorando exceção no comando {ctx.command}:", file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+    @commands.slash_command(name="stats", description="[MESTRE] Latência dos comandos, do banco e do event loop.")
+    @commands.has_permissions(manage_guild=True)
+    async def stats(self, ctx: discord.ApplicationContext):
+        embed = discord.Embed(title="📈 Estatísticas do Bot", color=discord.Color.teal())
+        embed.add_field(name="Comandos", value=format_rows(metrics.summarize(metrics.COMMAND_SECONDS)), inline=False)
+        embed.add_field(name="Banco de dados", value=format_rows(metrics.summarize(metrics.DB_CALL_SECONDS)),
+                        inline=False)
+        lag = metrics.LOOP_LAG.labels()
+        embed.add_field(name="Event loop",
+                        value=" / ".join(f"p{int(q * 100)} {lag.quantile(q) * 1000:.1f}" for q in metrics.QUANTILES)
+                        + " ms", inline=True)
+        embed.add_field(name="SQL", value=f"{metrics.counter_value(metrics.DB_STATEMENTS):.0f} comandos • "
+                                          f"{metrics.counter_value(metrics.DB_CONNECTIONS):.0f} conexões abertas",
+                        inline=True)
+        caches = database.cache_stats()
+        hits, misses = sum(c["hits"] for c in caches.values()), sum(c["misses"] for c in caches.values())
+        embed.add_field(name="Caches", value=f"{hits / max(1, hits + misses):.0%} de acertos", inline=True)
+        embed.set_footer(text=f"Latência do gateway: {self.bot.latency * 1000:.0f} ms")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+
+def setup(bot):
+    # Instrumenta antes de o pool abrir a primeira conexão (o bot.py carrega as extensões antes de preparar o banco)
+    metrics.instrument_database()
+    port = os.getenv("METRICS_PORT")
+    bot.add_cog(MetricsCog(bot, os.getenv("METRICS_FILE"), int(port) if port else None))
@@ -1,94 +1,311 @@
 import discord
 from discord.commands import SlashCommandGroup, Option
-from discord.ext import commands
-import database
+from discord.ext import commands, tasks
+import repository
+from creation import CreationSessionManager
+from initiative import InitiativeRegistry
+from database import CAMPAIGN_PAGE_SIZE
+from pages import campaign_embed, format_effects, inventory_page, keyset_view, page_view, sheet_page
 import asyncio
-import random
+import dice
+import math
 import re
+import systems
+import transfer
 
-RPG_SYSTEMS = {
-    "ordem paranormal": ["Nome", "Classe", "Origem", "PV", "Sanidade", "PE", "Força", "Agilidade", "Intelecto",
-                         "Presença", "Vigor"],
-    "tormenta20": ["Nome", "Raça", "Classe", "PV", "Mana", "Força", "Destreza", "Constituição", "Inteligência",
-                   "Sabedoria", "Carisma"],
-    "pokemon ttrpg": ["Nome", "Treinador", "PV", "Energia", "Ataque", "Defesa", "Ataque Especial", "Defesa Especial",
-                      "Velocidade"],
-    "alice in borderland": ["Nome", "Vida", "Sanidade", "Stamina", "Visto", "Popularidade", "Sangue", "Agilidade",
-                            "Vontade", "Raciocínio", "Engano"]
-}
+# Os sistemas vêm dos arquivos em systems/; a pasta é relida a cada intervalo se algum arquivo mudar
+SYSTEMS_RELOAD_INTERVAL = 30
+NPC_PAGE_SIZE = 10
+ROSTER_STATS = 3  # atributos numéricos do sistema mostrados por ficha em /campanha grupo
+# "PV=10, Força=3": a vírgula só separa pares quando vem seguida de outro "chave="
+NPC_STAT_SEPARATOR = re.compile(r"\s*[;,]\s*(?=[^=;,]+=)")
+NPC_FILTER_PATTERN = re.compile(r"\s*([^<>=!,;]+?)\s*(<=|>=|!=|<|>|=)\s*(-?\d+(?:[.,]\d+)?)\s*(?:[,;]|$)")
+
+
+def parse_npc_stats(text: str) -> dict:
+    stats = {}
+    for pair in NPC_STAT_SEPARATOR.split(text.strip()):
+        if "=" not in pair: raise ValueError(f"Status inválido: `{pair}` (use Nome=Valor).")
+        name, value = pair.split("=", 1)
+        stats[name.strip()] = value.strip()
+    return stats
+
+
+def parse_npc_filters(text: str) -> list:
+    filters, position = [], 0
+    while position < len(text.strip()):
+        match = NPC_FILTER_PATTERN.match(text, position)
+        if not match: raise ValueError(f"Filtro inválido: `{text}` (ex: `PV < 10, Força >= 3`).")
+        name, operator, value = match.groups()
+        filters.append((name, operator, float(value.replace(",", "."))))
+        position = match.end()
+    return filters
+
+
+def npc_page_embed(title: str, npcs: list, total: int, pagina: int) -> discord.Embed:
+    paginas = max(1, math.ceil(total / NPC_PAGE_SIZE))
+    embed = discord.Embed(title=title, color=discord.Color.dark_green())
+    for npc in npcs:
+        stats = " | ".join(f"{name}: {value}" for name, value in npc['stats'].items())
+        embed.add_field(name=npc['name'], value=stats[:1024] or "Sem status.", inline=False)
+    embed.set_footer(text=f"Página {pagina}/{paginas} • {total} NPCs")
+    return embed
+
+
+def member_ids(guild: discord.Guild) -> set:
+    # As fichas não guardam o servidor: comandos de mestre sobre a campanha só enxergam donos que são membros dele.
+    # Vem do cache de membros (intent members, carregado na conexão), sem chamadas à API.
+    return {member.id for member in guild.members}
+
+
+# Autocomplete: sugestões vindas dos índices em memória de cada usuário (o banco só é lido na primeira vez)
+def autocomplete_option(ctx: discord.AutocompleteContext, *names: str) -> str:
+    for name in names:
+        if ctx.options.get(name): return ctx.options[name]
+    return None
+
+
+def autocomplete_owner(ctx: discord.AutocompleteContext) -> int:
+    # Comandos de mestre sugerem as fichas do jogador escolhido. O autocomplete não passa pelos checks do comando:
+    # só quem tem a permissão de mestre vê as fichas de outro, e só de um membro deste servidor
+    user, guild, jogador = ctx.interaction.user, ctx.interaction.guild, str(ctx.options.get("jogador") or "")
+    if guild is None or not jogador.isdigit() or not user.guild_permissions.manage_guild: return user.id
+    member = guild.get_member(int(jogador))
+    return member.id if member else user.id
+
+
+async def complete_systems(ctx: discord.AutocompleteContext) -> list:
+    index = await repository.character_index(autocomplete_owner(ctx))
+    return index.complete_systems(ctx.value or "")
+
+
+async def complete_system_names(ctx: discord.AutocompleteContext) -> list:
+    prefix = (ctx.value or "").lower()
+    return [name for name in systems.registry.names() if name.lower().startswith(prefix)][:25]
+
+
+async def complete_campaigns(ctx: discord.AutocompleteContext) -> list:
+    index = await repository.character_index(autocomplete_owner(ctx))
+    return index.complete_campaigns(ctx.value or "", autocomplete_option(ctx, "sistema", "system"))
+
+
+async def complete_characters(ctx: discord.AutocompleteContext) -> list:
+    index = await repository.character_index(autocomplete_owner(ctx))
+    return index.complete_names(ctx.value or "", autocomplete_option(ctx, "sistema", "system"),
+                                autocomplete_option(ctx, "campanha", "campaign"))
+
+
+async def complete_items(ctx: discord.AutocompleteContext) -> list:
+    sistema, campanha, personagem = (autocomplete_option(ctx, name) for name in ("sistema", "campanha", "personagem"))
+    if not (sistema and campanha and personagem): return []
+    char_id = await repository.find_character_id(autocomplete_owner(ctx), sistema, campanha, personagem)
+    if not char_id: return []
+    return (await repository.item_index(char_id)).search(ctx.value or "")
+
+
+async def complete_npcs(ctx: discord.AutocompleteContext) -> list:
+    return (await repository.npc_index(ctx.interaction.user.id)).search(ctx.value or "")
+
+
+# Tokens de interação valem 15 minutos; depois disso a conversa segue por mensagens no canal
+INTERACTION_TTL = 14 * 60
 
 
 class CharacterCreationModal(discord.ui.Modal):
-    def __init__(self, bot, system_name: str, campaign: str, attributes_to_ask: list):
-        self.bot = bot
+    def __init__(self, manager: CreationSessionManager, system_name: str, campaign: str, attributes_to_ask: list,
+                 part: int = 1):
+        self.manager = manager
         self.system_name = system_name
         self.campaign = campaign
         self.attributes_to_ask = attributes_to_ask
-        self.collected_data = {}
-        super().__init__(title=f"Criar Ficha ({system_name}) - Parte 1")
+        self.part = part
+        super().__init__(title=f"Criar Ficha ({system_name}) - Parte {part}")
         for attr in self.attributes_to_ask:
             self.add_item(discord.ui.InputText(label=attr.title(), placeholder=f"Digite o valor para {attr}"))
 
     async def callback(self, interaction: discord.Interaction):
-        await interaction.response.send_message("✅ Parte 1 recebida! Vamos continuar no chat...", ephemeral=True)
-        for item in self.children: self.collected_data[item.label.lower()] = item.value
-        all_attributes = RPG_SYSTEMS.get(self.system_name.lower())
-        remaining_attributes = [attr for attr in all_attributes if attr.lower() not in self.collected_data]
-
-        def check(m):
-            return m.author == interaction.user and m.channel == interaction.channel
-
-        for attr in remaining_attributes:
-            await interaction.followup.send(f"Qual o valor para **{attr.title()}**?", ephemeral=True)
-            try:
-                msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-                self.collected_data[attr.lower()] = msg.content
-                await msg.delete()
-            except asyncio.TimeoutError:
-                return await interaction.followup.send("⏳ Tempo esgotado! Criação cancelada.", ephemeral=True)
-        char_name = self.collected_data.get("nome", "Personagem Sem Nome")
-        try:
-            database.create_character_sheet(user_id=interaction.user.id, system=self.system_name,
-                                            campaign=self.campaign, char_name=char_name, attributes=self.collected_data)
-            embed = discord.Embed(title="✅ Ficha Criada com Sucesso!",
-                                  description=f"Sua ficha **{char_name}** para **{self.system_name}** foi salva.",
-                                  color=discord.Color.green())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f"❌ Erro ao salvar: {e}", ephemeral=True)
+        await interaction.response.send_message(f"✅ Parte {self.part} recebida!", ephemeral=True)
+        values = {item.label: item.value for item in self.children}
+        session = self.manager.get(interaction.user.id, interaction.channel.id)
+        # O formulário do botão "Preencher pelo formulário" também pode ser a parte 1 (quando algum valor dela foi
+        # recusado): só cria a sessão se ainda não houver uma, senão as respostas já aceitas se perderiam
+        if session is None:
+            session = await self.manager.start(interaction.user.id, interaction.channel.id, self.system_name,
+                                               self.campaign, values)
+        else:
+            await self.manager.answer(session, values)
+        session.interaction = interaction
+        await advance_creation(self.manager, session, interaction.channel)
+
+
+class ContinueCreationView(discord.ui.View):
+    def __init__(self, manager: CreationSessionManager):
+        super().__init__(timeout=INTERACTION_TTL)
+        self.manager = manager
+
+    @discord.ui.button(label="Preencher pelo formulário", emoji="📝", style=discord.ButtonStyle.primary)
+    async def open_form(self, button: discord.ui.Button, interaction: discord.Interaction):
+        session = self.manager.get(interaction.user.id, interaction.channel.id)
+        if not session or session.finished:
+            return await interaction.response.send_message("❌ Nenhuma ficha em criação neste canal.", ephemeral=True)
+        await interaction.response.send_modal(
+            CharacterCreationModal(self.manager, session.system, session.campaign, session.next_modal_fields(),
+                                   session.part))
+
+
+async def send_creation_message(session, channel, content: str = None, **kwargs):
+    interaction = session.interaction
+    if interaction and (discord.utils.utcnow() - interaction.created_at).total_seconds() < INTERACTION_TTL:
+        return await interaction.followup.send(content, ephemeral=True, **kwargs)
+    # Sem uma interação válida (ex.: depois de reiniciar o bot), fala no canal mencionando o jogador
+    await channel.send(f"<@{session.user_id}> {content or ''}", delete_after=INTERACTION_TTL, **kwargs)
+
+
+async def advance_creation(manager: CreationSessionManager, session, channel):
+    if not session.finished:
+        attr = session.pending()
+        errors = "".join(f"❌ {error}\n" for error in session.errors)
+        return await send_creation_message(
+            session, channel, f"{errors}Qual o valor para **{attr.title()}**? Responda no chat ou use o formulário.",
+            view=ContinueCreationView(manager))
+    try:
+        char_name = await manager.finish(session)
+    except Exception as e:
+        return await send_creation_message(session, channel, f"❌ Erro ao salvar: {e}")
+    embed = discord.Embed(title="✅ Ficha Criada com Sucesso!",
+                          description=f"Sua ficha **{char_name}** para **{session.system}** foi salva.",
+                          color=discord.Color.green())
+    await send_creation_message(session, channel, embed=embed)
 
 
 class RPGCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.initiative_trackers = {}
+        self.initiative = InitiativeRegistry()
+        self.creation = CreationSessionManager(systems.registry)
+        systems.registry.load()
+        self.cleanup_drafts.start()
+        self.reload_systems.start()
+
+    def cog_unload(self):
+        self.cleanup_drafts.cancel()
+        self.reload_systems.cancel()
+
+    @tasks.loop(seconds=SYSTEMS_RELOAD_INTERVAL)
+    async def reload_systems(self):
+        try:
+            if await asyncio.to_thread(systems.registry.reload_if_changed):
+                print(f"Sistemas recarregados: {', '.join(systems.registry.names())}")
+        except (OSError, ValueError) as e:
+            print(f"Erro ao recarregar os sistemas (a versão anterior continua valendo): {e}")
+
+    @tasks.loop(minutes=30)
+    async def cleanup_drafts(self):
+        await self.creation.cleanup()
+
+    @cleanup_drafts.before_loop
+    async def before_cleanup_drafts(self):
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        # Único listener para todas as criações em andamento: busca O(1) por (usuário, canal)
+        if message.author.bot: return
+        await self.creation.ensure_loaded()
+        session = self.creation.get(message.author.id, message.channel.id)
+        if not session or session.finished: return
+        await self.creation.answer(session, {session.pending(): message.content})
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+        await advance_creation(self.creation, session, message.channel)
 
     ficha = SlashCommandGroup("ficha", "Comandos para gerenciar fichas de RPG")
 
     @ficha.command(name="criar", description="Cria uma nova ficha de personagem.")
     async def criar(self, ctx: discord.ApplicationContext,
-                    system: Option(str, "Sistema", choices=list(RPG_SYSTEMS.keys())),
+                    system: Option(str, "Sistema", autocomplete=complete_system_names),
                     campaign: Option(str, "Campanha")):
-        attributes = RPG_SYSTEMS.get(system.lower(), [])
-        modal = CharacterCreationModal(bot=self.bot, system_name=system, campaign=campaign,
-                                       attributes_to_ask=attributes[:5])
+        schema = systems.registry.get(system)
+        if schema is None: return await ctx.respond(f"❌ Sistema desconhecido: **{system}**.", ephemeral=True)
+        await self.creation.ensure_loaded()
+        if self.creation.get(ctx.author.id, ctx.channel.id):
+            return await ctx.respond("⚠️ Você já tem uma ficha em criação neste canal. "
+                                     "Use `/ficha retomar` ou `/ficha cancelar`.", ephemeral=True)
+        modal = CharacterCreationModal(self.creation, system_name=schema.name, campaign=campaign,
+                                       attributes_to_ask=schema.fields[:5])
         await ctx.send_modal(modal)
 
+    @ficha.command(name="retomar", description="Retoma uma criação de ficha interrompida neste canal.")
+    async def retomar(self, ctx: discord.ApplicationContext):
+        await self.creation.ensure_loaded()
+        session = self.creation.get(ctx.author.id, ctx.channel.id)
+        if not session: return await ctx.respond("❌ Nenhuma ficha em criação neste canal.", ephemeral=True)
+        await ctx.respond(f"↩️ Retomando a ficha de **{session.system}** "
+                          f"({len(session.attributes) - len(session.remaining())}/{len(session.attributes)}).",
+                          ephemeral=True)
+        session.interaction = ctx.interaction
+        await advance_creation(self.creation, session, ctx.channel)
+
+    @ficha.command(name="cancelar", description="Descarta a ficha em criação neste canal.")
+    async def cancelar(self, ctx: discord.ApplicationContext):
+        if await self.creation.discard(ctx.author.id, ctx.channel.id):
+            return await ctx.respond("🗑️ Criação de ficha descartada.", ephemeral=True)
+        await ctx.respond("❌ Nenhuma ficha em criação neste canal.", ephemeral=True)
+
     @ficha.command(name="ver", description="Visualiza uma ficha de personagem.")
     async def ver(self, ctx: discord.ApplicationContext,
-                  system: Option(str, "Sistema", choices=list(RPG_SYSTEMS.keys())), campaign: Option(str, "Campanha"),
-                  name: Option(str, "Nome do Personagem")):
+                  system: Option(str, "Sistema", autocomplete=complete_systems),
+                  campaign: Option(str, "Campanha", autocomplete=complete_campaigns),
+                  name: Option(str, "Nome do Personagem", autocomplete=complete_characters),
+                  pagina: Option(int, "Página", min_value=1, default=1)):
         await ctx.defer()
-        char_id = database.find_character_id(ctx.author.id, system, campaign, name)
-        if not char_id: return await ctx.followup.send("❌ Ficha não encontrada.", ephemeral=True)
-        sheet = database.get_character_sheet(char_id)
-        embed = discord.Embed(title=f"Ficha de {sheet['character_name'].title()}",
-                              description=f"Sistema: {sheet['system'].title()} | Campanha: {sheet['campaign'].title()}",
-                              color=discord.Color.purple())
-        embed.add_field(name="💰 Dinheiro", value=sheet.get('money', 0), inline=True)
-        for attr, value in sheet['attributes'].items():
-            embed.add_field(name=attr.title(), value=value or "N/A", inline=True)
-        await ctx.followup.send(embed=embed)
+        char_id = await repository.find_character_id(ctx.author.id, system, campaign, name)
+        embed, pages = await sheet_page(char_id, pagina) if char_id else (None, 0)
+        if not embed: return await ctx.followup.send("❌ Ficha não encontrada.", ephemeral=True)
+        view = page_view(sheet_page, char_id, ctx.author.id, min(pagina, pages), pages)
+        await ctx.followup.send(embed=embed, **({"view": view} if view else {}))
+
+    async def adjust(self, ctx: discord.ApplicationContext, jogador, sistema: str, campanha: str, personagem: str,
+                     atributo: str, delta: int):
+        owner = jogador or ctx.author
+        if owner.id != ctx.author.id and not ctx.author.guild_permissions.manage_guild:
+            return await ctx.respond("❌ Só o mestre pode alterar a ficha de outro jogador.", ephemeral=True)
+        schema = systems.registry.get(sistema)
+        attribute = schema.attribute(atributo) if schema else None
+        if attribute and (not attribute.numeric or attribute.derived):
+            return await ctx.respond(f"❌ **{attribute.name}** não pode receber dano ou cura.", ephemeral=True)
+        char_id = await repository.find_character_id(owner.id, sistema, campanha, personagem)
+        if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
+        # Dano e cura respeitam os limites do schema (ex.: PV não fica negativo)
+        minimum, maximum = (attribute.minimum, attribute.maximum) if attribute else (None, None)
+        value = await repository.adjust_attribute(char_id, atributo, delta, minimum, maximum)
+        change = f"**{delta:+d} {atributo}** em **{personagem}**"
+        if value is not None: return await ctx.respond(f"✅ {change}: agora **{value}**.")
+        # Com a fila de escrita ligada o valor final só é conhecido quando ela grava
+        if repository.write_behind_enabled(): return await ctx.respond(f"✅ {change}.")
+        await ctx.respond(f"❌ A ficha não tem um atributo numérico **{atributo}**.", ephemeral=True)
+
+    @ficha.command(name="dano", description="Aplica dano a um atributo da ficha (padrão: PV).")
+    async def dano(self, ctx: discord.ApplicationContext,
+                   sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                   campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                   personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                   valor: Option(int, "Quantidade de dano", min_value=1),
+                   atributo: Option(str, "Atributo", default="PV"),
+                   jogador: Option(discord.Member, "[MESTRE] Dono da ficha", default=None)):
+        await self.adjust(ctx, jogador, sistema, campanha, personagem, atributo, -valor)
+
+    @ficha.command(name="curar", description="Recupera um atributo da ficha (padrão: PV).")
+    async def curar(self, ctx: discord.ApplicationContext,
+                    sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                    campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                    personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                    valor: Option(int, "Quantidade de cura", min_value=1),
+                    atributo: Option(str, "Atributo", default="PV"),
+                    jogador: Option(discord.Member, "[MESTRE] Dono da ficha", default=None)):
+        await self.adjust(ctx, jogador, sistema, campanha, personagem, atributo, valor)
 
     inventario = SlashCommandGroup("inventario", "Comandos para gerenciar o inventário.")
     dinheiro = SlashCommandGroup("dinheiro", "Comandos para gerenciar o dinheiro.")
@@ -96,64 +313,94 @@ class RPGCog(commands.Cog):
     @dinheiro.command(name="adicionar", description="[MESTRE] Adiciona dinheiro a um personagem.")
     @commands.has_permissions(manage_guild=True)
     async def money_add(self, ctx: discord.ApplicationContext, jogador: Option(discord.Member, "Jogador"),
-                        sistema: Option(str, "Sistema"), campanha: Option(str, "Campanha"),
-                        personagem: Option(str, "Personagem"), quantidade: Option(float, "Quantidade")):
-        char_id = database.find_character_id(jogador.id, sistema, campanha, personagem)
+                        sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                        campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                        personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                        quantidade: Option(float, "Quantidade")):
+        char_id = await repository.find_character_id(jogador.id, sistema, campanha, personagem)
         if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
-        database.modify_money(char_id, quantidade)
+        await repository.modify_money(char_id, quantidade)
         await ctx.respond(f"✅ Adicionado **{quantidade}** de dinheiro para **{personagem}**.", ephemeral=True)
 
     @inventario.command(name="adicionar", description="[MESTRE] Adiciona um item a um personagem.")
     @commands.has_permissions(manage_guild=True)
     async def inv_add(self, ctx: discord.ApplicationContext, jogador: Option(discord.Member, "Jogador"),
-                      sistema: Option(str, "Sistema"), campanha: Option(str, "Campanha"),
-                      personagem: Option(str, "Personagem"), item: Option(str, "Item"),
-                      quantidade: Option(int, "Qtd", default=1), descricao: Option(str, "Descrição", default="")):
-        char_id = database.find_character_id(jogador.id, sistema, campanha, personagem)
+                      sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                      campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                      personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                      item: Option(str, "Item"), quantidade: Option(int, "Qtd", default=1),
+                      descricao: Option(str, "Descrição", default="")):
+        char_id = await repository.find_character_id(jogador.id, sistema, campanha, personagem)
         if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
-        database.add_item(char_id, item, quantidade, descricao)
+        await repository.add_item(char_id, item, quantidade, descricao)
         await ctx.respond(f"✅ **{quantidade}x {item}** adicionado ao inventário de **{personagem}**.", ephemeral=True)
 
+    @inventario.command(name="distribuir", description="[MESTRE] Distribui itens e dinheiro ao grupo de uma campanha.")
+    @commands.has_permissions(manage_guild=True)
+    async def inv_distribute(self, ctx: discord.ApplicationContext, sistema: Option(str, "Sistema"),
+                             campanha: Option(str, "Campanha"), item: Option(str, "Item", default=None),
+                             quantidade: Option(int, "Qtd por personagem", min_value=1, default=1),
+                             dinheiro: Option(float, "Dinheiro por personagem", default=0.0),
+                             personagens: Option(str, "Nomes separados por vírgula (padrão: todos da campanha)",
+                                                 default=None),
+                             descricao: Option(str, "Descrição do item", default="")):
+        if not item and not dinheiro: return await ctx.respond("❌ Informe um item ou dinheiro.", ephemeral=True)
+        party = await repository.list_campaign_characters(sistema, campanha, member_ids(ctx.guild))
+        if personagens:
+            wanted = {name.strip().lower() for name in personagens.split(",") if name.strip()}
+            party = [character for character in party if character[2] in wanted]
+            missing = wanted - {character[2] for character in party}
+            if missing: return await ctx.respond(f"❌ Fichas não encontradas: {', '.join(sorted(missing))}.",
+                                                 ephemeral=True)
+        if not party: return await ctx.respond("❌ Nenhuma ficha nessa campanha.", ephemeral=True)
+        # Uma transação para o grupo inteiro: ou todos recebem, ou ninguém
+        items = [(char_id, item, quantidade, descricao) for char_id, _, _ in party] if item else []
+        await repository.apply_deltas(items, [(char_id, dinheiro) for char_id, _, _ in party])
+        reward = " e ".join(part for part in (f"**{quantidade}x {item}**" if item else "",
+                                              f"**{dinheiro}** de dinheiro" if dinheiro else "") if part)
+        names = ", ".join(name.title() for _, _, name in party)
+        await ctx.respond(f"✅ {reward} para {names}."[:2000], ephemeral=True)
+
     @inventario.command(name="remover", description="Remove um item do seu inventário.")
-    async def inv_remove(self, ctx: discord.ApplicationContext, sistema: Option(str, "Sistema"),
-                         campanha: Option(str, "Campanha"), personagem: Option(str, "Personagem"),
-                         item: Option(str, "Item"), quantidade: Option(int, "Qtd", default=1)):
-        char_id = database.find_character_id(ctx.author.id, sistema, campanha, personagem)
+    async def inv_remove(self, ctx: discord.ApplicationContext,
+                         sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                         campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                         personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                         item: Option(str, "Item", autocomplete=complete_items),
+                         quantidade: Option(int, "Qtd", default=1)):
+        char_id = await repository.find_character_id(ctx.author.id, sistema, campanha, personagem)
         if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
         try:
-            database.remove_item(char_id, item, quantidade)
+            await repository.remove_item(char_id, item, quantidade)
             await ctx.respond(f"✅ **{quantidade}x {item}** removido do inventário de **{personagem}**.", ephemeral=True)
         except ValueError as e:
             await ctx.respond(f"❌ {e}", ephemeral=True)
 
     @inventario.command(name="ver", description="Mostra seu inventário e dinheiro.")
-    async def inv_view(self, ctx: discord.ApplicationContext, sistema: Option(str, "Sistema"),
-                       campanha: Option(str, "Campanha"), personagem: Option(str, "Personagem")):
-        char_id = database.find_character_id(ctx.author.id, sistema, campanha, personagem)
-        if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
-        sheet = database.get_character_sheet(char_id)
-        inventory = database.get_inventory(char_id)
-        embed = discord.Embed(title=f"🎒 Inventário de {personagem}", color=discord.Color.dark_orange())
-        embed.add_field(name="💰 Dinheiro", value=f"{sheet.get('money', 0):.2f}", inline=False)
-        if not inventory:
-            embed.description = "O inventário está vazio."
-        else:
-            for item in inventory:
-                embed.add_field(name=f"{item['item_name']} (x{item['quantity']})",
-                                value=item['description'] or "Sem descrição.", inline=False)
-        await ctx.respond(embed=embed, ephemeral=True)
+    async def inv_view(self, ctx: discord.ApplicationContext,
+                       sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                       campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                       personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                       pagina: Option(int, "Página", min_value=1, default=1)):
+        char_id = await repository.find_character_id(ctx.author.id, sistema, campanha, personagem)
+        embed, pages = await inventory_page(char_id, pagina) if char_id else (None, 0)
+        if not embed: return await ctx.respond("❌ Ficha não encontrada.", ephemeral=True)
+        view = page_view(inventory_page, char_id, ctx.author.id, min(pagina, pages), pages)
+        await ctx.respond(embed=embed, ephemeral=True, **({"view": view} if view else {}))
 
     efeito = SlashCommandGroup("efeito", "Comandos para gerenciar efeitos de status.")
 
     @efeito.command(name="aplicar", description="[MESTRE] Aplica um efeito de status em um personagem.")
     @commands.has_permissions(manage_guild=True)
     async def effect_apply(self, ctx: discord.ApplicationContext, jogador: Option(discord.Member, "Jogador"),
-                           sistema: Option(str, "Sistema"), campanha: Option(str, "Campanha"),
-                           personagem: Option(str, "Personagem"), efeito: Option(str, "Efeito"),
+                           sistema: Option(str, "Sistema", autocomplete=complete_systems),
+                           campanha: Option(str, "Campanha", autocomplete=complete_campaigns),
+                           personagem: Option(str, "Personagem", autocomplete=complete_characters),
+                           efeito: Option(str, "Efeito"),
                            duracao: Option(int, "Duração em turnos")):
-        char_id = database.find_character_id(jogador.id, sistema, campanha, personagem)
+        char_id = await repository.find_character_id(jogador.id, sistema, campanha, personagem)
         if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
-        database.apply_effect(char_id, efeito, duracao, ctx.author.id)
+        await repository.apply_effect(char_id, efeito, duracao, ctx.author.id)
         await ctx.respond(f"✅ Efeito **{efeito}** aplicado em **{personagem}** por **{duracao}** turnos.",
                           ephemeral=True)
 
@@ -162,65 +409,228 @@ class RPGCog(commands.Cog):
     @iniciativa.command(name="adicionar", description="Adiciona um personagem à iniciativa.")
     async def iniciativa_add(self, ctx: discord.ApplicationContext, nome: Option(str, "Nome"),
                              valor: Option(int, "Iniciativa"),
-                             jogador: Option(discord.Member, "Mencione o jogador (opcional)", default=None)):
-        server_id = ctx.guild.id
-        if server_id not in self.initiative_trackers: self.initiative_trackers[server_id] = {"combatants": [],
-                                                                                             "turn_index": -1}
-        tracker = self.initiative_trackers[server_id]
-        tracker["combatants"].append({"name": nome, "value": valor, "user_id": jogador.id if jogador else None})
-        tracker["combatants"].sort(key=lambda x: x["value"], reverse=True)
+                             jogador: Option(discord.Member, "Mencione o jogador (opcional)", default=None),
+                             sistema: Option(str, "Sistema da ficha vinculada (opcional)", default=None,
+                                             autocomplete=complete_systems),
+                             campanha: Option(str, "Campanha da ficha vinculada (opcional)", default=None,
+                                              autocomplete=complete_campaigns),
+                             personagem: Option(str, "Ficha vinculada, para passar os efeitos (opcional)",
+                                                default=None, autocomplete=complete_characters)):
+        char_id = None
+        if personagem:
+            if not sistema or not campanha:
+                return await ctx.respond("❌ Informe sistema e campanha para vincular a ficha.", ephemeral=True)
+            owner = jogador or ctx.author
+            char_id = await repository.find_character_id(owner.id, sistema, campanha, personagem)
+            if not char_id: return await ctx.respond(f"❌ Ficha não encontrada.", ephemeral=True)
+        await self.initiative.add(ctx.guild.id, ctx.channel.id, nome, valor, jogador.id if jogador else None, char_id)
         await ctx.respond(f"✅ **{nome}** adicionado à iniciativa com valor **{valor}**.", ephemeral=True)
 
     @iniciativa.command(name="ver", description="Mostra a ordem de iniciativa atual.")
     async def iniciativa_ver(self, ctx: discord.ApplicationContext):
-        server_id = ctx.guild.id
-        if server_id not in self.initiative_trackers or not self.initiative_trackers[server_id]["combatants"]:
+        tracker = await self.initiative.get(ctx.guild.id, ctx.channel.id)
+        if not tracker.combatants:
             return await ctx.respond("⚔️ A lista de iniciativa está vazia.", ephemeral=True)
-        tracker = self.initiative_trackers[server_id]
         embed = discord.Embed(title="⚔️ Ordem de Iniciativa ⚔️", color=discord.Color.gold())
         description = ""
-        for i, combatant in enumerate(tracker["combatants"]):
-            arrow = "▶️ " if i == tracker["turn_index"] else ""
+        for i, combatant in enumerate(tracker.combatants):
+            arrow = "▶️ " if i == tracker.turn_index else ""
             description += f"**{i + 1}.** {arrow}`{combatant['value']:<2}` - {combatant['name']}\n"
         embed.description = description
         await ctx.respond(embed=embed)
 
     @iniciativa.command(name="proximo", description="Avança para o próximo turno e aplica efeitos.")
     async def iniciativa_next(self, ctx: discord.ApplicationContext):
-        server_id = ctx.guild.id
-        if server_id not in self.initiative_trackers or not self.initiative_trackers[server_id]["combatants"]:
-            return await ctx.respond("⚔️ Lista de iniciativa vazia.", ephemeral=True)
-        tracker = self.initiative_trackers[server_id]
-        tracker["turn_index"] = (tracker["turn_index"] + 1) % len(tracker["combatants"])
+        tracker, expired = await self.initiative.advance(ctx.guild.id, ctx.channel.id)
+        if not tracker: return await ctx.respond("⚔️ Lista de iniciativa vazia.", ephemeral=True)
         await self.iniciativa_ver(ctx)
+        if expired:
+            lines = [f"**{name}**: {', '.join(effects)}" for name, effects in expired.items()]
+            await ctx.followup.send("⌛ Efeitos encerrados nesta rodada:\n" + "\n".join(lines))
 
     @iniciativa.command(name="zerar", description="Limpa a lista de iniciativa.")
     async def iniciativa_clear(self, ctx: discord.ApplicationContext):
-        server_id = ctx.guild.id
-        if server_id in self.initiative_trackers:
-            self.initiative_trackers.pop(server_id)
+        await self.initiative.clear(ctx.guild.id, ctx.channel.id)
         await ctx.respond("✅ A lista de iniciativa foi zerada!", ephemeral=True)
 
+    campanha = SlashCommandGroup("campanha", "Comandos para gerenciar campanhas inteiras.")
+
+    @campanha.command(name="exportar", description="[MESTRE] Exporta personagens da campanha e seus NPCs.")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_export(self, ctx: discord.ApplicationContext, sistema: Option(str, "Sistema"),
+                              campanha: Option(str, "Campanha"),
+                              formato: Option(str, "Formato do arquivo", choices=list(transfer.FORMATS),
+                                              default="ndjson")):
+        await ctx.defer(ephemeral=True)
+        await repository.flush()
+        handle, count = await repository.run(transfer.export_to_tempfile, formato, system=sistema,
+                                             campaign=campanha, npc_user_id=ctx.author.id,
+                                             user_ids=member_ids(ctx.guild))
+        with handle:
+            arquivo = discord.File(handle, filename=f"{campanha.lower().replace(' ', '_')}.{formato}")
+            await ctx.followup.send(f"✅ **{count}** registros exportados.", file=arquivo, ephemeral=True)
+
+    @campanha.command(name="importar", description="[MESTRE] Importa personagens e NPCs de um arquivo NDJSON/CSV.")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_import(self, ctx: discord.ApplicationContext,
+                              arquivo: Option(discord.Attachment, "Arquivo exportado (.ndjson ou .csv)")):
+        await ctx.defer(ephemeral=True)
+        formato = "csv" if arquivo.filename.lower().endswith(".csv") else "ndjson"
+        try:
+            stats = await repository.run(transfer.import_bytes, await arquivo.read(), formato,
+                                         user_ids=member_ids(ctx.guild))
+        except ValueError as e:
+            return await ctx.followup.send(f"❌ Arquivo inválido: {e}", ephemeral=True)
+        await ctx.followup.send(f"✅ {stats['characters']} personagens e {stats['npcs']} NPCs importados "
+                                f"({stats['skipped']} já existentes ignorados).", ephemeral=True)
+
+    async def send_campaign_list(self, ctx: discord.ApplicationContext, render):
+        # render(cursor, página) monta uma página; os botões pedem as seguintes pelo cursor
+        await ctx.defer(ephemeral=True)
+        embed, after = await render(None, 1)
+        view = keyset_view(render, ctx.author.id, after)
+        await ctx.followup.send(embed=embed, ephemeral=True, **({"view": view} if view else {}))
+
+    @campanha.command(name="grupo", description="[MESTRE] Lista as fichas da campanha com dinheiro e atributos.")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_roster(self, ctx: discord.ApplicationContext,
+                              sistema: Option(str, "Sistema", autocomplete=complete_system_names),
+                              campanha: Option(str, "Campanha")):
+        schema = systems.registry.get(sistema)
+        stats = [attribute.name for attribute in schema.attributes
+                 if attribute.numeric and not attribute.derived][:ROSTER_STATS] if schema else []
+        members = member_ids(ctx.guild)
+        summary = await repository.campaign_summary(sistema, campanha, members)
+        description = f"{summary['characters']} fichas | 💰 {summary['money']:.2f} no grupo"
+
+        async def render(after, page):
+            rows, after = await repository.campaign_roster(sistema, campanha, members, stats, after)
+            fields = [(row['character_name'].title(),
+                       " | ".join([f"💰 {row['money'] or 0:.2f}",
+                                   *(f"{name.title()}: {value}" for name, value in row['stats'].items())])
+                       + f"\n<@{row['user_id']}>") for row in rows]
+            return campaign_embed(f"🛡️ {campanha.title()}", description, fields, page, after), after
+
+        await self.send_campaign_list(ctx, render)
+
+    @campanha.command(name="ricos", description="[MESTRE] Ranking de dinheiro das fichas da campanha.")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_richest(self, ctx: discord.ApplicationContext,
+                               sistema: Option(str, "Sistema", autocomplete=complete_system_names),
+                               campanha: Option(str, "Campanha")):
+        members = member_ids(ctx.guild)
+
+        async def render(after, page):
+            rows, after = await repository.campaign_richest(sistema, campanha, members, after, CAMPAIGN_PAGE_SIZE)
+            start = (page - 1) * CAMPAIGN_PAGE_SIZE
+            fields = [(f"{start + position}. {row['character_name'].title()}",
+                       f"💰 {row['money'] or 0:.2f} | <@{row['user_id']}>") for position, row in enumerate(rows, 1)]
+            return campaign_embed(f"💰 Mais ricos de {campanha.title()}", None, fields, page, after), after
+
+        await self.send_campaign_list(ctx, render)
+
+    @campanha.command(name="item", description="[MESTRE] Mostra quem tem um item (busca pelo começo do nome).")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_items(self, ctx: discord.ApplicationContext,
+                             sistema: Option(str, "Sistema", autocomplete=complete_system_names),
+                             campanha: Option(str, "Campanha"), item: Option(str, "Item")):
+        members = member_ids(ctx.guild)
+
+        async def render(after, page):
+            rows, after = await repository.campaign_item_holders(sistema, campanha, members, item, after)
+            fields = [(row['character_name'].title(),
+                       ", ".join(f"{entry['item_name']} (x{entry['quantity']})" for entry in row['items'])
+                       + f"\n<@{row['user_id']}>") for row in rows]
+            return campaign_embed(f"🎒 Quem tem \"{item}\" em {campanha.title()}", None, fields, page, after), after
+
+        await self.send_campaign_list(ctx, render)
+
+    @campanha.command(name="efeitos", description="[MESTRE] Lista as fichas da campanha com efeitos ativos.")
+    @commands.has_permissions(manage_guild=True)
+    async def campaign_effects(self, ctx: discord.ApplicationContext,
+                               sistema: Option(str, "Sistema", autocomplete=complete_system_names),
+                               campanha: Option(str, "Campanha")):
+        members = member_ids(ctx.guild)
+
+        async def render(after, page):
+            rows, after = await repository.campaign_effects(sistema, campanha, members, after)
+            fields = [(row['character_name'].title(), format_effects(row['effects']) + f"\n<@{row['user_id']}>")
+                      for row in rows]
+            return campaign_embed(f"🌀 Efeitos em {campanha.title()}", None, fields, page, after), after
+
+        await self.send_campaign_list(ctx, render)
+
     npc = SlashCommandGroup("npc", "Comandos para gerenciar NPCs rápidos.")
 
-    @commands.slash_command(name="rolar", description="Rola dados (ex: 1d20, 2d6+3).")
-    async def rolar(self, ctx: discord.ApplicationContext, notacao: Option(str, "A notação do dado")):
-        pattern = re.compile(r"(\d+)?d(\d+)([+-]\d+)?")
-        match = pattern.fullmatch(notacao.lower().strip())
-        if not match: return await ctx.respond(f"❌ Formato inválido: `{notacao}`.", ephemeral=True)
-        num_dados_str, num_faces_str, mod_str = match.groups()
-        num_dados = int(num_dados_str) if num_dados_str else 1
-        num_faces = int(num_faces_str)
-        modificador = int(mod_str) if mod_str else 0
-        rolagens = [random.randint(1, num_faces) for _ in range(num_dados)]
-        total = sum(rolagens) + modificador
+    @npc.command(name="criar", description="[MESTRE] Cria um NPC rápido.")
+    @commands.has_permissions(manage_guild=True)
+    async def npc_create(self, ctx: discord.ApplicationContext, nome: Option(str, "Nome do NPC"),
+                         status: Option(str, "Status no formato PV=10, Força=3")):
+        try:
+            await repository.create_npc(ctx.author.id, nome, parse_npc_stats(status))
+        except ValueError as e:
+            return await ctx.respond(f"❌ {e}", ephemeral=True)
+        await ctx.respond(f"✅ NPC **{nome}** criado.", ephemeral=True)
+
+    @npc.command(name="ver", description="Mostra os status de um dos seus NPCs.")
+    async def npc_view(self, ctx: discord.ApplicationContext,
+                       nome: Option(str, "Nome do NPC", autocomplete=complete_npcs)):
+        npc = await repository.get_npc(ctx.author.id, nome)
+        if not npc: return await ctx.respond("❌ NPC não encontrado.", ephemeral=True)
+        embed = discord.Embed(title=f"👤 {npc['name']}", color=discord.Color.dark_green())
+        for name, value in npc['stats'].items():
+            embed.add_field(name=name, value=value or "N/A", inline=True)
+        if not npc['stats']: embed.description = "Sem status."
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @npc.command(name="listar", description="Lista seus NPCs, página a página.")
+    async def npc_list(self, ctx: discord.ApplicationContext, pagina: Option(int, "Página", min_value=1, default=1)):
+        npcs, total = await repository.search_npcs(ctx.author.id, limit=NPC_PAGE_SIZE,
+                                                   offset=(pagina - 1) * NPC_PAGE_SIZE)
+        if not npcs: return await ctx.respond("📭 Nenhum NPC nesta página.", ephemeral=True)
+        await ctx.respond(embed=npc_page_embed("👥 Seus NPCs", npcs, total, pagina), ephemeral=True)
+
+    @npc.command(name="buscar", description="Filtra e ordena seus NPCs por status (ex: PV < 10).")
+    async def npc_search(self, ctx: discord.ApplicationContext,
+                         filtro: Option(str, "Filtros numéricos, ex: PV < 10, Força >= 3", default=""),
+                         ordenar: Option(str, "Status usado para ordenar", default=None),
+                         decrescente: Option(bool, "Ordem decrescente", default=False),
+                         pagina: Option(int, "Página", min_value=1, default=1)):
+        try:
+            npcs, total = await repository.search_npcs(ctx.author.id, parse_npc_filters(filtro), ordenar, decrescente,
+                                                       limit=NPC_PAGE_SIZE, offset=(pagina - 1) * NPC_PAGE_SIZE)
+        except ValueError as e:
+            return await ctx.respond(f"❌ {e}", ephemeral=True)
+        if not npcs: return await ctx.respond("📭 Nenhum NPC encontrado.", ephemeral=True)
+        await ctx.respond(embed=npc_page_embed("🔎 NPCs encontrados", npcs, total, pagina), ephemeral=True)
+
+    @commands.slash_command(name="rolar", description="Rola dados (ex: 1d20, 2d6+3, 4d6kh3, d20adv, 3d6!).")
+    async def rolar(self, ctx: discord.ApplicationContext, notacao: Option(str, "A notação do dado"),
+                    modo: Option(str, "Rolar ou calcular a distribuição exata", choices=["rolar", "estatisticas"],
+                                 default="rolar")):
+        if modo == "estatisticas": return await self.rolar_estatisticas(ctx, notacao)
+        try:
+            resultado = dice.roll(notacao)
+        except ValueError as e:
+            return await ctx.respond(f"❌ {e}", ephemeral=True)
         embed = discord.Embed(title=f"🎲 Rolagem de Dados: {notacao}", color=discord.Color.blurple())
-        embed.add_field(name="Total Final", value=f"**` {total} `**", inline=False)
-        if num_dados > 1 or modificador != 0:
-            embed.add_field(name="Rolagens", value=f"`{rolagens} + ({modificador})`", inline=True)
+        embed.add_field(name="Total Final", value=f"**` {resultado.total} `**", inline=False)
+        if sum(len(r.rolls) for r in resultado.rolls) > 1 or resultado.modifier != 0:
+            embed.add_field(name="Rolagens", value=f"```{dice.format_rolls(resultado)[:1000]}```", inline=True)
         embed.set_footer(text=f"Rolado por {ctx.author.display_name}")
         await ctx.respond(embed=embed)
 
+    async def rolar_estatisticas(self, ctx: discord.ApplicationContext, notacao: str):
+        try:
+            # Convoluções grandes rodam fora do event loop
+            distribuicao = await asyncio.to_thread(dice.distribution, notacao)
+        except ValueError as e:
+            return await ctx.respond(f"❌ {e}", ephemeral=True)
+        embed = discord.Embed(title=f"📊 Distribuição: {notacao}", color=discord.Color.blurple())
+        for name, value in dice.summarize(distribuicao):
+            embed.add_field(name=name, value=value, inline=True)
+        await ctx.respond(embed=embed)
+
     @commands.slash_command(name="ping", description="Verifica a latência do bot.")
     async def ping(self, ctx: discord.ApplicationContext):
         latency = self.bot.latency * 1000
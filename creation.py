@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import repository
+from systems import SystemRegistry
+
+# Rascunhos sem atividade por mais tempo que isso são descartados
+DRAFT_TTL = 24 * 60 * 60
+MODAL_FIELDS = 5  # limite de campos por modal do Discord
+
+
+# Uma criação de ficha em andamento; o estado é só "quais atributos já foram respondidos"
+class CreationSession:
+    def __init__(self, user_id: int, channel_id: int, system: str, campaign: str, attributes: List[str],
+                 data: Optional[Dict[str, str]] = None, updated_at: Optional[float] = None):
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.system = system
+        self.campaign = campaign
+        self.attributes = attributes
+        self.data = data or {}
+        self.updated_at = updated_at or time.time()
+        # Mensagens dos valores recusados na última resposta (ex.: PV não numérico); o atributo é perguntado de novo
+        self.errors: List[str] = []
+        # Interação mais recente, usada para responder de forma efêmera enquanto o token vale
+        self.interaction = None
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.user_id, self.channel_id
+
+    def remaining(self) -> List[str]:
+        return [attr for attr in self.attributes if attr.lower() not in self.data]
+
+    def pending(self) -> Optional[str]:
+        remaining = self.remaining()
+        return remaining[0] if remaining else None
+
+    def next_modal_fields(self) -> List[str]:
+        return self.remaining()[:MODAL_FIELDS]
+
+    @property
+    def part(self) -> int:
+        return (len(self.attributes) - len(self.remaining())) // MODAL_FIELDS + 1
+
+    @property
+    def finished(self) -> bool:
+        return not self.remaining()
+
+
+# Todas as sessões ficam num dict (usuário, canal) -> sessão: um único listener de mensagens despacha em O(1)
+class CreationSessionManager:
+    def __init__(self, systems: SystemRegistry):
+        self.systems = systems
+        self._sessions: Dict[Tuple[int, int], CreationSession] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def preload(self, drafts: List[Dict]):
+        # Rascunhos lidos antes de o bot conectar (ou na primeira chamada de ensure_loaded)
+        for draft in drafts:
+            schema = self.systems.get(draft['system'])
+            if schema is None: continue
+            session = CreationSession(draft['user_id'], draft['channel_id'], draft['system'], draft['campaign'],
+                                      schema.fields, draft['data'], draft['updated_at'])
+            self._sessions.setdefault(session.key, session)
+        self._loaded = True
+
+    async def ensure_loaded(self):
+        if self._loaded: return
+        async with self._load_lock:
+            if self._loaded: return
+            self.preload(await repository.load_creation_drafts())
+
+    def get(self, user_id: int, channel_id: int) -> Optional[CreationSession]:
+        return self._sessions.get((user_id, channel_id))
+
+    async def _save(self, session: CreationSession):
+        session.updated_at = time.time()
+        await repository.save_creation_draft(session.user_id, session.channel_id, session.system, session.campaign,
+                                             session.data, session.updated_at)
+
+    def _validate(self, session: CreationSession, values: Dict[str, str]):
+        # Guarda só os valores aceitos pelo schema do sistema (relido a cada resposta, acompanhando o hot reload)
+        schema = self.systems.get(session.system)
+        session.errors = []
+        for name, value in values.items():
+            attribute = schema.attribute(name) if schema else None
+            try:
+                session.data[name.lower()] = attribute.validate(value) if attribute else value
+            except ValueError as e:
+                session.errors.append(str(e))
+
+    async def start(self, user_id: int, channel_id: int, system: str, campaign: str,
+                    values: Optional[Dict[str, str]] = None) -> CreationSession:
+        await self.ensure_loaded()
+        schema = self.systems.get(system)
+        if schema is None: raise ValueError(f"Sistema desconhecido: '{system}'.")
+        session = CreationSession(user_id, channel_id, schema.key, campaign, schema.fields)
+        self._validate(session, values or {})
+        self._sessions[session.key] = session
+        await self._save(session)
+        return session
+
+    async def answer(self, session: CreationSession, values: Dict[str, str]) -> CreationSession:
+        self._validate(session, values)
+        await self._save(session)
+        return session
+
+    async def finish(self, session: CreationSession) -> str:
+        # Remove o rascunho mesmo se a ficha não puder ser salva, para não prender o canal
+        self._sessions.pop(session.key, None)
+        await repository.delete_creation_draft(session.user_id, session.channel_id)
+        char_name = session.data.get("nome", "Personagem Sem Nome")
+        await repository.create_character_sheet(user_id=session.user_id, system=session.system,
+                                                campaign=session.campaign, char_name=char_name,
+                                                attributes=session.data)
+        return char_name
+
+    async def discard(self, user_id: int, channel_id: int) -> bool:
+        await self.ensure_loaded()
+        session = self._sessions.pop((user_id, channel_id), None)
+        await repository.delete_creation_draft(user_id, channel_id)
+        return session is not None
+
+    async def cleanup(self, max_age: float = DRAFT_TTL) -> List[Tuple[int, int]]:
+        await self.ensure_loaded()
+        expired = await repository.delete_stale_creation_drafts(time.time() - max_age)
+        for key in expired: self._sessions.pop(key, None)
+        return expired
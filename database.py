@@ -1,14 +1,291 @@
 import sqlite3
+import copy
+import itertools
 import json
-from typing import Dict, List, Optional, Tuple
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cache import LRUCache, MISSING
+from prefix_index import CharacterIndex, PrefixIndex
 
 DB_NAME = "rpg_data.db"
+POOL_SIZE = 4
+# Shards: com SHARD_COUNT = 1 tudo fica em DB_NAME, como antes. Os bits altos do id da ficha guardam o shard.
+SHARD_COUNT = 1
+SHARD_BITS = 40
+MAX_OPEN_SHARDS = 32
+SHARD_IDLE_TIMEOUT = 300.0
+# DELETE ... RETURNING existe a partir do SQLite 3.35
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+CACHE_SIZE = 4096
+CACHE_TTL = 300.0
+
+# Pragmas aplicados a cada conexão aberta pelo pool
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# Pool de conexões
+class ConnectionPool:
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def in_use(self) -> int:
+        return self._opened - self._idle.qsize()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS: conn.execute(pragma)
+        return conn
+
+    def start(self):
+        conn = self.acquire()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            self.release(conn)
+
+    def warm(self) -> int:
+        # Abre as conexões que faltam até size e devolve todas ao pool
+        conns = []
+        try:
+            while self._opened < self.size: conns.append(self.acquire())
+        finally:
+            for conn in conns: self.release(conn)
+        return self._opened
+
+    def acquire(self) -> sqlite3.Connection:
+        self.last_used = time.monotonic()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open: self._opened += 1
+        if not can_open: return self._idle.get()
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction: conn.rollback()
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+# Roteamento: fichas por campanha, iniciativa por servidor, NPCs por usuário. Rascunhos ficam no shard 0.
+# Para outro mapeamento, herde de StorageRouter e registre com set_router.
+class StorageRouter:
+    def __init__(self, base: str, shards: int = 1):
+        self.base = base
+        self.shards = shards
+
+    def path(self, shard: int) -> str:
+        if shard == 0: return self.base
+        stem, ext = os.path.splitext(self.base)
+        return f"{stem}.shard{shard}{ext}"
+
+    def _hash(self, key: str) -> int:
+        # crc32 é estável entre execuções, ao contrário de hash()
+        return zlib.crc32(key.encode()) % self.shards if self.shards > 1 else 0
+
+    def for_campaign(self, system: str, campaign: str) -> int:
+        return self._hash(f"{system.lower()}\0{campaign.lower()}")
+
+    def for_guild(self, guild_id: int) -> int:
+        return self._hash(f"guild:{guild_id}")
+
+    def for_user(self, user_id: int) -> int:
+        return self._hash(f"user:{user_id}")
+
+    def for_character(self, char_id: int) -> int:
+        return char_id >> SHARD_BITS
+
+    def all(self) -> range:
+        return range(self.shards)
+
+
+_router: Optional[StorageRouter] = None
+
+
+def get_router() -> StorageRouter:
+    global _router
+    # Refaz o roteador padrão se DB_NAME ou SHARD_COUNT mudaram (benchmarks, transfer.py --db)
+    if _router is None or _router.base != DB_NAME or (type(_router) is StorageRouter and _router.shards != SHARD_COUNT):
+        _router = StorageRouter(DB_NAME, SHARD_COUNT)
+    return _router
+
+
+def set_router(router: StorageRouter):
+    global _router
+    close_pools()
+    _router = router
+
+
+def _group_by_shard(char_ids: Iterable[int]) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = {}
+    router = get_router()
+    for char_id in char_ids: groups.setdefault(router.for_character(char_id), []).append(char_id)
+    return groups
+
+
+# Pools abertos sob demanda, no máximo MAX_OPEN_SHARDS; os ociosos há SHARD_IDLE_TIMEOUT são fechados
+_pools: "OrderedDict[str, ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+_last_sweep = time.monotonic()
+
+
+def _close_idle_pools(now: float):
+    global _last_sweep
+    _last_sweep = now
+    for path, pool in list(_pools.items()):
+        if path != DB_NAME and not pool.in_use and now - pool.last_used > SHARD_IDLE_TIMEOUT:
+            pool.close()
+            del _pools[path]
+
+
+def _evict_pools():
+    for path, pool in list(_pools.items()):
+        if len(_pools) <= MAX_OPEN_SHARDS: break
+        if path != DB_NAME and not pool.in_use:
+            pool.close()
+            del _pools[path]
+
+
+def get_pool(path: Optional[str] = None) -> ConnectionPool:
+    path = path or DB_NAME
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is not None:
+            _pools.move_to_end(path)
+            # Marca o uso antes da varredura: ocioso até agora, o pool pedido seria fechado e devolvido fechado
+            now = pool.last_used = time.monotonic()
+            if now - _last_sweep > SHARD_IDLE_TIMEOUT / 10: _close_idle_pools(now)
+            return pool
+        pool = ConnectionPool(path)
+        pool.start()
+        # Um shard novo nasce com o schema completo
+        _migrate(pool)
+        _pools[path] = pool
+        _evict_pools()
+    return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values(): pool.close()
+        _pools.clear()
+
+
+def open_pools() -> int:
+    return len(_pools)
+
+
+@contextmanager
+def connect(shard: int = 0) -> Iterator[sqlite3.Connection]:
+    pool = get_pool(get_router().path(shard))
+    conn = pool.acquire()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.release(conn)
+
+
+# Caches de leitura, invalidados pelas funções de escrita
+_character_ids = LRUCache(CACHE_SIZE, CACHE_TTL)
+_sheets = LRUCache(CACHE_SIZE, CACHE_TTL)
+_inventories = LRUCache(CACHE_SIZE, CACHE_TTL)
+_effects = LRUCache(CACHE_SIZE, CACHE_TTL)
+# Índices de autocomplete: sem TTL, pois as escritas os atualizam no lugar em vez de invalidar
+_character_index = LRUCache(CACHE_SIZE, None)
+_item_index = LRUCache(CACHE_SIZE, None)
+_npc_index = LRUCache(CACHE_SIZE, None)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {"character_ids": _character_ids.stats(), "sheets": _sheets.stats(),
+            "inventories": _inventories.stats(), "effects": _effects.stats(),
+            "character_index": _character_index.stats(), "item_index": _item_index.stats(),
+            "npc_index": _npc_index.stats()}
+
+
+# Versão de cada ficha, avançada a cada escrita; chaveia as páginas renderizadas (pages.py). O relógio é global
+# e nunca volta: depois de clear_caches toda ficha ganha uma versão nova em vez de repetir uma antiga.
+_version_clock = itertools.count(1)
+_versions: Dict[int, int] = {}
+_base_version = 0
+
+
+def clear_caches():
+    global _base_version
+    for cache in (_character_ids, _sheets, _inventories, _effects, _character_index, _item_index, _npc_index):
+        cache.clear()
+    _versions.clear()
+    _base_version = next(_version_clock)
+
+
+def character_version(char_id: int) -> int:
+    return _versions.get(char_id, _base_version)
+
+
+def _changed(cache: LRUCache, char_id: int):
+    cache.invalidate(char_id)
+    _versions[char_id] = next(_version_clock)
+
+
+def _update_index(cache: LRUCache, key, update):
+    # Atualiza o índice carregado; se não estiver carregado, avança a geração para descartar uma carga concorrente
+    index = cache.get(key)
+    if index is MISSING: cache.invalidate(key)
+    else: update(index)
 
 
 # Banco de Dados
-def setup_database():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def _column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_info({table})"))
+
+
+def _migration_base_schema(cursor: sqlite3.Cursor):
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS characters (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -16,6 +293,9 @@ def setup_database():
         character_name TEXT NOT NULL, money REAL DEFAULT 0,
         UNIQUE(user_id, system, campaign, character_name)
     )""")
+    # Bancos antigos foram criados antes da coluna de dinheiro
+    if not _column_exists(cursor, "characters", "money"):
+        cursor.execute("ALTER TABLE characters ADD COLUMN money REAL DEFAULT 0")
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS attributes (
         id INTEGER PRIMARY KEY AUTOINCREMENT, character_id INTEGER NOT NULL,
@@ -40,207 +320,1002 @@ def setup_database():
         caster_id INTEGER NOT NULL,
         FOREIGN KEY (character_id) REFERENCES characters (id) ON DELETE CASCADE
     )""")
-    conn.commit()
-    conn.close()
+
+
+def _migration_lookup_indexes(cursor: sqlite3.Cursor):
+    # As buscas comparam lower(...), então os índices usam as mesmas expressões
+    cursor.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_characters_lookup
+        ON characters (user_id, lower(system), lower(campaign), lower(character_name))""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attributes_lookup ON attributes (character_id, lower(name))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_lookup ON inventory (character_id, lower(item_name))")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_status_effects_lookup
+        ON status_effects (character_id, lower(effect_name))""")
+    # NPCs que só diferem na caixa eram inalcançáveis por get_npc; renomeia antes de exigir unicidade e avisa
+    # cada troca, já que o dono vai procurar o NPC pelo nome antigo
+    renamed = cursor.execute("""
+    SELECT id, user_id, name, name || ' (' || id || ')' FROM npcs
+    WHERE id NOT IN (SELECT MIN(id) FROM npcs GROUP BY user_id, lower(name))""").fetchall()
+    cursor.executemany("UPDATE npcs SET name = ? WHERE id = ?", [(new, npc_id) for npc_id, _, _, new in renamed])
+    for npc_id, user_id, old, new in renamed:
+        print(f"Migração: NPC {npc_id} do usuário {user_id} renomeado de '{old}' para '{new}' "
+              f"(nome repetido sem diferenciar maiúsculas).", file=sys.stderr)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_npcs_lookup ON npcs (user_id, lower(name))")
+
+
+def _migration_initiative(cursor: sqlite3.Cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS initiative_trackers (
+        guild_id INTEGER NOT NULL, channel_id INTEGER NOT NULL, turn_index INTEGER NOT NULL DEFAULT -1,
+        PRIMARY KEY (guild_id, channel_id)
+    )""")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS initiative_combatants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, channel_id INTEGER NOT NULL,
+        name TEXT NOT NULL, value INTEGER NOT NULL, user_id INTEGER,
+        FOREIGN KEY (guild_id, channel_id) REFERENCES initiative_trackers (guild_id, channel_id) ON DELETE CASCADE
+    )""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_initiative_combatants_tracker
+        ON initiative_combatants (guild_id, channel_id)""")
+
+
+def _migration_initiative_characters(cursor: sqlite3.Cursor):
+    if not _column_exists(cursor, "initiative_combatants", "character_id"):
+        cursor.execute("""ALTER TABLE initiative_combatants
+            ADD COLUMN character_id INTEGER REFERENCES characters (id) ON DELETE SET NULL""")
+
+
+def parse_number(value) -> Optional[float]:
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    # "inf" e "nan" viram float, mas não são números de ficha (um personagem chamado "Nan", por exemplo)
+    return number if math.isfinite(number) else None
+
+
+def format_number(number: float) -> str:
+    return str(int(number)) if number == int(number) else str(round(number, 4))
+
+
+def clamp(number: float, minimum: Optional[float] = None, maximum: Optional[float] = None) -> float:
+    if minimum is not None: number = max(minimum, number)
+    if maximum is not None: number = min(maximum, number)
+    return number
+
+
+def add_number(value, delta, minimum: Optional[float] = None, maximum: Optional[float] = None) -> Optional[str]:
+    # Soma em atributos guardados como texto ("20" + -5 -> "15"), dentro dos limites; None se não for número
+    number = parse_number(value)
+    return None if number is None else format_number(clamp(number + delta, minimum, maximum))
+
+
+def _migration_npc_stats(cursor: sqlite3.Cursor):
+    # Status de NPC saem do JSON em npcs.stats para linhas chave/valor, com o valor numérico indexado
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS npc_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, npc_id INTEGER NOT NULL,
+        name TEXT NOT NULL, value TEXT, num_value NUMERIC,
+        FOREIGN KEY (npc_id) REFERENCES npcs (id) ON DELETE CASCADE
+    )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_npc_stats_lookup ON npc_stats (npc_id, lower(name))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_npc_stats_value ON npc_stats (lower(name), num_value)")
+    rows = cursor.execute("SELECT id, stats FROM npcs WHERE stats IS NOT NULL").fetchall()
+    cursor.executemany("INSERT INTO npc_stats (npc_id, name, value, num_value) VALUES (?, ?, ?, ?)",
+                       [(npc_id, name, value, parse_number(value))
+                        for npc_id, stats in rows for name, value in json.loads(stats).items()])
+    cursor.execute("UPDATE npcs SET stats = NULL")
+
+
+def _migration_creation_drafts(cursor: sqlite3.Cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS creation_drafts (
+        user_id INTEGER NOT NULL, channel_id INTEGER NOT NULL, system TEXT NOT NULL, campaign TEXT NOT NULL,
+        data TEXT NOT NULL DEFAULT '{}', updated_at REAL NOT NULL,
+        PRIMARY KEY (user_id, channel_id)
+    )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_creation_drafts_updated ON creation_drafts (updated_at)")
+
+
+def _migration_inventory_unique(cursor: sqlite3.Cursor):
+    # Soma as linhas repetidas do mesmo item (corridas do antigo SELECT-then-UPDATE) antes de exigir unicidade
+    cursor.execute("""
+    UPDATE inventory SET quantity = (
+        SELECT SUM(i.quantity) FROM inventory i
+        WHERE i.character_id = inventory.character_id AND lower(i.item_name) = lower(inventory.item_name))
+    WHERE id IN (SELECT MIN(id) FROM inventory GROUP BY character_id, lower(item_name) HAVING COUNT(*) > 1)""")
+    cursor.execute("""DELETE FROM inventory
+    WHERE id NOT IN (SELECT MIN(id) FROM inventory GROUP BY character_id, lower(item_name))""")
+    cursor.execute("DROP INDEX IF EXISTS idx_inventory_lookup")
+    cursor.execute("CREATE UNIQUE INDEX idx_inventory_lookup ON inventory (character_id, lower(item_name))")
+
+
+def _migration_initiative_cross_shard(cursor: sqlite3.Cursor):
+    # Com shards, a ficha ligada a um combatente pode estar em outro arquivo; character_id deixa de ser chave
+    # estrangeira (nenhuma ficha é apagada, então o ON DELETE SET NULL não fazia falta)
+    cursor.execute("""
+    CREATE TABLE initiative_combatants_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, channel_id INTEGER NOT NULL,
+        name TEXT NOT NULL, value INTEGER NOT NULL, user_id INTEGER, character_id INTEGER,
+        FOREIGN KEY (guild_id, channel_id) REFERENCES initiative_trackers (guild_id, channel_id) ON DELETE CASCADE
+    )""")
+    cursor.execute("""
+    INSERT INTO initiative_combatants_new (id, guild_id, channel_id, name, value, user_id, character_id)
+    SELECT id, guild_id, channel_id, name, value, user_id, character_id FROM initiative_combatants""")
+    cursor.execute("DROP TABLE initiative_combatants")
+    cursor.execute("ALTER TABLE initiative_combatants_new RENAME TO initiative_combatants")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_initiative_combatants_tracker
+        ON initiative_combatants (guild_id, channel_id)""")
+
+
+def _migration_attribute_numbers(cursor: sqlite3.Cursor):
+    # Valor numérico tipado ao lado do texto, como em npc_stats: dano e cura somam no SQL sem reinterpretar texto
+    if not _column_exists(cursor, "attributes", "num_value"):
+        cursor.execute("ALTER TABLE attributes ADD COLUMN num_value NUMERIC")
+    rows = cursor.execute("SELECT id, value FROM attributes").fetchall()
+    cursor.executemany("UPDATE attributes SET num_value = ? WHERE id = ?",
+                       [(number, attr_id) for attr_id, number in ((i, parse_number(v)) for i, v in rows)
+                        if number is not None])
+
+
+def _migration_campaign_indexes(cursor: sqlite3.Cursor):
+    # Consultas do mestre sobre a campanha inteira: fichas na ordem do nome e ranking por dinheiro, sem SCAN.
+    # O rowid (id) fica no fim de cada índice e desempata a paginação por chave.
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_characters_campaign
+        ON characters (lower(system), lower(campaign), lower(character_name))""")
+    cursor.execute("UPDATE characters SET money = 0 WHERE money IS NULL")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_characters_money
+        ON characters (lower(system), lower(campaign), money)""")
+
+
+# A posição na lista é a versão do schema gravada em PRAGMA user_version
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_lookup_indexes,
+    _migration_initiative,
+    _migration_initiative_characters,
+    _migration_npc_stats,
+    _migration_creation_drafts,
+    _migration_inventory_unique,
+    _migration_initiative_cross_shard,
+    _migration_attribute_numbers,
+    _migration_campaign_indexes,
+]
+
+
+def schema_version(shard: int = 0) -> int:
+    with connect(shard) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _migrate(pool: ConnectionPool):
+    conn = pool.acquire()
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                break
+            MIGRATIONS[version](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        # Ids de ficha de cada shard começam em shard << SHARD_BITS
+        shard = next((s for s in get_router().all() if get_router().path(s) == pool.path), 0)
+        if shard:
+            with conn:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'characters', ? WHERE NOT EXISTS "
+                             "(SELECT 1 FROM sqlite_sequence WHERE name = 'characters')", (shard << SHARD_BITS,))
+    finally:
+        pool.release(conn)
+
+
+def _existing_shards() -> List[int]:
+    router = get_router()
+    return [shard for shard in router.all() if shard == 0 or os.path.exists(router.path(shard))]
+
+
+def setup_database():
+    # Os pools migram ao abrir; aqui só abre o shard 0 e os shards que já existem em disco
+    for shard in _existing_shards(): _migrate(get_pool(get_router().path(shard)))
+
+
+def warm_up() -> int:
+    # Na inicialização: a primeira rajada de comandos não paga a abertura das conexões
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.warm() for pool in pools)
 
 
 # Função personagem
-def find_character_id(user_id: int, system: str, campaign: str, char_name: str) -> Optional[int]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM characters WHERE user_id = ? AND lower(system) = ? AND lower(campaign) = ? AND lower(character_name) = ?",
-        (user_id, system.lower(), campaign.lower(), char_name.lower()))
-    result = cursor.fetchone()
-    conn.close()
+INSERT_ATTRIBUTE_QUERY = "INSERT INTO attributes (character_id, name, value, num_value) VALUES (?, ?, ?, ?)"
+
+
+def _load_character_id(user_id: int, system: str, campaign: str, char_name: str) -> Optional[int]:
+    with connect(get_router().for_campaign(system, campaign)) as conn:
+        result = conn.execute(
+            "SELECT id FROM characters WHERE user_id = ? AND lower(system) = ? AND lower(campaign) = ? AND lower(character_name) = ?",
+            (user_id, system, campaign, char_name)).fetchone()
     return result[0] if result else None
 
 
+def find_character_id(user_id: int, system: str, campaign: str, char_name: str) -> Optional[int]:
+    key = (user_id, system.lower(), campaign.lower(), char_name.lower())
+    return _character_ids.get_or_load(key, lambda: _load_character_id(*key))
+
+
 def create_character_sheet(user_id: int, system: str, campaign: str, char_name: str, attributes: Dict[str, str]):
     if find_character_id(user_id, system, campaign, char_name): raise ValueError("Personagem já existe.")
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    try:
+    with connect(get_router().for_campaign(system, campaign)) as conn:
+        cursor = conn.cursor()
         cursor.execute("INSERT INTO characters (user_id, system, campaign, character_name) VALUES (?, ?, ?, ?)",
                        (user_id, system.lower(), campaign.lower(), char_name.lower()))
         char_id = cursor.lastrowid
-        attr_data = [(char_id, name.lower(), value) for name, value in attributes.items()]
-        cursor.executemany("INSERT INTO attributes (character_id, name, value) VALUES (?, ?, ?)", attr_data)
-        conn.commit()
-    finally:
-        conn.close()
+        attr_data = [(char_id, name.lower(), value, parse_number(value)) for name, value in attributes.items()]
+        cursor.executemany(INSERT_ATTRIBUTE_QUERY, attr_data)
+    _update_index(_character_index, user_id, lambda index: index.add(system, campaign, char_name))
 
 
-def get_character_sheet(char_id: int) -> Optional[Dict]:
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM characters WHERE id = ?", (char_id,))
-    char_data = cursor.fetchone()
-    if not char_data: return None
-    cursor.execute("SELECT name, value FROM attributes WHERE character_id = ?", (char_id,))
-    attributes = {row['name']: row['value'] for row in cursor.fetchall()}
+def _load_character_sheet(char_id: int) -> Optional[Dict]:
+    with connect(get_router().for_character(char_id)) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT * FROM characters WHERE id = ?", (char_id,))
+        char_data = cursor.fetchone()
+        if not char_data: return None
+        cursor.execute("SELECT name, value FROM attributes WHERE character_id = ? ORDER BY id", (char_id,))
+        attributes = {row['name']: row['value'] for row in cursor.fetchall()}
     sheet = dict(char_data)
     sheet['attributes'] = attributes
-    conn.close()
     return sheet
 
 
-def list_characters(user_id: int, system: str) -> List[Tuple[str, str]]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT campaign, character_name FROM characters WHERE user_id = ? AND lower(system) = ? ORDER BY campaign, character_name",
-        (user_id, system.lower()))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+def get_character_sheet(char_id: int) -> Optional[Dict]:
+    return copy.deepcopy(_sheets.get_or_load(char_id, lambda: _load_character_sheet(char_id)))
+
+
+# Ficha, atributos, efeitos e inventário numa única consulta (agregação JSON do SQLite). O inventário vem paginado
+# na ordem do índice (LIMIT -1 traz tudo) e com o total, para /inventario ver não precisar de um COUNT à parte.
+CHARACTER_VIEW_QUERY = """
+SELECT c.id, c.user_id, c.system, c.campaign, c.character_name, c.money,
+    (SELECT json_group_object(name, value) FROM
+        (SELECT name, value FROM attributes WHERE character_id = c.id ORDER BY id)) AS attributes,
+    (SELECT json_group_array(json_object('item_name', item_name, 'quantity', quantity, 'description', description)) FROM
+        (SELECT item_name, quantity, description FROM inventory WHERE character_id = c.id
+         ORDER BY lower(item_name) LIMIT ? OFFSET ?)) AS inventory,
+    (SELECT COUNT(*) FROM inventory WHERE character_id = c.id) AS inventory_total,
+    (SELECT json_group_array(json_object('id', id, 'effect_name', effect_name, 'duration', duration)) FROM
+        (SELECT id, effect_name, duration FROM status_effects WHERE character_id = c.id)) AS effects
+FROM characters c
+WHERE {where}
+"""
+VIEW_BY_NAME = "c.user_id = ? AND lower(c.system) = ? AND lower(c.campaign) = ? AND lower(c.character_name) = ?"
+
+
+def _cached_view(char_id: int, limit: int, offset: int) -> Optional[Dict]:
+    sheet, inventory, effects = _sheets.get(char_id), _inventories.get(char_id), _effects.get(char_id)
+    if any(part is MISSING for part in (sheet, inventory, effects)): return None
+    page = inventory[offset:] if limit < 0 else inventory[offset:offset + limit]
+    return copy.deepcopy(dict(sheet, inventory=page, inventory_total=len(inventory), effects=effects))
+
+
+def _load_view(shard: int, where: str, params: tuple, limit: int, offset: int,
+               key: Optional[Tuple] = None) -> Optional[Dict]:
+    caches = (_character_ids, _sheets, _inventories, _effects)
+    generations = [cache.generation() for cache in caches]
+    with connect(shard) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute(CHARACTER_VIEW_QUERY.format(where=where), (limit, offset, *params)).fetchone()
+    if not row: return None
+    view = dict(row)
+    view['attributes'] = json.loads(view['attributes'])
+    inventory, effects, total = json.loads(view.pop('inventory')), json.loads(view.pop('effects')), \
+        view.pop('inventory_total')
+    # Aquece os caches individuais para que a próxima visualização não toque o banco; o inventário só quando a
+    # página trouxe ele inteiro
+    char_id = view['id']
+    entries = [(_character_ids, key, char_id), (_sheets, char_id, view), (_effects, char_id, effects)]
+    if offset == 0 and len(inventory) == total: entries.append((_inventories, char_id, inventory))
+    for cache, cache_key, value in entries:
+        if cache_key is not None: cache.set(cache_key, copy.deepcopy(value), generations[caches.index(cache)])
+    view['inventory'], view['inventory_total'], view['effects'] = inventory, total, effects
+    return view
+
+
+def get_character_view(user_id: int, system: str, campaign: str, char_name: str) -> Optional[Dict]:
+    key = (user_id, system.lower(), campaign.lower(), char_name.lower())
+    char_id = _character_ids.get(key)
+    view = _cached_view(char_id, -1, 0) if char_id not in (MISSING, None) else None
+    if view is None:
+        view = _load_view(get_router().for_campaign(system, campaign), VIEW_BY_NAME, key, -1, 0, key)
+    if view: del view['inventory_total']
+    return view
+
+
+def get_character_page(char_id: int, inventory_limit: int = 0, inventory_offset: int = 0) -> Optional[Dict]:
+    # Tudo o que /ficha ver e /inventario ver mostram, numa ida ao banco: a ficha, os efeitos e inventory_limit
+    # itens a partir de inventory_offset, com o total em inventory_total (0 itens para a ficha, -1 para todos)
+    return _cached_view(char_id, inventory_limit, inventory_offset) or _load_view(get_router().for_character(char_id), "c.id = ?", (char_id,), inventory_limit,
+                              inventory_offset)
+
+
+def list_campaign_characters(system: str, campaign: str, user_ids: Iterable[int]) -> List[Tuple[int, int, str]]:
+    # (id, dono, nome) das fichas da campanha cujos donos estão em user_ids. As fichas não guardam o servidor:
+    # o mesmo nome de campanha em outro servidor só fica de fora pelos membros.
+    with connect(get_router().for_campaign(system, campaign)) as conn:
+        return conn.execute(
+            "SELECT id, user_id, character_name FROM characters WHERE lower(system) = ? AND lower(campaign) = ? AND user_id IN (SELECT value FROM json_each(?)) ORDER BY lower(character_name), id",
+            (system.lower(), campaign.lower(), json.dumps(list(user_ids)))).fetchall()
+
+
+# Campanha: visões do grupo inteiro para o mestre, cada página numa única consulta. As fichas saem de
+# idx_characters_campaign (ou idx_characters_money) já na ordem da página; atributos, itens e efeitos vêm por
+# ficha dos índices (character_id, ...). Paginação por chave: o cursor é a chave de ordenação da última linha
+# entregue, então a página 50 custa o mesmo que a primeira e escritas no meio não pulam nem repetem fichas.
+# As fichas não guardam o servidor: só entram as de donos em user_ids (os membros do servidor do mestre), e o
+# "+" em +c.user_id mantém a consulta no índice da campanha em vez de percorrer os membros.
+CAMPAIGN_PAGE_SIZE = 10
+CAMPAIGN_ROSTER_QUERY = """
+SELECT c.id, c.user_id, c.character_name, c.money, lower(c.character_name) AS sort_name,
+    (SELECT json_group_object(name, value) FROM
+        (SELECT name, value FROM attributes WHERE character_id = c.id AND lower(name) IN ({names}))) AS stats
+FROM characters c
+WHERE lower(c.system) = ? AND lower(c.campaign) = ? AND lower(c.character_name) >= ?
+    AND (lower(c.character_name) > ? OR c.id > ?) AND +c.user_id IN (SELECT value FROM json_each(?))
+ORDER BY lower(c.character_name), c.id LIMIT ?
+"""
+CAMPAIGN_RICHEST_QUERY = """
+SELECT c.id, c.user_id, c.character_name, c.money FROM characters c
+WHERE lower(c.system) = ? AND lower(c.campaign) = ? AND (c.money, c.id) < (?, ?)
+    AND +c.user_id IN (SELECT value FROM json_each(?))
+ORDER BY c.money DESC, c.id DESC LIMIT ?
+"""
+# ?6 e ?7: o item casa por prefixo, lower(item_name) em [?6, ?7); ?8: donos aceitos, em JSON
+CAMPAIGN_ITEMS_QUERY = """
+SELECT c.id, c.user_id, c.character_name, lower(c.character_name) AS sort_name,
+    (SELECT json_group_array(json_object('item_name', item_name, 'quantity', quantity)) FROM
+        (SELECT item_name, quantity FROM inventory
+         WHERE character_id = c.id AND lower(item_name) >= ?6 AND lower(item_name) < ?7)) AS items
+FROM characters c
+WHERE lower(c.system) = ?1 AND lower(c.campaign) = ?2 AND lower(c.character_name) >= ?3
+    AND (lower(c.character_name) > ?3 OR c.id > ?4) AND +c.user_id IN (SELECT value FROM json_each(?8))
+    AND EXISTS (SELECT 1 FROM inventory
+                WHERE character_id = c.id AND lower(item_name) >= ?6 AND lower(item_name) < ?7)
+ORDER BY lower(c.character_name), c.id LIMIT ?5
+"""
+CAMPAIGN_EFFECTS_QUERY = """
+SELECT c.id, c.user_id, c.character_name, lower(c.character_name) AS sort_name,
+    (SELECT json_group_array(json_object('effect_name', effect_name, 'duration', duration)) FROM
+        (SELECT effect_name, duration FROM status_effects WHERE character_id = c.id)) AS effects
+FROM characters c
+WHERE lower(c.system) = ? AND lower(c.campaign) = ? AND lower(c.character_name) >= ?
+    AND (lower(c.character_name) > ? OR c.id > ?) AND +c.user_id IN (SELECT value FROM json_each(?))
+    AND EXISTS (SELECT 1 FROM status_effects WHERE character_id = c.id)
+ORDER BY lower(c.character_name), c.id LIMIT ?
+"""
+
+
+def _campaign_page(system: str, campaign: str, query: str, params: tuple, limit: int,
+                   cursor_of) -> Tuple[List[Dict], Optional[Tuple]]:
+    # Busca uma linha a mais só para saber se existe próxima página; devolve (linhas, cursor da próxima ou None)
+    with connect(get_router().for_campaign(system, campaign)) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = [dict(row) for row in cursor.execute(query, params)]
+    after = cursor_of(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for row in rows: row.pop('sort_name', None)
+    return rows, after
+
+
+def _by_name(row: Dict) -> Tuple[str, int]:
+    return row['sort_name'], row['id']
+
+
+def _after_name(after: Optional[Tuple]) -> Tuple[str, str, int]:
+    # (nome, nome, id) para "nome >= ? AND (nome > ? OR id > ?)": a forma que o SQLite usa como faixa do índice
+    name, char_id = after or ("", -1)
+    return name, name, char_id
+
+
+def campaign_summary(system: str, campaign: str, user_ids: Iterable[int]) -> Dict:
+    with connect(get_router().for_campaign(system, campaign)) as conn:
+        count, money = conn.execute(
+            "SELECT COUNT(*), TOTAL(money) FROM characters WHERE lower(system) = ? AND lower(campaign) = ? "
+            "AND +user_id IN (SELECT value FROM json_each(?))",
+            (system.lower(), campaign.lower(), json.dumps(list(user_ids)))).fetchone()
+    return {"characters": count, "money": money}
+
+
+def campaign_roster(system: str, campaign: str, user_ids: Iterable[int], attributes: Iterable[str] = (),
+                    after: Optional[Tuple] = None, limit: int = CAMPAIGN_PAGE_SIZE) -> Tuple[List[Dict], Optional[Tuple]]:
+    # Fichas da campanha por nome, com dinheiro e os atributos pedidos (ex.: PV e Mana) em "stats"
+    names = [name.lower() for name in attributes]
+    query = CAMPAIGN_ROSTER_QUERY.format(names=", ".join("?" * len(names)))
+    rows, after = _campaign_page(system, campaign, query,
+                                 (*names, system.lower(), campaign.lower(), *_after_name(after),
+                                  json.dumps(list(user_ids)), limit + 1),
+                                 limit, _by_name)
+    for row in rows:
+        stats = json.loads(row['stats'])
+        # Na ordem pedida, não na do índice
+        row['stats'] = {name: stats[name] for name in sorted(stats, key=lambda stat: names.index(stat.lower()))}
+    return rows, after
+
+
+def campaign_richest(system: str, campaign: str, user_ids: Iterable[int], after: Optional[Tuple] = None,
+                     limit: int = CAMPAIGN_PAGE_SIZE) -> Tuple[List[Dict], Optional[Tuple]]:
+    return _campaign_page(system, campaign, CAMPAIGN_RICHEST_QUERY,
+                          (system.lower(), campaign.lower(), *(after or (math.inf, math.inf)),
+                           json.dumps(list(user_ids)), limit + 1),
+                          limit, lambda row: (row['money'], row['id']))
+
+
+def campaign_item_holders(system: str, campaign: str, user_ids: Iterable[int], item: str,
+                          after: Optional[Tuple] = None, limit: int = CAMPAIGN_PAGE_SIZE) -> Tuple[List[Dict], Optional[Tuple]]:
+    # Quem tem itens começando por item (sem diferenciar maiúsculas), com as quantidades
+    prefix = item.lower()
+    rows, after = _campaign_page(system, campaign, CAMPAIGN_ITEMS_QUERY,
+                                 (system.lower(), campaign.lower(), *(after or ("", -1)), limit + 1,
+                                  prefix, prefix + "\U0010ffff", json.dumps(list(user_ids))), limit, _by_name)
+    for row in rows: row['items'] = json.loads(row['items'])
+    return rows, after
+
+
+def campaign_effects(system: str, campaign: str, user_ids: Iterable[int], after: Optional[Tuple] = None,
+                     limit: int = CAMPAIGN_PAGE_SIZE) -> Tuple[List[Dict], Optional[Tuple]]:
+    rows, after = _campaign_page(system, campaign, CAMPAIGN_EFFECTS_QUERY,
+                                 (system.lower(), campaign.lower(), *_after_name(after), json.dumps(list(user_ids)),
+                                  limit + 1),
+                                 limit, _by_name)
+    for row in rows: row['effects'] = json.loads(row['effects'])
+    return rows, after
+
+
+def list_characters(user_id: int, system: Optional[str] = None) -> List[Tuple]:
+    # Com sistema: (campanha, nome); sem sistema: (sistema, campanha, nome) de todas as fichas do usuário.
+    # As fichas de um jogador podem estar em qualquer shard, então a consulta passa por todos.
+    rows = []
+    for shard in get_router().all():
+        with connect(shard) as conn:
+            if system is None:
+                rows.extend(conn.execute(
+                    "SELECT system, campaign, character_name FROM characters WHERE user_id = ?", (user_id,)))
+            else:
+                rows.extend(conn.execute(
+                    "SELECT campaign, character_name FROM characters WHERE user_id = ? AND lower(system) = ?",
+                    (user_id, system.lower())))
+    return sorted(rows)
+
+
+def character_index(user_id: int) -> CharacterIndex:
+    return _character_index.get_or_load(user_id, lambda: CharacterIndex(list_characters(user_id)))
+
+
+def cached_character_index(user_id: int) -> Optional[CharacterIndex]:
+    index = _character_index.get(user_id)
+    return None if index is MISSING else index
+
+
+UPDATE_ATTRIBUTE_QUERY = "UPDATE attributes SET value = ?, num_value = ? WHERE character_id = ? AND lower(name) = ?"
 
 
 def update_attribute(char_id: int, attr_name: str, new_value: str) -> bool:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE attributes SET value = ? WHERE character_id = ? AND lower(name) = ?",
-                   (new_value, char_id, attr_name.lower()))
-    updated = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    return updated
+    with connect(get_router().for_character(char_id)) as conn:
+        cursor = conn.execute(UPDATE_ATTRIBUTE_QUERY, (new_value, parse_number(new_value), char_id, attr_name.lower()))
+    _changed(_sheets, char_id)
+    return cursor.rowcount > 0
+
+
+# Soma em num_value e limita a [mínimo, máximo] no próprio UPDATE; o texto é regravado com o mesmo formato de
+# format_number. Parâmetros: delta, mínimo, máximo (±inf quando não há limite), ficha, atributo.
+_ADJUSTED = "max(?2, min(?3, num_value + ?1))"
+ADJUST_ATTRIBUTE_QUERY = f"""UPDATE attributes SET num_value = {_ADJUSTED},
+    value = CASE WHEN {_ADJUSTED} = CAST({_ADJUSTED} AS INTEGER) THEN CAST(CAST({_ADJUSTED} AS INTEGER) AS TEXT)
+                 ELSE CAST(round({_ADJUSTED}, 4) AS TEXT) END
+WHERE character_id = ?4 AND lower(name) = ?5 AND num_value IS NOT NULL"""
+
+
+def _bounds(minimum: Optional[float], maximum: Optional[float]) -> Tuple[float, float]:
+    return (-math.inf if minimum is None else minimum), (math.inf if maximum is None else maximum)
+
+
+def adjust_attribute(char_id: int, attr_name: str, delta: float, minimum: Optional[float] = None,
+                     maximum: Optional[float] = None) -> Optional[str]:
+    # Dano e cura: soma no próprio UPDATE, sem ler antes. Retorna o novo valor (None se não for numérico).
+    params = (delta, *_bounds(minimum, maximum), char_id, attr_name.lower())
+    with connect(get_router().for_character(char_id)) as conn:
+        if HAS_RETURNING:
+            row = conn.execute(ADJUST_ATTRIBUTE_QUERY + " RETURNING value", params).fetchone()
+        else:
+            cursor = conn.execute(ADJUST_ATTRIBUTE_QUERY, params)
+            row = cursor.rowcount and conn.execute(
+                "SELECT value FROM attributes WHERE character_id = ? AND lower(name) = ?", params[3:]).fetchone()
+    _changed(_sheets, char_id)
+    return row[0] if row else None
+
+
+def apply_queued_writes(money: Dict[int, float], attributes: List[Tuple[int, str, str, object]],
+                        effects: List[Tuple[int, str, int, int]]):
+    # Grava numa única transação por shard o que a fila de escrita (write_queue) acumulou.
+    # attributes: (ficha, nome, "set", valor) ou (ficha, nome, "add", (delta, mínimo, máximo))
+    shard_of = get_router().for_character
+    char_ids = set(money) | {char_id for char_id, *_ in attributes} | {char_id for char_id, *_ in effects}
+    for shard in sorted({shard_of(char_id) for char_id in char_ids}):
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE characters SET money = money + ? WHERE id = ?",
+                               [(amount, char_id) for char_id, amount in money.items()
+                                if amount and shard_of(char_id) == shard])
+            cursor.executemany(UPDATE_ATTRIBUTE_QUERY,
+                               [(value, parse_number(value), char_id, name) for char_id, name, kind, value in attributes
+                                if kind == "set" and shard_of(char_id) == shard])
+            cursor.executemany(ADJUST_ATTRIBUTE_QUERY,
+                               [(*value, char_id, name) for char_id, name, kind, value in attributes
+                                if kind == "add" and shard_of(char_id) == shard])
+            cursor.executemany(
+                "INSERT INTO status_effects (character_id, effect_name, duration, caster_id) VALUES (?, ?, ?, ?)",
+                [effect for effect in effects if shard_of(effect[0]) == shard])
+    for char_id in set(money) | {char_id for char_id, *_ in attributes}: _changed(_sheets, char_id)
+    for char_id in {char_id for char_id, *_ in effects}: _changed(_effects, char_id)
 
 
 # Função inv e dinheiro
 def modify_money(char_id: int, amount: float):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE characters SET money = money + ? WHERE id = ?", (amount, char_id))
-    conn.commit()
-    conn.close()
+    with connect(get_router().for_character(char_id)) as conn:
+        conn.execute("UPDATE characters SET money = money + ? WHERE id = ?", (amount, char_id))
+    _changed(_sheets, char_id)
+
+
+# Upsert atômico: o índice único em (ficha, lower(item)) faz o SQLite somar em vez de duplicar a linha
+UPSERT_ITEM_QUERY = """
+INSERT INTO inventory (character_id, item_name, quantity, description) VALUES (?, ?, ?, ?)
+ON CONFLICT (character_id, lower(item_name)) DO UPDATE SET quantity = quantity + excluded.quantity"""
+
+
+def _take_item(cursor: sqlite3.Cursor, char_id: int, item_name: str, quantity: int) -> bool:
+    # Retira com uma instrução condicional; retorna True se o item acabou. A consulta só roda para explicar o erro.
+    key = (char_id, item_name.lower(), quantity)
+    cursor.execute("""UPDATE inventory SET quantity = quantity - ?3
+        WHERE character_id = ?1 AND lower(item_name) = ?2 AND quantity > ?3""", key)
+    if cursor.rowcount: return False
+    cursor.execute("DELETE FROM inventory WHERE character_id = ?1 AND lower(item_name) = ?2 AND quantity = ?3", key)
+    if cursor.rowcount: return True
+    cursor.execute("SELECT 1 FROM inventory WHERE character_id = ? AND lower(item_name) = ?", key[:2])
+    if not cursor.fetchone(): raise ValueError(f"Item '{item_name}' não encontrado no inventário.")
+    raise ValueError(f"Quantidade de '{item_name}' a ser removida é maior que a existente.")
 
 
 def add_item(char_id: int, item_name: str, quantity: int, description: str):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, quantity FROM inventory WHERE character_id = ? AND lower(item_name) = ?",
-                   (char_id, item_name.lower()))
-    item = cursor.fetchone()
-    if item:
-        new_quantity = item[1] + quantity
-        cursor.execute("UPDATE inventory SET quantity = ? WHERE id = ?", (new_quantity, item[0]))
-    else:
-        cursor.execute("INSERT INTO inventory (character_id, item_name, quantity, description) VALUES (?, ?, ?, ?)",
-                       (char_id, item_name, quantity, description))
-    conn.commit()
-    conn.close()
+    with connect(get_router().for_character(char_id)) as conn:
+        conn.execute(UPSERT_ITEM_QUERY, (char_id, item_name, quantity, description))
+    _changed(_inventories, char_id)
+    _update_index(_item_index, char_id, lambda index: item_name in index or index.add(item_name, item_name))
 
 
 def remove_item(char_id: int, item_name: str, quantity: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, quantity FROM inventory WHERE character_id = ? AND lower(item_name) = ?",
-                   (char_id, item_name.lower()))
-    item = cursor.fetchone()
-    if not item: raise ValueError("Item não encontrado no inventário.")
-    if item[1] < quantity: raise ValueError("Quantidade a ser removida é maior que a existente.")
-
-    new_quantity = item[1] - quantity
-    if new_quantity == 0:
-        cursor.execute("DELETE FROM inventory WHERE id = ?", (item[0],))
-    else:
-        cursor.execute("UPDATE inventory SET quantity = ? WHERE id = ?", (new_quantity, item[0]))
-    conn.commit()
-    conn.close()
+    with connect(get_router().for_character(char_id)) as conn:
+        emptied = _take_item(conn.cursor(), char_id, item_name, quantity)
+    _changed(_inventories, char_id)
+    if emptied: _update_index(_item_index, char_id, lambda index: index.discard(item_name))
+
+
+def apply_deltas(items: Iterable[Tuple] = (), money: Iterable[Tuple[int, float]] = ()):
+    # Vários itens e valores de dinheiro para várias fichas numa única transação (ex.: loot do grupo).
+    # items: (ficha, item, quantidade[, descrição]), quantidade negativa retira; money: (ficha, valor).
+    # Se alguma retirada falhar, nada é aplicado. Fichas de uma campanha ficam no mesmo shard; entre
+    # shards diferentes a atomicidade é por shard.
+    merged: Dict[Tuple[int, str], list] = {}
+    for char_id, item_name, quantity, *description in items:
+        entry = merged.setdefault((char_id, item_name.lower()), [item_name, 0, description[0] if description else ""])
+        entry[1] += quantity
+    totals: Dict[int, float] = {}
+    for char_id, amount in money: totals[char_id] = totals.get(char_id, 0) + amount
+    gains = [(char_id, name, quantity, description)
+             for (char_id, _), (name, quantity, description) in merged.items() if quantity > 0]
+    losses = [(char_id, name, -quantity) for (char_id, _), (name, quantity, _) in merged.items() if quantity < 0]
+    emptied = []
+    shard_of = get_router().for_character
+    for shard in sorted({shard_of(char_id) for char_id, _ in merged} | {shard_of(char_id) for char_id in totals}):
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            cursor.executemany(UPSERT_ITEM_QUERY, [gain for gain in gains if shard_of(gain[0]) == shard])
+            for char_id, name, quantity in losses:
+                if shard_of(char_id) != shard: continue
+                if _take_item(cursor, char_id, name, quantity): emptied.append((char_id, name))
+            cursor.executemany("UPDATE characters SET money = money + ? WHERE id = ?",
+                               [(amount, char_id) for char_id, amount in totals.items()
+                                if amount and shard_of(char_id) == shard])
+    for char_id in {char_id for char_id, _ in merged}: _changed(_inventories, char_id)
+    for char_id in totals: _changed(_sheets, char_id)
+    for char_id, name, _, _ in gains:
+        _update_index(_item_index, char_id, lambda index, name=name: name in index or index.add(name, name))
+    for char_id, name in emptied: _update_index(_item_index, char_id, lambda index, name=name: index.discard(name))
+
+
+def _load_inventory(char_id: int) -> List[Dict]:
+    with connect(get_router().for_character(char_id)) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        # Mesma ordem das páginas de CHARACTER_VIEW_QUERY, para que elas possam ser servidas deste cache
+        cursor.execute("SELECT item_name, quantity, description FROM inventory WHERE character_id = ? "
+                       "ORDER BY lower(item_name)", (char_id,))
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def get_inventory(char_id: int) -> List[Dict]:
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT item_name, quantity, description FROM inventory WHERE character_id = ? ORDER BY item_name",
-                   (char_id,))
-    inventory = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return inventory
+    return copy.deepcopy(_inventories.get_or_load(char_id, lambda: _load_inventory(char_id)))
+
+
+def item_index(char_id: int) -> PrefixIndex:
+    return _item_index.get_or_load(
+        char_id, lambda: PrefixIndex((item['item_name'], item['item_name']) for item in get_inventory(char_id)))
+
+
+def cached_item_index(char_id: int) -> Optional[PrefixIndex]:
+    index = _item_index.get(char_id)
+    return None if index is MISSING else index
 
 
 # --- FUNÇÕES DE EFEITOS DE STATUS ---
 def apply_effect(char_id: int, effect_name: str, duration: int, caster_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO status_effects (character_id, effect_name, duration, caster_id) VALUES (?, ?, ?, ?)",
-                   (char_id, effect_name, duration, caster_id))
-    conn.commit()
-    conn.close()
+    with connect(get_router().for_character(char_id)) as conn:
+        conn.execute("INSERT INTO status_effects (character_id, effect_name, duration, caster_id) VALUES (?, ?, ?, ?)",
+                     (char_id, effect_name, duration, caster_id))
+    _changed(_effects, char_id)
+
+
+def _load_effects(char_id: int) -> List[Dict]:
+    with connect(get_router().for_character(char_id)) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT id, effect_name, duration FROM status_effects WHERE character_id = ?", (char_id,))
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def get_effects(char_id: int) -> List[Dict]:
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, effect_name, duration FROM status_effects WHERE character_id = ?", (char_id,))
-    effects = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return effects
-
-
-def advance_effects_turn(char_id: int) -> List[str]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE status_effects SET duration = duration - 1 WHERE character_id = ?", (char_id,))
-    cursor.execute("SELECT effect_name FROM status_effects WHERE character_id = ? AND duration = 0", (char_id,))
-    expired_effects = [row[0] for row in cursor.fetchall()]
-    cursor.execute("DELETE FROM status_effects WHERE character_id = ? AND duration <= 0", (char_id,))
-    conn.commit()
-    conn.close()
-    return expired_effects
+    return copy.deepcopy(_effects.get_or_load(char_id, lambda: _load_effects(char_id)))
+
+
+def preload_characters(char_ids: Iterable[int]) -> int:
+    # Aquece os caches de ficha e efeitos (ex.: fichas em combate) sem as cópias de get_*
+    loaded = 0
+    for char_id in set(char_ids):
+        if _sheets.get_or_load(char_id, lambda: _load_character_sheet(char_id)) is None: continue
+        _effects.get_or_load(char_id, lambda: _load_effects(char_id))
+        loaded += 1
+    return loaded
+
+
+def _tick_effects(cursor: sqlite3.Cursor, char_ids: List[int]) -> Dict[int, List[str]]:
+    expired: Dict[int, List[str]] = {char_id: [] for char_id in char_ids}
+    if not char_ids: return expired
+    placeholders = ", ".join("?" * len(char_ids))
+    cursor.execute(f"UPDATE status_effects SET duration = duration - 1 WHERE character_id IN ({placeholders})",
+                   char_ids)
+    if HAS_RETURNING:
+        cursor.execute(f"""
+        DELETE FROM status_effects WHERE character_id IN ({placeholders}) AND duration <= 0
+        RETURNING character_id, effect_name""", char_ids)
+        rows = cursor.fetchall()
+    else:
+        cursor.execute(f"""SELECT character_id, effect_name FROM status_effects
+        WHERE character_id IN ({placeholders}) AND duration <= 0""", char_ids)
+        rows = cursor.fetchall()
+        cursor.execute(f"DELETE FROM status_effects WHERE character_id IN ({placeholders}) AND duration <= 0",
+                       char_ids)
+    for char_id, effect_name in rows: expired[char_id].append(effect_name)
+    return expired
+
+
+def advance_effects_turn(char_ids: Iterable[int]) -> Dict[int, List[str]]:
+    char_ids = list(dict.fromkeys(char_ids))
+    expired: Dict[int, List[str]] = {}
+    for shard, shard_char_ids in _group_by_shard(char_ids).items():
+        with connect(shard) as conn:
+            expired.update(_tick_effects(conn.cursor(), shard_char_ids))
+    for char_id in char_ids: _changed(_effects, char_id)
+    return {char_id: expired[char_id] for char_id in char_ids}
 
 
 def remove_effect(char_id: int, effect_name: str):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM status_effects WHERE character_id = ? AND lower(effect_name) = ?",
-                   (char_id, effect_name.lower()))
-    conn.commit()
-    conn.close()
+    with connect(get_router().for_character(char_id)) as conn:
+        conn.execute("DELETE FROM status_effects WHERE character_id = ? AND lower(effect_name) = ?",
+                     (char_id, effect_name.lower()))
+    _changed(_effects, char_id)
 
 
 # Função NPC
+NPC_STATS_COLUMN = """(SELECT json_group_object(name, value) FROM
+    (SELECT name, value FROM npc_stats WHERE npc_id = n.id ORDER BY id)) AS stats"""
+# Operadores aceitos nos filtros de busca de NPC
+NPC_FILTER_OPERATORS = ("<=", ">=", "!=", "<", ">", "=")
+
+
+def _insert_npc_stats(cursor: sqlite3.Cursor, npc_id: int, stats: Dict[str, str]):
+    cursor.executemany("INSERT INTO npc_stats (npc_id, name, value, num_value) VALUES (?, ?, ?, ?)",
+                       [(npc_id, name, value, parse_number(value)) for name, value in stats.items()])
+
+
 def create_npc(user_id: int, name: str, stats: Dict[str, str]):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        stats_json = json.dumps(stats)
-        cursor.execute("INSERT INTO npcs (user_id, name, stats) VALUES (?, ?, ?)", (user_id, name, stats_json))
-        conn.commit()
+        with connect(get_router().for_user(user_id)) as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO npcs (user_id, name) VALUES (?, ?)", (user_id, name))
+            _insert_npc_stats(cursor, cursor.lastrowid, stats)
     except sqlite3.IntegrityError:
         raise ValueError(f"Você já possui um NPC chamado '{name}'.")
-    finally:
-        conn.close()
+    _update_index(_npc_index, user_id, lambda index: index.add(name, name))
 
 
 def get_npc(user_id: int, name: str) -> Optional[Dict]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, stats FROM npcs WHERE user_id = ? AND lower(name) = ?", (user_id, name.lower()))
-    result = cursor.fetchone()
-    conn.close()
+    with connect(get_router().for_user(user_id)) as conn:
+        result = conn.execute(
+            f"SELECT n.name, {NPC_STATS_COLUMN} FROM npcs n WHERE n.user_id = ? AND lower(n.name) = ?",
+            (user_id, name.lower())).fetchone()
     if not result: return None
     return {"name": result[0], "stats": json.loads(result[1])}
 
 
 def list_npcs(user_id: int) -> List[str]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM npcs WHERE user_id = ? ORDER BY name", (user_id,))
-    results = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return results
+    with connect(get_router().for_user(user_id)) as conn:
+        cursor = conn.execute("SELECT name FROM npcs WHERE user_id = ? ORDER BY name", (user_id,))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def npc_index(user_id: int) -> PrefixIndex:
+    return _npc_index.get_or_load(user_id, lambda: PrefixIndex((name, name) for name in list_npcs(user_id)))
+
+
+def cached_npc_index(user_id: int) -> Optional[PrefixIndex]:
+    index = _npc_index.get(user_id)
+    return None if index is MISSING else index
+
+
+def search_npcs(user_id: int, filters: Iterable[Tuple[str, str, float]] = (), sort_by: Optional[str] = None,
+                descending: bool = False, limit: int = 25, offset: int = 0) -> Tuple[List[Dict], int]:
+    # Ex.: filters=[("pv", "<", 10)], sort_by="força" -> NPCs com PV < 10 ordenados por Força.
+    # Tudo roda no SQL; retorna a página pedida e o total de NPCs que casam com os filtros.
+    joins, params = [], []
+    for index, (stat, operator, value) in enumerate(filters):
+        if operator not in NPC_FILTER_OPERATORS: raise ValueError(f"Operador inválido: '{operator}'.")
+        joins.append(f"JOIN npc_stats f{index} ON f{index}.npc_id = n.id AND lower(f{index}.name) = ? "
+                     f"AND f{index}.num_value {operator} ?")
+        params.extend((stat.lower(), value))
+    order = "n.name"
+    if sort_by:
+        joins.append("LEFT JOIN npc_stats s ON s.npc_id = n.id AND lower(s.name) = ?")
+        params.append(sort_by.lower())
+        order = f"s.num_value IS NULL, s.num_value {'DESC' if descending else 'ASC'}, n.name"
+    query = f"""
+    SELECT n.name, {NPC_STATS_COLUMN}, COUNT(*) OVER () AS total FROM npcs n
+    {' '.join(joins)}
+    WHERE n.user_id = ? ORDER BY {order} LIMIT ? OFFSET ?"""
+    with connect(get_router().for_user(user_id)) as conn:
+        rows = conn.execute(query, (*params, user_id, limit, offset)).fetchall()
+    npcs = [{"name": row[0], "stats": json.loads(row[1])} for row in rows]
+    return npcs, rows[0][2] if rows else 0
 
 
 def delete_npc(user_id: int, name: str) -> bool:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM npcs WHERE user_id = ? AND lower(name) = ?", (user_id, name.lower()))
-    updated = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    return updated
\ No newline at end of file
+    with connect(get_router().for_user(user_id)) as conn:
+        cursor = conn.execute("DELETE FROM npcs WHERE user_id = ? AND lower(name) = ?", (user_id, name.lower()))
+    if cursor.rowcount: _update_index(_npc_index, user_id, lambda index: index.discard(name))
+    return cursor.rowcount > 0
+
+
+# Importação e exportação em lote
+EXPORT_CHARACTERS_QUERY = """
+SELECT c.id, c.user_id, c.system, c.campaign, c.character_name, c.money,
+    (SELECT json_group_object(name, value) FROM
+        (SELECT name, value FROM attributes WHERE character_id = c.id ORDER BY id)) AS attributes,
+    (SELECT json_group_array(json_object('item_name', item_name, 'quantity', quantity, 'description', description)) FROM
+        (SELECT item_name, quantity, description FROM inventory WHERE character_id = c.id ORDER BY item_name)) AS inventory,
+    (SELECT json_group_array(json_object('effect_name', effect_name, 'duration', duration, 'caster_id', caster_id)) FROM
+        (SELECT effect_name, duration, caster_id FROM status_effects WHERE character_id = c.id ORDER BY id)) AS effects
+FROM characters c {where} ORDER BY c.id
+"""
+
+
+def iter_characters(system: Optional[str] = None, campaign: Optional[str] = None,
+                    user_ids: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+    # Gerador sobre o cursor: a memória não cresce com o tamanho da campanha.
+    # user_ids restringe aos donos informados (ex.: membros do servidor), passados como um array JSON; o "+"
+    # mantém a busca no índice da campanha em vez de sondar o índice de donos uma vez por membro
+    clauses, params = [], []
+    if user_ids is not None:
+        clauses.append("+c.user_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(user_ids)))
+    if system:
+        clauses.append("lower(c.system) = ?")
+        params.append(system.lower())
+    if campaign:
+        clauses.append("lower(c.campaign) = ?")
+        params.append(campaign.lower())
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    # Uma campanha inteira fica num shard; sem ela, percorre os shards em ordem (que é a ordem dos ids)
+    router = get_router()
+    shards = [router.for_campaign(system, campaign)] if system and campaign else router.all()
+    for shard in shards:
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            for row in cursor.execute(EXPORT_CHARACTERS_QUERY.format(where=where), params):
+                record = dict(row)
+                del record['id']
+                for key in ('attributes', 'inventory', 'effects'): record[key] = json.loads(record[key])
+                yield record
+
+
+def iter_npcs(user_id: Optional[int] = None) -> Iterator[Dict]:
+    query = f"SELECT n.user_id, n.name, {NPC_STATS_COLUMN} FROM npcs n"
+    if user_id is not None: query += " WHERE n.user_id = ?"
+    router = get_router()
+    for shard in router.all() if user_id is None else [router.for_user(user_id)]:
+        with connect(shard) as conn:
+            for row in conn.execute(query + " ORDER BY n.id", () if user_id is None else (user_id,)):
+                yield {"user_id": row[0], "name": row[1], "stats": json.loads(row[2])}
+
+
+def import_characters(records: List[Dict]) -> Tuple[int, int]:
+    imported = skipped = 0
+    users = set()
+    # Uma transação por shard; cada campanha vai inteira para o seu
+    shards: Dict[int, List[Dict]] = {}
+    router = get_router()
+    for record in records:
+        shards.setdefault(router.for_campaign(record['system'], record['campaign']), []).append(record)
+    for shard, shard_records in shards.items():
+        attributes, items, effects = [], [], []
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            for record in shard_records:
+                cursor.execute("""
+                INSERT INTO characters (user_id, system, campaign, character_name, money) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT DO NOTHING""", (record['user_id'], record['system'].lower(), record['campaign'].lower(),
+                                            record['character_name'].lower(), record.get('money') or 0))
+                if not cursor.rowcount:
+                    skipped += 1
+                    continue
+                imported += 1
+                users.add(record['user_id'])
+                char_id = cursor.lastrowid
+                attributes.extend((char_id, name.lower(), value, parse_number(value))
+                                  for name, value in record.get('attributes', {}).items())
+                items.extend((char_id, i['item_name'], i.get('quantity', 1), i.get('description'))
+                             for i in record.get('inventory', []))
+                effects.extend((char_id, e['effect_name'], e['duration'], e.get('caster_id') or 0)
+                               for e in record.get('effects', []))
+            cursor.executemany(INSERT_ATTRIBUTE_QUERY, attributes)
+            cursor.executemany(UPSERT_ITEM_QUERY, items)
+            cursor.executemany("""
+            INSERT INTO status_effects (character_id, effect_name, duration, caster_id) VALUES (?, ?, ?, ?)""", effects)
+    # Importações em lote só descartam os índices afetados; eles são reconstruídos no próximo autocomplete
+    for user_id in users: _character_index.invalidate(user_id)
+    return imported, skipped
+
+
+def import_npcs(records: List[Dict]) -> Tuple[int, int]:
+    imported = 0
+    users = set()
+    shards: Dict[int, List[Dict]] = {}
+    for record in records: shards.setdefault(get_router().for_user(record['user_id']), []).append(record)
+    for shard, shard_records in shards.items():
+        stats = []
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            for record in shard_records:
+                cursor.execute("INSERT INTO npcs (user_id, name) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                               (record['user_id'], record['name']))
+                if not cursor.rowcount: continue
+                imported += 1
+                users.add(record['user_id'])
+                stats.extend((cursor.lastrowid, name, value, parse_number(value))
+                             for name, value in record.get('stats', {}).items())
+            cursor.executemany("INSERT INTO npc_stats (npc_id, name, value, num_value) VALUES (?, ?, ?, ?)", stats)
+    for user_id in users: _npc_index.invalidate(user_id)
+    return imported, len(records) - imported
+
+
+# Função iniciativa
+def load_initiative(guild_id: int, channel_id: int) -> Dict:
+    with connect(get_router().for_guild(guild_id)) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        tracker = cursor.execute("SELECT turn_index FROM initiative_trackers WHERE guild_id = ? AND channel_id = ?",
+                                 (guild_id, channel_id)).fetchone()
+        cursor.execute("""
+        SELECT id, name, value, user_id, character_id FROM initiative_combatants
+        WHERE guild_id = ? AND channel_id = ? ORDER BY value DESC, id""", (guild_id, channel_id))
+        combatants = [dict(row) for row in cursor.fetchall()]
+    return {"turn_index": tracker['turn_index'] if tracker else -1, "combatants": combatants}
+
+
+def load_initiatives() -> List[Dict]:
+    # Todas as iniciativas de todos os shards, no formato de load_initiative (mais guild_id e channel_id)
+    states: Dict[Tuple[int, int], Dict] = {}
+    for shard in _existing_shards():
+        with connect(shard) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            for row in cursor.execute("SELECT guild_id, channel_id, turn_index FROM initiative_trackers"):
+                states[(row['guild_id'], row['channel_id'])] = dict(row, combatants=[])
+            for row in cursor.execute("""
+            SELECT guild_id, channel_id, id, name, value, user_id, character_id FROM initiative_combatants
+            ORDER BY value DESC, id"""):
+                combatant = dict(row)
+                key = (combatant.pop('guild_id'), combatant.pop('channel_id'))
+                states.setdefault(key, {"guild_id": key[0], "channel_id": key[1], "turn_index": -1,
+                                        "combatants": []})["combatants"].append(combatant)
+    return list(states.values())
+
+
+def add_initiative_combatant(guild_id: int, channel_id: int, name: str, value: int, user_id: Optional[int],
+                             turn_index: int, character_id: Optional[int] = None) -> int:
+    with connect(get_router().for_guild(guild_id)) as conn:
+        conn.execute("""
+        INSERT INTO initiative_trackers (guild_id, channel_id, turn_index) VALUES (?, ?, ?)
+        ON CONFLICT (guild_id, channel_id) DO UPDATE SET turn_index = excluded.turn_index""",
+                     (guild_id, channel_id, turn_index))
+        cursor = conn.execute("""
+        INSERT INTO initiative_combatants (guild_id, channel_id, name, value, user_id, character_id)
+        VALUES (?, ?, ?, ?, ?, ?)""", (guild_id, channel_id, name, value, user_id, character_id))
+        return cursor.lastrowid
+
+
+def set_initiative_turn(guild_id: int, channel_id: int, turn_index: int,
+                        tick_char_ids: Iterable[int] = ()) -> Dict[int, List[str]]:
+    # Avança o turno e, na virada da rodada, passa os efeitos de todos os personagens na mesma transação.
+    # Fichas guardadas em outro shard que o do servidor têm os efeitos passados numa transação própria.
+    char_ids = list(dict.fromkeys(tick_char_ids))
+    shard = get_router().for_guild(guild_id)
+    groups = _group_by_shard(char_ids)
+    with connect(shard) as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE initiative_trackers SET turn_index = ? WHERE guild_id = ? AND channel_id = ?",
+                       (turn_index, guild_id, channel_id))
+        expired = _tick_effects(cursor, groups.pop(shard, []))
+    for other, other_char_ids in groups.items():
+        with connect(other) as conn:
+            expired.update(_tick_effects(conn.cursor(), other_char_ids))
+    for char_id in char_ids: _changed(_effects, char_id)
+    return {char_id: expired[char_id] for char_id in char_ids}
+
+
+def clear_initiative(guild_id: int, channel_id: int):
+    with connect(get_router().for_guild(guild_id)) as conn:
+        conn.execute("DELETE FROM initiative_trackers WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id))
+
+
+# Rascunhos de criação de ficha
+def load_creation_drafts() -> List[Dict]:
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        drafts = [dict(row) for row in cursor.execute("SELECT * FROM creation_drafts")]
+    for draft in drafts: draft['data'] = json.loads(draft['data'])
+    return drafts
+
+
+def save_creation_draft(user_id: int, channel_id: int, system: str, campaign: str, data: Dict[str, str],
+                        updated_at: float):
+    with connect() as conn:
+        conn.execute("""
+        INSERT INTO creation_drafts (user_id, channel_id, system, campaign, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, channel_id) DO UPDATE SET
+            system = excluded.system, campaign = excluded.campaign, data = excluded.data,
+            updated_at = excluded.updated_at""",
+                     (user_id, channel_id, system, campaign, json.dumps(data), updated_at))
+
+
+def delete_creation_draft(user_id: int, channel_id: int):
+    with connect() as conn:
+        conn.execute("DELETE FROM creation_drafts WHERE user_id = ? AND channel_id = ?", (user_id, channel_id))
+
+
+def delete_stale_creation_drafts(older_than: float) -> List[Tuple[int, int]]:
+    with connect() as conn:
+        rows = conn.execute("SELECT user_id, channel_id FROM creation_drafts WHERE updated_at < ?",
+                            (older_than,)).fetchall()
+        conn.execute("DELETE FROM creation_drafts WHERE updated_at < ?", (older_than,))
+    return [tuple(row) for row in rows]
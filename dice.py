@@ -0,0 +1,332 @@
+import functools
+import math
+import random
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Limites de trabalho por chamada
+MAX_TERMS = 20
+MAX_DICE = 10_000
+MAX_FACES = 10_000
+MAX_EXPLOSIONS = 1_000
+MAX_DISPLAYED_ROLLS = 40
+# Estatísticas: tamanho máximo do suporte da distribuição e orçamentos de multiplicações por expressão
+# (convoluções e DP de "manter"). O cálculo segura o GIL mesmo numa thread, então o orçamento limita a CPU.
+MAX_DISTRIBUTION_SIZE = 200_000
+MAX_CONVOLUTION_WORK = 5_000_000
+MAX_KEEP_WORK = 20_000_000
+# Explosões mais raras que isso são descartadas no cálculo exato
+EXPLODE_TAIL = 1e-12
+# Abaixo disso o overhead do NumPy não compensa
+NUMPY_THRESHOLD = 64
+
+TERM_PATTERN = re.compile(r"""
+    \s*(?P<sign>[+-])?\s*
+    (?:
+        (?P<count>\d*)d(?P<faces>\d+|%)
+        (?P<explode>!)?
+        (?:(?P<keep>kh|kl|k)(?P<keep_count>\d+))?
+        (?P<advantage>adv|dis)?
+      | (?P<constant>\d+)
+    )\s*""", re.IGNORECASE | re.VERBOSE)
+
+
+class DiceTerm(NamedTuple):
+    sign: int
+    count: int
+    faces: int
+    explode: bool = False
+    keep: Optional[str] = None  # "h" ou "l"
+    keep_count: int = 0
+
+    def notation(self) -> str:
+        text = f"{self.count}d{self.faces}" + ("!" if self.explode else "")
+        if self.keep: text += f"k{self.keep}{self.keep_count}"
+        return text
+
+
+class ConstantTerm(NamedTuple):
+    sign: int
+    value: int
+
+    def notation(self) -> str:
+        return str(self.value)
+
+
+class TermRoll(NamedTuple):
+    term: DiceTerm
+    rolls: List[int]
+    kept: List[int]
+    subtotal: int
+
+
+class RollResult(NamedTuple):
+    total: int
+    rolls: List[TermRoll]
+    modifier: int
+
+
+class Distribution(NamedTuple):
+    offset: int
+    probabilities: List[float]
+
+    @property
+    def minimum(self) -> int:
+        return self.offset
+
+    @property
+    def maximum(self) -> int:
+        return self.offset + len(self.probabilities) - 1
+
+    def mean(self) -> float:
+        return sum((self.offset + i) * p for i, p in enumerate(self.probabilities))
+
+    def stdev(self) -> float:
+        mean = self.mean()
+        return math.sqrt(sum((self.offset + i - mean) ** 2 * p for i, p in enumerate(self.probabilities)))
+
+    def mode(self) -> int:
+        return self.offset + max(range(len(self.probabilities)), key=self.probabilities.__getitem__)
+
+    def percentile(self, pct: float) -> int:
+        accumulated = 0.0
+        for i, p in enumerate(self.probabilities):
+            accumulated += p
+            if accumulated >= pct / 100 - 1e-12: return self.offset + i
+        return self.maximum
+
+    def at_least(self, value: int) -> float:
+        start = max(0, value - self.offset)
+        return sum(self.probabilities[start:])
+
+
+# Parser
+def parse(expression: str) -> Tuple:
+    return _parse(expression.strip().lower())
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse(text: str) -> Tuple:
+    if not text: raise ValueError("Expressão vazia.")
+    terms, position = [], 0
+    while position < len(text):
+        match = TERM_PATTERN.match(text, position)
+        if not match or match.end() == position or (terms and not match.group("sign")):
+            raise ValueError(f"Formato inválido: `{text}`.")
+        position = match.end()
+        sign = -1 if match.group("sign") == "-" else 1
+        if match.group("constant") is not None:
+            terms.append(ConstantTerm(sign, int(match.group("constant"))))
+        else:
+            terms.append(_dice_term(sign, match))
+        if len(terms) > MAX_TERMS: raise ValueError(f"No máximo {MAX_TERMS} termos por rolagem.")
+    if sum(t.count for t in terms if isinstance(t, DiceTerm)) > MAX_DICE:
+        raise ValueError(f"No máximo {MAX_DICE} dados por rolagem.")
+    return tuple(terms)
+
+
+def _dice_term(sign: int, match: re.Match) -> DiceTerm:
+    count = int(match.group("count")) if match.group("count") else 1
+    faces = 100 if match.group("faces") == "%" else int(match.group("faces"))
+    keep, keep_count = None, 0
+    if match.group("advantage"):
+        # d20adv equivale a 2d20kh1 (desvantagem: 2d20kl1)
+        keep, keep_count, count = ("h" if match.group("advantage") == "adv" else "l"), count, count * 2
+    elif match.group("keep"):
+        keep, keep_count = ("l" if match.group("keep") == "kl" else "h"), int(match.group("keep_count"))
+    if count < 1 or faces < 1: raise ValueError("Quantidade e faces precisam ser maiores que zero.")
+    if faces > MAX_FACES: raise ValueError(f"No máximo {MAX_FACES} faces por dado.")
+    if match.group("explode") and faces < 2: raise ValueError("Dados explosivos precisam de ao menos 2 faces.")
+    if keep and not 1 <= keep_count <= count:
+        raise ValueError("Quantidade mantida precisa estar entre 1 e o total de dados.")
+    return DiceTerm(sign, count, faces, bool(match.group("explode")), keep, keep_count)
+
+
+# Rolagem
+_numpy = None
+_numpy_checked = False
+
+
+def _get_numpy():
+    # Import preguiçoso: o NumPy é opcional e caro de carregar
+    global _numpy, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+    return _numpy
+
+
+_generator = None
+
+
+def roll_many(count: int, faces: int) -> List[int]:
+    numpy = _get_numpy() if count >= NUMPY_THRESHOLD else None
+    if numpy is not None:
+        global _generator
+        if _generator is None: _generator = numpy.random.default_rng()
+        return _generator.integers(1, faces + 1, size=count).tolist()
+    if count == 1: return [random.randint(1, faces)]
+    return random.choices(range(1, faces + 1), k=count)
+
+
+def _roll_term(term: DiceTerm, budget: List[int]) -> TermRoll:
+    rolls = roll_many(term.count, term.faces)
+    if term.explode:
+        pending = [i for i, value in enumerate(rolls) if value == term.faces]
+        while pending:
+            if len(pending) > budget[0]: raise ValueError("Limite de explosões atingido.")
+            budget[0] -= len(pending)
+            extra = roll_many(len(pending), term.faces)
+            for index, value in zip(pending, extra): rolls[index] += value
+            pending = [index for index, value in zip(pending, extra) if value == term.faces]
+    kept = rolls
+    if term.keep:
+        ordered = sorted(rolls, reverse=term.keep == "h")
+        kept = ordered[:term.keep_count]
+    return TermRoll(term, rolls, kept, term.sign * sum(kept))
+
+
+@functools.lru_cache(maxsize=1024)
+def _plain(text: str) -> Optional[Tuple[DiceTerm, int]]:
+    # NdM+K (um termo de dados, sem explosão nem "manter"): (termo, modificador) para o caminho rápido do roll
+    terms = _parse(text)
+    dice_terms = [t for t in terms if isinstance(t, DiceTerm)]
+    if len(dice_terms) != 1 or dice_terms[0].explode or dice_terms[0].keep: return None
+    return dice_terms[0], sum(t.sign * t.value for t in terms if isinstance(t, ConstantTerm))
+
+
+def roll(expression: str) -> RollResult:
+    plain = _plain(expression.strip().lower())
+    if plain is not None:
+        term, modifier = plain
+        rolls = [random.randint(1, term.faces)] if term.count == 1 else roll_many(term.count, term.faces)
+        subtotal = term.sign * sum(rolls)
+        return RollResult(subtotal + modifier, [TermRoll(term, rolls, rolls, subtotal)], modifier)
+    terms = parse(expression)
+    budget = [MAX_EXPLOSIONS]
+    rolls = [_roll_term(t, budget) for t in terms if isinstance(t, DiceTerm)]
+    modifier = sum(t.sign * t.value for t in terms if isinstance(t, ConstantTerm))
+    return RollResult(sum(r.subtotal for r in rolls) + modifier, rolls, modifier)
+
+
+def format_rolls(result: RollResult) -> str:
+    parts = []
+    for term_roll in result.rolls:
+        shown = term_roll.rolls[:MAX_DISPLAYED_ROLLS]
+        text = ", ".join(str(v) for v in shown) + (", …" if len(term_roll.rolls) > len(shown) else "")
+        if term_roll.term.keep: text += f" → mantidos {sum(term_roll.kept)}"
+        sign = "-" if term_roll.term.sign < 0 else ""
+        parts.append(f"{sign}{term_roll.term.notation()}: [{text}]")
+    if result.modifier: parts.append(f"mod: {result.modifier:+d}")
+    return "\n".join(parts)
+
+
+# Estatísticas: distribuição exata por convolução
+def _convolve(a: Sequence[float], b: Sequence[float]) -> List[float]:
+    numpy = _get_numpy()
+    if numpy is not None and len(a) * len(b) > 4096:
+        return numpy.convolve(a, b).tolist()
+    result = [0.0] * (len(a) + len(b) - 1)
+    for i, pa in enumerate(a):
+        if pa == 0.0: continue
+        for j, pb in enumerate(b): result[i + j] += pa * pb
+    return result
+
+
+def _spend(budget: List[int], kind: int, work: int, message: str):
+    # budget = [convoluções, DP de "manter"], compartilhado por todos os termos da expressão
+    if work > budget[kind]: raise ValueError(message)
+    budget[kind] -= work
+
+
+def _add(a: Distribution, b: Distribution, budget: List[int]) -> Distribution:
+    if len(a.probabilities) + len(b.probabilities) - 1 > MAX_DISTRIBUTION_SIZE:
+        raise ValueError("Distribuição grande demais para calcular.")
+    _spend(budget, 0, len(a.probabilities) * len(b.probabilities),
+           "Rolagem grande demais para calcular as estatísticas.")
+    return Distribution(a.offset + b.offset, _convolve(a.probabilities, b.probabilities))
+
+
+def _single_die(term: DiceTerm) -> Distribution:
+    uniform = 1.0 / term.faces
+    if not term.explode: return Distribution(1, [uniform] * term.faces)
+    # Cada explosão soma mais um dado; corta a cauda quando (1/faces)^n fica desprezível
+    depth = max(1, math.ceil(math.log(EXPLODE_TAIL) / math.log(uniform)))
+    probabilities = [0.0] * (term.faces * (depth + 1))
+    chain = 1.0
+    for level in range(depth + 1):
+        base = level * term.faces
+        for value in range(1, term.faces): probabilities[base + value - 1] += chain * uniform
+        chain *= uniform
+    probabilities[-1] += chain
+    return Distribution(1, probabilities)
+
+
+def _sum_of(die: Distribution, count: int, budget: List[int]) -> Distribution:
+    # Exponenciação binária: O(log n) convoluções em vez de n
+    result, power = Distribution(0, [1.0]), die
+    while count:
+        if count & 1: result = _add(result, power, budget)
+        count >>= 1
+        if count: power = _add(power, power, budget)
+    return result
+
+
+def _keep_distribution(die: Distribution, count: int, keep: str, keep_count: int,
+                       budget: List[int]) -> Distribution:
+    # DP sobre os valores do dado em ordem (decrescente para kh): estado = (dados atribuídos, soma mantida)
+    values = [(die.offset + i, p) for i, p in enumerate(die.probabilities) if p > 0]
+    if keep == "h": values.reverse()
+    max_sum = keep_count * max(v for v, _ in values)
+    _spend(budget, 1, len(values) * count * count * (max_sum + 1), "Rolagem com 'manter' grande demais para calcular.")
+    states: Dict[int, List[float]] = {0: [1.0] + [0.0] * max_sum}
+    for value, p in values:
+        next_states: Dict[int, List[float]] = {}
+        for assigned, sums in states.items():
+            remaining = count - assigned
+            for c in range(remaining + 1):
+                weight = math.comb(remaining, c) * p ** c
+                if weight == 0.0: continue
+                kept_now = min(c, max(0, keep_count - assigned))
+                shift = kept_now * value
+                target = next_states.setdefault(assigned + c, [0.0] * (max_sum + 1))
+                for s, q in enumerate(sums):
+                    if q: target[s + shift] += q * weight
+        states = next_states
+    final = states.get(count, [0.0])
+    first = next((i for i, q in enumerate(final) if q), 0)
+    last = max((i for i, q in enumerate(final) if q), default=0)
+    return Distribution(first, final[first:last + 1])
+
+
+def _term_distribution(term: DiceTerm, budget: List[int]) -> Distribution:
+    die = _single_die(term)
+    if term.keep: result = _keep_distribution(die, term.count, term.keep, term.keep_count, budget)
+    else: result = _sum_of(die, term.count, budget)
+    if term.sign > 0: return result
+    return Distribution(-result.maximum, list(reversed(result.probabilities)))
+
+
+def distribution(expression: str) -> Distribution:
+    result, budget = Distribution(0, [1.0]), [MAX_CONVOLUTION_WORK, MAX_KEEP_WORK]
+    for term in parse(expression):
+        if isinstance(term, ConstantTerm):
+            result = Distribution(result.offset + term.sign * term.value, result.probabilities)
+        else:
+            result = _add(result, _term_distribution(term, budget), budget)
+    total = sum(result.probabilities)
+    return Distribution(result.offset, [p / total for p in result.probabilities])
+
+
+def summarize(dist: Distribution) -> List[Tuple[str, str]]:
+    return [
+        ("Média", f"{dist.mean():.2f}"),
+        ("Desvio padrão", f"{dist.stdev():.2f}"),
+        ("Mínimo / Máximo", f"{dist.minimum} / {dist.maximum}"),
+        ("Mais provável", f"{dist.mode()}"),
+        ("Percentis 10/50/90", " / ".join(str(dist.percentile(p)) for p in (10, 50, 90))),
+    ]
@@ -0,0 +1,104 @@
+import asyncio
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+import repository
+
+
+# Ordem de combate de um canal, mantida ordenada por (-valor, id): empates ficam na ordem de chegada
+class InitiativeTracker:
+    def __init__(self, guild_id: int, channel_id: int, combatants: List[Dict], turn_index: int = -1):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.combatants = combatants
+        self.turn_index = turn_index
+        self._keys = [(-c["value"], c["id"]) for c in combatants]
+
+    def __len__(self) -> int:
+        return len(self.combatants)
+
+    @property
+    def current(self) -> Optional[Dict]:
+        return self.combatants[self.turn_index] if 0 <= self.turn_index < len(self.combatants) else None
+
+    def insertion_point(self, value: int) -> int:
+        # O novo combatente terá o maior id, então vai depois de todos os empatados
+        return bisect.bisect_right(self._keys, (-value, float("inf")))
+
+    def insert(self, combatant: Dict) -> int:
+        index = self.insertion_point(combatant["value"])
+        self._keys.insert(index, (-combatant["value"], combatant["id"]))
+        self.combatants.insert(index, combatant)
+        # Mantém a seta no mesmo combatente quando alguém entra antes dele
+        if 0 <= index <= self.turn_index: self.turn_index += 1
+        return index
+
+    def next_turn_index(self) -> int:
+        return (self.turn_index + 1) % len(self.combatants)
+
+    def character_ids(self) -> List[int]:
+        return [c["character_id"] for c in self.combatants if c.get("character_id")]
+
+
+class InitiativeRegistry:
+    def __init__(self):
+        self._trackers: Dict[Tuple[int, int], InitiativeTracker] = {}
+        self._locks: Dict[Tuple[int, int], asyncio.Lock] = {}
+
+    def _lock(self, key: Tuple[int, int]) -> asyncio.Lock:
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    async def _load(self, key: Tuple[int, int]) -> InitiativeTracker:
+        tracker = self._trackers.get(key)
+        if tracker is None:
+            state = await repository.load_initiative(*key)
+            tracker = InitiativeTracker(*key, state["combatants"], state["turn_index"])
+            self._trackers[key] = tracker
+        return tracker
+
+    def preload(self, states: List[Dict]) -> List[int]:
+        # Estado lido antes de o bot conectar (database.load_initiatives); devolve as fichas em combate
+        char_ids = []
+        for state in states:
+            key = (state["guild_id"], state["channel_id"])
+            tracker = self._trackers.setdefault(key, InitiativeTracker(*key, state["combatants"], state["turn_index"]))
+            char_ids.extend(tracker.character_ids())
+        return char_ids
+
+    async def get(self, guild_id: int, channel_id: int) -> InitiativeTracker:
+        key = (guild_id, channel_id)
+        async with self._lock(key):
+            return await self._load(key)
+
+    async def add(self, guild_id: int, channel_id: int, name: str, value: int, user_id: Optional[int] = None,
+                  character_id: Optional[int] = None) -> InitiativeTracker:
+        key = (guild_id, channel_id)
+        async with self._lock(key):
+            tracker = await self._load(key)
+            index = tracker.insertion_point(value)
+            turn_index = tracker.turn_index + 1 if 0 <= index <= tracker.turn_index else tracker.turn_index
+            combatant_id = await repository.add_initiative_combatant(guild_id, channel_id, name, value, user_id,
+                                                                     turn_index, character_id)
+            tracker.insert({"id": combatant_id, "name": name, "value": value, "user_id": user_id,
+                            "character_id": character_id})
+            return tracker
+
+    async def advance(self, guild_id: int, channel_id: int) -> Tuple[Optional[InitiativeTracker], Dict[str, List[str]]]:
+        key = (guild_id, channel_id)
+        async with self._lock(key):
+            tracker = await self._load(key)
+            if not tracker.combatants: return None, {}
+            turn_index = tracker.next_turn_index()
+            # Os efeitos passam uma vez por rodada, quando a ordem volta ao primeiro combatente
+            new_round = turn_index == 0 and tracker.turn_index >= 0
+            expired = await repository.set_initiative_turn(guild_id, channel_id, turn_index,
+                                                           tracker.character_ids() if new_round else ())
+            tracker.turn_index = turn_index
+            names = {c["character_id"]: c["name"] for c in tracker.combatants if c.get("character_id")}
+            return tracker, {names[char_id]: effects for char_id, effects in expired.items() if effects}
+
+    async def clear(self, guild_id: int, channel_id: int):
+        key = (guild_id, channel_id)
+        async with self._lock(key):
+            await repository.clear_initiative(guild_id, channel_id)
+            self._trackers.pop(key, None)
@@ -0,0 +1,300 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+
+# Limites (em segundos) dos baldes dos histogramas, no estilo do Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Funções de database que não passam pelo banco ou que rodam no event loop a cada tecla do autocomplete
+UNTIMED_FUNCTIONS = {"connect", "get_pool", "close_pools", "cache_stats", "clear_caches", "parse_number",
+                     "format_number", "add_number", "clamp", "get_router", "set_router", "open_pools",
+                     "character_version"}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o balde +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # Interpolação linear dentro do balde, como o histogram_quantile do Prometheus
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count: return 0.0
+        rank, accumulated = q * count, 0
+        for index, bucket_count in enumerate(counts):
+            if accumulated + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets): return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - accumulated) / bucket_count
+            accumulated += bucket_count
+        return self.buckets[-1]
+
+
+# Uma métrica com no máximo um rótulo (função, comando, cache...)
+class Family:
+    def __init__(self, name: str, help_text: str, kind: str, label: Optional[str] = None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label = label
+        self._children: Dict[Optional[str], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: Optional[str] = None):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(value, Histogram() if self.kind == "histogram" else Counter())
+        return child
+
+    def items(self) -> List[Tuple[Optional[str], object]]:
+        with self._lock:
+            return sorted(self._children.items(), key=lambda item: item[0] or "")
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+
+DB_CALL_SECONDS = Family("rpg_db_call_seconds", "Duração das funções de database.py", "histogram", "function")
+DB_STATEMENTS = Family("rpg_db_statements_total", "Comandos SQL executados, por função", "counter", "function")
+DB_ERRORS = Family("rpg_db_errors_total", "Exceções lançadas pelas funções de database.py", "counter", "function")
+DB_CONNECTIONS = Family("rpg_db_connections_opened_total", "Conexões SQLite abertas pelo pool", "counter")
+COMMAND_SECONDS = Family("rpg_command_seconds", "Duração dos comandos de barra, incluindo defer/respond",
+                         "histogram", "command")
+COMMAND_ERRORS = Family("rpg_command_errors_total", "Comandos de barra que terminaram com erro", "counter", "command")
+LOOP_LAG = Family("rpg_event_loop_lag_seconds", "Atraso do event loop em relação ao agendado", "histogram")
+FAMILIES = (DB_CALL_SECONDS, DB_STATEMENTS, DB_ERRORS, DB_CONNECTIONS, COMMAND_SECONDS, COMMAND_ERRORS, LOOP_LAG)
+
+
+def reset():
+    for family in FAMILIES: family.clear()
+
+
+# Banco: cada função pública de database ganha um wrapper de tempo. A função em execução fica numa
+# variável da thread para que o trace callback do SQLite atribua cada comando a ela.
+_local = threading.local()
+_instrumented = False
+
+
+def _on_statement(statement: str):
+    DB_STATEMENTS.labels(getattr(_local, "function", None) or "other").inc()
+
+
+def _timed(name: str, func):
+    histogram, errors = DB_CALL_SECONDS.labels(name), DB_ERRORS.labels(name)
+
+    if inspect.isgeneratorfunction(func):
+        # Geradores (exportação): a função fica marcada só enquanto o gerador roda. Entre um next() e outro a
+        # thread do executor atende outras chamadas, que não podem ser contadas como dele; o tempo medido é a
+        # soma dos trechos em execução, sem o de quem consome
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            generator, elapsed = func(*args, **kwargs), [0.0]
+
+            def resume(step):
+                previous, _local.function = getattr(_local, "function", None), name
+                start = time.perf_counter()
+                try:
+                    return step()
+                finally:
+                    elapsed[0] += time.perf_counter() - start
+                    _local.function = previous
+
+            try:
+                while True:
+                    try:
+                        value = resume(lambda: next(generator))
+                    except StopIteration:
+                        return
+                    except Exception:
+                        errors.inc()
+                        raise
+                    yield value
+            finally:
+                resume(generator.close)
+                histogram.observe(elapsed[0])
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous, _local.function = getattr(_local, "function", None), name
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+            _local.function = previous
+
+    return wrapper
+
+
+def instrument_database():
+    # Precisa rodar antes de o pool abrir conexões para que todas recebam o trace callback
+    global _instrumented
+    if _instrumented: return
+    _instrumented = True
+    original_open = database.ConnectionPool._open
+
+    def _open(pool):
+        conn = original_open(pool)
+        conn.set_trace_callback(_on_statement)
+        DB_CONNECTIONS.labels().inc()
+        return conn
+
+    database.ConnectionPool._open = _open
+    for name, func in list(vars(database).items()):
+        if name.startswith("_") or name.startswith("cached_") or name in UNTIMED_FUNCTIONS: continue
+        if inspect.isfunction(func) and func.__module__ == database.__name__:
+            setattr(database, name, _timed(name, func))
+
+
+# Comandos de barra: o início fica guardado pelo id da interação até o evento de conclusão
+_command_starts: Dict[int, float] = {}
+
+
+def command_started(interaction_id: int):
+    _command_starts[interaction_id] = time.perf_counter()
+
+
+def command_finished(interaction_id: int, command: str, failed: bool = False):
+    start = _command_starts.pop(interaction_id, None)
+    if start is not None: COMMAND_SECONDS.labels(command).observe(time.perf_counter() - start)
+    if failed: COMMAND_ERRORS.labels(command).inc()
+
+
+# Event loop: dorme um intervalo fixo e mede quanto acordou atrasado
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task: self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        histogram = LOOP_LAG.labels()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            histogram.observe(max(0.0, loop.time() - start - self.interval))
+
+
+# Exportação no formato texto do Prometheus
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}" if pairs else ""
+
+
+def _render_family(family: Family) -> Iterator[str]:
+    yield f"# HELP {family.name} {family.help}"
+    yield f"# TYPE {family.name} {family.kind}"
+    for value, child in family.items():
+        base = [(family.label, value)] if family.label and value is not None else []
+        if isinstance(child, Counter):
+            yield f"{family.name}{_labels(base)} {child.value}"
+            continue
+        with child._lock:
+            counts, count, total = list(child.counts), child.count, child.sum
+        accumulated = 0
+        for bound, bucket_count in zip(child.buckets + (float("inf"),), counts):
+            accumulated += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{family.name}_bucket{_labels(base + [('le', le)])} {accumulated}"
+        yield f"{family.name}_sum{_labels(base)} {total}"
+        yield f"{family.name}_count{_labels(base)} {count}"
+
+
+def _render_caches() -> Iterator[str]:
+    stats = database.cache_stats()
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        name = f"rpg_cache_{field}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} Caches de leitura de database.py ({field})"
+        yield f"# TYPE {name} {kind}"
+        for cache, values in sorted(stats.items()): yield f"{name}{_labels([('cache', cache)])} {values[field]}"
+
+
+def render() -> str:
+    lines = [line for family in FAMILIES for line in _render_family(family)]
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str):
+    # Escreve num temporário e troca de uma vez: o coletor nunca lê um arquivo pela metade
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle: handle.write(render())
+    os.replace(temporary, path)
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = (await reader.readline()).split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""): pass
+        path = request[1].split(b"?")[0] if len(request) > 1 else b"/"
+        status, body = ("200 OK", render().encode()) if path == b"/metrics" else ("404 Not Found", b"not found\n")
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_http_server(port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    return await asyncio.start_server(_handle_http, host, port)
+
+
+# Resumo para o /stats: (rótulo, chamadas, total em s, p50, p95, p99), os mais custosos primeiro
+def summarize(family: Family, limit: int = 8) -> List[Tuple[str, int, float, float, float, float]]:
+    rows = [(value or family.name, child.count, child.sum, *(child.quantile(q) for q in QUANTILES))
+            for value, child in family.items() if child.count]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit]
+
+
+def counter_value(family: Family, value: Optional[str] = None) -> float:
+    return sum(child.value for label, child in family.items() if value is None or label == value)
@@ -0,0 +1,191 @@
+import math
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import discord
+
+import repository
+import systems
+from cache import LRUCache, MISSING
+
+SHEET_PAGE_SIZE = 20  # atributos por página; com dinheiro e efeitos fica abaixo do limite de 25 campos
+INVENTORY_PAGE_SIZE = 10
+# O embed inteiro aceita 6000 caracteres: cada valor é cortado para caber uma página cheia
+SHEET_VALUE_LIMIT = 200
+ITEM_DESCRIPTION_LIMIT = 400
+PAGE_CACHE_SIZE = 2048
+VIEW_TIMEOUT = 10 * 60
+
+Renderer = Callable[[int, int], Awaitable[Tuple[Optional[discord.Embed], int]]]
+# (cursor, página) -> (embed, cursor da próxima página ou None)
+KeysetRenderer = Callable[[Optional[Tuple], int], Awaitable[Tuple[discord.Embed, Optional[Tuple]]]]
+
+# Páginas já montadas: (tipo, ficha, página) -> (versão, embed, total de páginas). A versão junta a da ficha e a
+# dos sistemas (campos derivados); sem TTL, pois qualquer escrita ou recarga a avança e a entrada deixa de valer.
+_pages = LRUCache(PAGE_CACHE_SIZE, None)
+
+
+def format_effects(effects: list) -> str:
+    return "\n".join(f"**{effect['effect_name']}** ({effect['duration']} turnos)" for effect in effects)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _footer(embed: discord.Embed, page: int, pages: int):
+    if pages > 1: embed.set_footer(text=f"Página {page}/{pages}")
+
+
+async def _cached(kind: str, char_id: int, page: int, build: Renderer) -> Tuple[Optional[discord.Embed], int]:
+    # A versão é lida antes dos dados: uma escrita no meio da montagem só faz a próxima visualização remontar
+    version = (await repository.character_version(char_id), systems.registry.version)
+    entry = _pages.get((kind, char_id, page))
+    if entry is not MISSING and entry[0] == version: return entry[1], entry[2]
+    embed, pages = await build(char_id, page)
+    if embed is not None: _pages.set((kind, char_id, page), (version, embed, pages))
+    return embed, pages
+
+
+async def _build_sheet(char_id: int, page: int) -> Tuple[Optional[discord.Embed], int]:
+    # Uma ida ao banco: ficha e efeitos, sem itens do inventário
+    sheet = await repository.get_character_page(char_id)
+    if not sheet: return None, 0
+    effects = sheet['effects']
+    attributes = list(sheet['attributes'].items())
+    schema = systems.registry.get(sheet['system'])
+    if schema: attributes.extend(schema.derive(sheet['attributes']).items())
+    pages = max(1, math.ceil(len(attributes) / SHEET_PAGE_SIZE))
+    page = min(page, pages)
+    embed = discord.Embed(title=f"Ficha de {sheet['character_name'].title()}",
+                          description=f"Sistema: {sheet['system'].title()} | Campanha: {sheet['campaign'].title()}",
+                          color=discord.Color.purple())
+    embed.add_field(name="💰 Dinheiro", value=sheet.get('money', 0), inline=True)
+    for attr, value in attributes[(page - 1) * SHEET_PAGE_SIZE:page * SHEET_PAGE_SIZE]:
+        embed.add_field(name=attr.title(), value=_truncate(value or "N/A", SHEET_VALUE_LIMIT), inline=True)
+    if effects:
+        embed.add_field(name="🌀 Efeitos", value=_truncate(format_effects(effects), 1024), inline=False)
+    _footer(embed, page, pages)
+    return embed, pages
+
+
+async def _build_inventory(char_id: int, page: int) -> Tuple[Optional[discord.Embed], int]:
+    # Uma ida ao banco: ficha, efeitos, a página pedida do inventário e o total de itens
+    sheet = await repository.get_character_page(char_id, INVENTORY_PAGE_SIZE, (page - 1) * INVENTORY_PAGE_SIZE)
+    if not sheet: return None, 0
+    items, effects = sheet['inventory'], sheet['effects']
+    pages = max(1, math.ceil(sheet['inventory_total'] / INVENTORY_PAGE_SIZE))
+    # Itens removidos desde a última visualização podem ter encurtado o inventário
+    if page > pages: return await _build_inventory(char_id, pages)
+    embed = discord.Embed(title=f"🎒 Inventário de {sheet['character_name'].title()}",
+                          color=discord.Color.dark_orange())
+    embed.add_field(name="💰 Dinheiro", value=f"{sheet.get('money', 0):.2f}", inline=False)
+    if not items: embed.description = "O inventário está vazio."
+    for item in items:
+        embed.add_field(name=f"{item['item_name']} (x{item['quantity']})",
+                        value=_truncate(item['description'] or "Sem descrição.", ITEM_DESCRIPTION_LIMIT), inline=False)
+    if effects:
+        embed.add_field(name="🌀 Efeitos", value=_truncate(format_effects(effects), 1024), inline=False)
+    _footer(embed, page, pages)
+    return embed, pages
+
+
+async def sheet_page(char_id: int, page: int = 1) -> Tuple[Optional[discord.Embed], int]:
+    return await _cached("sheet", char_id, page, _build_sheet)
+
+
+async def inventory_page(char_id: int, page: int = 1) -> Tuple[Optional[discord.Embed], int]:
+    return await _cached("inventory", char_id, page, _build_inventory)
+
+
+def cache_stats() -> dict:
+    return _pages.stats()
+
+
+# Botões ◀ ▶ que trocam a página no lugar; só quem abriu a visualização navega
+class PageView(discord.ui.View):
+    def __init__(self, render: Renderer, char_id: int, owner_id: int, page: int, pages: int):
+        super().__init__(timeout=VIEW_TIMEOUT)
+        self.render = render
+        self.char_id = char_id
+        self.owner_id = owner_id
+        self.page = page
+        self.pages = pages
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.page >= self.pages
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.owner_id:
+            return await interaction.response.send_message("❌ Só quem abriu a ficha pode trocar a página.",
+                                                           ephemeral=True)
+        embed, pages = await self.render(self.char_id, page)
+        if embed is None: return await interaction.response.edit_message(content="❌ Ficha não encontrada.",
+                                                                          embed=None, view=None)
+        self.page, self.pages = min(page, pages), pages
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self._show(interaction, self.page + 1)
+
+
+def page_view(render: Renderer, char_id: int, owner_id: int, page: int, pages: int) -> Optional[PageView]:
+    # Uma página só dispensa os botões
+    return PageView(render, char_id, owner_id, page, pages) if pages > 1 else None
+
+
+def campaign_embed(title: str, description: Optional[str], fields: List[Tuple[str, str]], page: int,
+                   after: Optional[Tuple]) -> discord.Embed:
+    embed = discord.Embed(title=title, description=description, color=discord.Color.dark_teal())
+    for name, value in fields: embed.add_field(name=_truncate(name, 256), value=_truncate(value, 1024), inline=False)
+    if not fields: embed.add_field(name="📭", value="Nenhuma ficha encontrada.", inline=False)
+    if page > 1 or after: embed.set_footer(text=f"Página {page}")
+    return embed
+
+
+# Listas paginadas por cursor: o total de páginas não é conhecido, então guarda o cursor que abre cada página
+# já vista; voltar refaz a mesma consulta e avançar usa o cursor devolvido pela página atual
+class KeysetView(discord.ui.View):
+    def __init__(self, render: KeysetRenderer, owner_id: int, after: Tuple):
+        super().__init__(timeout=VIEW_TIMEOUT)
+        self.render = render
+        self.owner_id = owner_id
+        self.cursors: List[Optional[Tuple]] = [None]
+        self.after: Optional[Tuple] = after
+        self._update_buttons()
+
+    @property
+    def page(self) -> int:
+        return len(self.cursors)
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.after is None
+
+    async def _show(self, interaction: discord.Interaction, cursors: List[Optional[Tuple]]):
+        if interaction.user.id != self.owner_id:
+            return await interaction.response.send_message("❌ Só quem abriu a lista pode trocar a página.",
+                                                           ephemeral=True)
+        embed, after = await self.render(cursors[-1], len(cursors))
+        self.cursors, self.after = cursors, after
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self._show(interaction, self.cursors[:-1])
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self._show(interaction, self.cursors + [self.after])
+
+
+def keyset_view(render: KeysetRenderer, owner_id: int, after: Optional[Tuple]) -> Optional[KeysetView]:
+    return KeysetView(render, owner_id, after) if after is not None else None
@@ -0,0 +1,88 @@
+import bisect
+import threading
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple
+
+# O Discord aceita no máximo 25 sugestões por autocomplete
+MAX_SUGGESTIONS = 25
+
+
+# Lista ordenada de (chave em minúsculas, valor): busca por prefixo com bisect, sem tocar o banco
+class PrefixIndex:
+    def __init__(self, entries: Iterable[Tuple[str, Hashable]] = ()):
+        self._entries = sorted({(key.lower(), value) for key, value in entries})
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        key = key.lower()
+        with self._lock:
+            index = bisect.bisect_left(self._entries, (key,))
+            return index < len(self._entries) and self._entries[index][0] == key
+
+    def add(self, key: str, value: Hashable):
+        entry = (key.lower(), value)
+        with self._lock:
+            index = bisect.bisect_left(self._entries, entry)
+            if index == len(self._entries) or self._entries[index] != entry: self._entries.insert(index, entry)
+
+    def discard(self, key: str):
+        # Remove todas as entradas com essa chave
+        key = key.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (key,))
+            end = start
+            while end < len(self._entries) and self._entries[end][0] == key: end += 1
+            del self._entries[start:end]
+
+    def search(self, prefix: str, limit: int = MAX_SUGGESTIONS,
+               predicate: Optional[Callable[[Hashable], bool]] = None) -> List[Hashable]:
+        prefix = prefix.lower()
+        results = []
+        with self._lock:
+            # (prefixo,) é menor que qualquer (prefixo..., valor), então começa no primeiro candidato
+            index = bisect.bisect_left(self._entries, (prefix,))
+            while index < len(self._entries) and len(results) < limit:
+                key, value = self._entries[index]
+                if not key.startswith(prefix): break
+                if predicate is None or predicate(value): results.append(value)
+                index += 1
+        return results
+
+
+# Fichas de um usuário indexadas por sistema, campanha e nome
+class CharacterIndex:
+    def __init__(self, characters: Iterable[Tuple[str, str, str]] = ()):
+        characters = [tuple(c.lower() for c in character) for character in characters]
+        self.systems = PrefixIndex((system, system) for system, _, _ in characters)
+        self.campaigns = PrefixIndex((campaign, (system, campaign)) for system, campaign, _ in characters)
+        self.names = PrefixIndex((name, (system, campaign, name)) for system, campaign, name in characters)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, system: str, campaign: str, name: str):
+        system, campaign, name = system.lower(), campaign.lower(), name.lower()
+        self.systems.add(system, system)
+        self.campaigns.add(campaign, (system, campaign))
+        self.names.add(name, (system, campaign, name))
+
+    def complete_systems(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        return self.systems.search(prefix, limit)
+
+    def complete_campaigns(self, prefix: str, system: Optional[str] = None,
+                           limit: int = MAX_SUGGESTIONS) -> List[str]:
+        system = system.lower() if system else None
+        matches = self.campaigns.search(prefix, len(self.campaigns),
+                                        lambda value: system is None or value[0] == system)
+        # A mesma campanha pode existir em vários sistemas
+        return list(dict.fromkeys(campaign for _, campaign in matches))[:limit]
+
+    def complete_names(self, prefix: str, system: Optional[str] = None, campaign: Optional[str] = None,
+                       limit: int = MAX_SUGGESTIONS) -> List[str]:
+        system = system.lower() if system else None
+        campaign = campaign.lower() if campaign else None
+        matches = self.names.search(prefix, len(self.names), lambda value: (system is None or value[0] == system)
+                                    and (campaign is None or value[1] == campaign))
+        return list(dict.fromkeys(name for _, _, name in matches))[:limit]
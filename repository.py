@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+
+import database
+from write_queue import FLUSH_INTERVAL, MAX_PENDING, WriteBehindQueue
+
+# Executor dedicado ao banco: cada thread pega uma conexão do pool, então o
+# número de workers acompanha o tamanho do pool.
+_executor: Optional[ThreadPoolExecutor] = None
+# Fila write-behind opcional (enable_write_behind); None grava cada mutação na hora
+_queue: Optional[WriteBehindQueue] = None
+_flush_interval = FLUSH_INTERVAL
+_flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+def start(pool_size: int = database.POOL_SIZE) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        database.get_pool()
+        _executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="rpg-db")
+    return _executor
+
+
+def shutdown():
+    global _executor, _flush_handle
+    # Nada que esteja na fila se perde ao desligar
+    if _flush_handle is not None: _flush_handle.cancel()
+    _flush_handle = None
+    if _queue is not None: _queue.flush()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    database.close_pools()
+
+
+async def run(func: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(start(), functools.partial(func, *args, **kwargs))
+
+
+def _awaitable(name: str) -> Callable:
+    # Resolve a função pelo nome a cada chamada para respeitar wrappers aplicados em database
+    @functools.wraps(getattr(database, name))
+    async def wrapper(*args, **kwargs):
+        return await run(getattr(database, name), *args, **kwargs)
+
+    return wrapper
+
+
+# Write-behind
+def enable_write_behind(interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING) -> WriteBehindQueue:
+    global _queue, _flush_interval
+    if _queue is None: _queue = WriteBehindQueue(max_pending)
+    _flush_interval = interval
+    return _queue
+
+
+def disable_write_behind():
+    global _queue, _flush_handle
+    if _flush_handle is not None: _flush_handle.cancel()
+    _flush_handle = None
+    if _queue is not None: _queue.flush()
+    _queue = None
+
+
+def write_behind_enabled() -> bool:
+    return _queue is not None
+
+
+async def flush(char_ids: Optional[Iterable[int]] = None):
+    global _flush_handle
+    if char_ids is None and _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if _queue is not None and _queue: await run(_queue.flush, char_ids)
+
+
+def _flush_done(task: asyncio.Task):
+    # Ninguém espera a gravação agendada: a falha é mostrada aqui e a gravação é reagendada. A fila já devolveu
+    # as escritas (WriteBehindQueue.flush), que seguem na próxima tentativa em vez de esperar um flush explícito
+    if task.cancelled() or task.exception() is None: return
+    error = task.exception()
+    print("Erro ao gravar a fila write-behind (nova tentativa agendada):", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+    if _queue is not None and _queue.has_pending(): _schedule_flush(False)
+
+
+def _start_flush(loop: asyncio.AbstractEventLoop):
+    loop.create_task(flush()).add_done_callback(_flush_done)
+
+
+def _schedule_flush(now: bool):
+    # Um único timer por lote: a primeira escrita agenda a gravação, o limite de tamanho a antecipa
+    global _flush_handle
+    loop = asyncio.get_running_loop()
+    if now:
+        _start_flush(loop)
+    elif _flush_handle is None:
+        _flush_handle = loop.call_later(_flush_interval, _start_flush, loop)
+
+
+def _queued(name: str) -> Callable:
+    # Com a fila ligada a mutação só entra na memória; sem ela, grava direto como as demais
+    direct = _awaitable(name)
+
+    @functools.wraps(getattr(database, name))
+    async def wrapper(*args, **kwargs):
+        if _queue is None: return await direct(*args, **kwargs)
+        _schedule_flush(getattr(_queue, name)(*args, **kwargs))
+
+    return wrapper
+
+
+def _flush_then(name: str, char_ids_of: Optional[Callable], *args, **kwargs):
+    if _queue is not None and _queue: _queue.flush(char_ids_of(*args, **kwargs) if char_ids_of else None)
+    return getattr(database, name)(*args, **kwargs)
+
+
+def _consistent(name: str, char_ids_of: Optional[Callable] = None) -> Callable:
+    # Leituras (e escritas que dependem da ordem) gravam antes as pendências das fichas envolvidas
+    @functools.wraps(getattr(database, name))
+    async def wrapper(*args, **kwargs):
+        return await run(_flush_then, name, char_ids_of, *args, **kwargs)
+
+    return wrapper
+
+
+def _char_id(char_id: int, *args, **kwargs) -> list:
+    return [char_id]
+
+
+def _viewed_char_id(user_id: int, system: str, campaign: str, char_name: str) -> list:
+    return [database.find_character_id(user_id, system, campaign, char_name)]
+
+
+async def character_version(char_id: int) -> int:
+    # Em memória, direto no event loop; só vai ao executor se a ficha tiver escritas na fila
+    if _queue is not None and _queue.has_pending([char_id]): await flush([char_id])
+    return database.character_version(char_id)
+
+
+def _indexed(name: str) -> Callable:
+    # Autocomplete: responde da memória quando o índice já está carregado e só vai ao banco na primeira vez
+    load = _awaitable(name)
+
+    async def wrapper(key: int):
+        index = getattr(database, f"cached_{name}")(key)
+        return index if index is not None else await load(key)
+
+    return wrapper
+
+
+# Banco de Dados
+setup_database = _awaitable("setup_database")
+
+# Função personagem
+find_character_id = _awaitable("find_character_id")
+create_character_sheet = _awaitable("create_character_sheet")
+get_character_sheet = _consistent("get_character_sheet", _char_id)
+get_character_view = _consistent("get_character_view", _viewed_char_id)
+get_character_page = _consistent("get_character_page", _char_id)
+list_characters = _awaitable("list_characters")
+list_campaign_characters = _awaitable("list_campaign_characters")
+# Visões da campanha inteira: o que está na fila pode ser de qualquer ficha, então grava tudo antes
+campaign_summary = _consistent("campaign_summary")
+campaign_roster = _consistent("campaign_roster")
+campaign_richest = _consistent("campaign_richest")
+campaign_item_holders = _consistent("campaign_item_holders")
+campaign_effects = _consistent("campaign_effects")
+update_attribute = _queued("update_attribute")
+adjust_attribute = _queued("adjust_attribute")
+
+# Função inv e dinheiro
+modify_money = _queued("modify_money")
+add_item = _awaitable("add_item")
+remove_item = _awaitable("remove_item")
+get_inventory = _awaitable("get_inventory")
+apply_deltas = _awaitable("apply_deltas")
+
+# Efeitos de status
+apply_effect = _queued("apply_effect")
+get_effects = _consistent("get_effects", _char_id)
+advance_effects_turn = _consistent("advance_effects_turn", lambda char_ids: list(char_ids))
+remove_effect = _consistent("remove_effect", _char_id)
+
+# Função NPC
+create_npc = _awaitable("create_npc")
+get_npc = _awaitable("get_npc")
+list_npcs = _awaitable("list_npcs")
+search_npcs = _awaitable("search_npcs")
+delete_npc = _awaitable("delete_npc")
+
+# Função iniciativa
+load_initiative = _awaitable("load_initiative")
+add_initiative_combatant = _awaitable("add_initiative_combatant")
+set_initiative_turn = _consistent("set_initiative_turn",
+                                  lambda guild_id, channel_id, turn_index, tick_char_ids=(): list(tick_char_ids))
+clear_initiative = _awaitable("clear_initiative")
+
+# Índices de autocomplete
+character_index = _indexed("character_index")
+item_index = _indexed("item_index")
+npc_index = _indexed("npc_index")
+
+# Rascunhos de criação de ficha
+load_creation_drafts = _awaitable("load_creation_drafts")
+save_creation_draft = _awaitable("save_creation_draft")
+delete_creation_draft = _awaitable("delete_creation_draft")
+delete_stale_creation_drafts = _awaitable("delete_stale_creation_drafts")
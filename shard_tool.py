@@ -0,0 +1,128 @@
+"""Divide um banco de arquivo único em shards (ver StorageRouter em database.py) e mostra a distribuição.
+
+Fichas vão para o shard da campanha e ganham ids novos com o shard nos bits altos; NPCs vão para o shard do
+usuário, a iniciativa para o do servidor (com as fichas ligadas remapeadas) e os rascunhos ficam no shard 0.
+O banco de origem só é lido (e migrado, se estiver desatualizado).
+
+Uso:
+    python shard_tool.py split --db rpg_data.db --out shards/rpg_data.db --shards 4
+    python shard_tool.py status --db shards/rpg_data.db --shards 4
+
+Depois do split, aponte o bot para os novos arquivos (DB_NAME) e defina SHARDS com o mesmo número.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterator, Tuple
+
+import database
+import transfer
+
+
+def _use(path: str, shards: int):
+    database.close_pools()
+    database.clear_caches()
+    database.DB_NAME, database.SHARD_COUNT = path, shards
+
+
+def _read_source(conn: sqlite3.Connection, keys: Dict[int, Tuple]) -> Iterator[Dict]:
+    # Registros no formato do transfer.py; keys recebe id antigo -> (dono, sistema, campanha, nome)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    for row in cursor.execute(database.EXPORT_CHARACTERS_QUERY.format(where="")):
+        record = dict(row, type="character")
+        keys[record.pop('id')] = (record['user_id'], record['system'], record['campaign'], record['character_name'])
+        for key in ('attributes', 'inventory', 'effects'): record[key] = json.loads(record[key])
+        yield record
+    for user_id, name, stats in conn.execute(
+            f"SELECT n.user_id, n.name, {database.NPC_STATS_COLUMN} FROM npcs n ORDER BY n.id"):
+        yield {"type": "npc", "user_id": user_id, "name": name, "stats": json.loads(stats)}
+
+
+def split(source: str, target: str, shards: int, chunk_size: int = transfer.CHUNK_SIZE) -> Dict[str, int]:
+    router = database.StorageRouter(target, shards)
+    if os.path.abspath(source) in {os.path.abspath(router.path(shard)) for shard in router.all()}:
+        raise ValueError("O destino precisa ser diferente do banco de origem.")
+    existing = [router.path(shard) for shard in router.all() if os.path.exists(router.path(shard))]
+    if existing: raise ValueError(f"Arquivos de destino já existem: {', '.join(existing)}")
+
+    _use(source, 1)
+    database.setup_database()
+    _use(target, shards)
+    database.setup_database()
+    keys: Dict[int, Tuple] = {}
+    with contextlib.closing(sqlite3.connect(source)) as conn:
+        stats = transfer.import_records(_read_source(conn, keys), chunk_size)
+        new_ids = {old_id: database.find_character_id(*key) for old_id, key in keys.items()}
+
+        trackers: Dict[int, list] = {}
+        for row in conn.execute("SELECT guild_id, channel_id, turn_index FROM initiative_trackers"):
+            trackers.setdefault(router.for_guild(row[0]), []).append(row)
+        combatants: Dict[int, list] = {}
+        for guild_id, channel_id, name, value, user_id, char_id in conn.execute("""
+        SELECT guild_id, channel_id, name, value, user_id, character_id FROM initiative_combatants ORDER BY id"""):
+            combatants.setdefault(router.for_guild(guild_id), []).append(
+                (guild_id, channel_id, name, value, user_id, new_ids.get(char_id)))
+        for shard in router.all():
+            with database.connect(shard) as shard_conn:
+                shard_conn.executemany(
+                    "INSERT INTO initiative_trackers (guild_id, channel_id, turn_index) VALUES (?, ?, ?)",
+                    trackers.get(shard, []))
+                shard_conn.executemany("""
+                INSERT INTO initiative_combatants (guild_id, channel_id, name, value, user_id, character_id)
+                VALUES (?, ?, ?, ?, ?, ?)""", combatants.get(shard, []))
+
+        drafts = conn.execute(
+            "SELECT user_id, channel_id, system, campaign, data, updated_at FROM creation_drafts").fetchall()
+        with database.connect() as shard_conn:
+            shard_conn.executemany("""
+            INSERT INTO creation_drafts (user_id, channel_id, system, campaign, data, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)""", drafts)
+    database.close_pools()
+    stats.update(trackers=sum(map(len, trackers.values())), drafts=len(drafts))
+    return stats
+
+
+def status(path: str, shards: int) -> Iterator[Tuple[int, str, int, int, int]]:
+    # (shard, arquivo, fichas, NPCs, iniciativas) de cada shard que existe em disco
+    _use(path, shards)
+    router = database.get_router()
+    for shard in router.all():
+        if not os.path.exists(router.path(shard)): continue
+        with database.connect(shard) as conn:
+            counts = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("characters", "npcs", "initiative_trackers")]
+        yield (shard, router.path(shard), *counts)
+    database.close_pools()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Divide o banco do bot em shards.")
+    parser.add_argument("action", choices=["split", "status"])
+    parser.add_argument("--db", default=database.DB_NAME)
+    parser.add_argument("--out", help="Arquivo base dos shards (split)")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARDS", "1")))
+    parser.add_argument("--chunk-size", type=int, default=transfer.CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.shards < 1: parser.error("--shards precisa ser pelo menos 1")
+
+    if args.action == "split":
+        if not args.out: parser.error("split precisa de --out")
+        try:
+            stats = split(args.db, args.out, args.shards, args.chunk_size)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"{stats['characters']} personagens, {stats['npcs']} NPCs, {stats['trackers']} iniciativas e "
+              f"{stats['drafts']} rascunhos copiados para {args.shards} shards.", file=sys.stderr)
+    else:
+        for shard, path, characters, npcs, trackers in status(args.db, args.shards):
+            print(f"shard {shard:<3} {path:<40} fichas={characters:<7} npcs={npcs:<7} iniciativas={trackers}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
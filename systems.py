@@ -0,0 +1,203 @@
+import ast
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from database import format_number, parse_number
+
+SYSTEMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "systems")
+ATTRIBUTE_TYPES = ("number", "text")
+YAML_EXTENSIONS = (".yaml", ".yml")
+TEXT_LIMIT = 1024  # limite de um campo de embed do Discord
+# Fórmulas de campos derivados: só aritmética sobre atributos numéricos e estas funções
+FORMULA_FUNCTIONS = {"min": min, "max": max, "abs": abs, "round": round}
+FORMULA_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant, ast.Add, ast.Sub,
+                 ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.USub, ast.UAdd)
+
+
+def _yaml():
+    # PyYAML é opcional e pesado de importar: só é carregado quando a pasta tem algum .yaml
+    try:
+        import yaml
+    except ImportError:
+        return None
+    return yaml
+
+
+def formula_name(name: str) -> str:
+    # "Ataque Especial" -> ataque_especial, o nome usado nas fórmulas
+    return "_".join(name.lower().split())
+
+
+class AttributeSchema:
+    __slots__ = ("name", "key", "type", "minimum", "maximum", "formula", "_code")
+
+    def __init__(self, name: str, type: str = "text", minimum: Optional[float] = None,
+                 maximum: Optional[float] = None, formula: Optional[str] = None):
+        self.name = name
+        self.key = name.lower()
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+        self.formula = formula
+        self._code = None
+
+    @property
+    def numeric(self) -> bool:
+        return self.type == "number"
+
+    @property
+    def derived(self) -> bool:
+        return self.formula is not None
+
+    def compile(self, known: Dict[str, "AttributeSchema"]):
+        try:
+            tree = ast.parse(str(self.formula), mode="eval")
+        except SyntaxError:
+            raise ValueError(f"'{self.name}': fórmula inválida.")
+        for node in ast.walk(tree):
+            if not isinstance(node, FORMULA_NODES):
+                raise ValueError(f"'{self.name}': fórmula com sintaxe não permitida.")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError(f"'{self.name}': a fórmula só aceita números.")
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.keywords
+                                               or node.func.id not in FORMULA_FUNCTIONS):
+                raise ValueError(f"'{self.name}': função não permitida na fórmula.")
+            if isinstance(node, ast.Name) and node.id not in FORMULA_FUNCTIONS:
+                source = known.get(node.id)
+                if source is None or not source.numeric or source.derived:
+                    raise ValueError(f"'{self.name}': '{node.id}' não é um atributo numérico do sistema.")
+        self._code = compile(tree, f"<{self.name}>", "eval")
+
+    def evaluate(self, numbers: Dict[str, float]) -> Optional[float]:
+        try:
+            number = eval(self._code, {"__builtins__": {}}, dict(FORMULA_FUNCTIONS, **numbers))
+        except (NameError, ArithmeticError, TypeError):
+            return None  # algum atributo usado na fórmula não é numérico nesta ficha
+        # Valores enormes estouram para inf (ou nan, em inf - inf), que format_number não converte
+        return number if math.isfinite(number) else None
+
+    def validate(self, value: str) -> str:
+        # Retorna o valor normalizado ou lança ValueError com a mensagem para o jogador
+        value = value.strip()
+        if not self.numeric:
+            if len(value) > TEXT_LIMIT: raise ValueError(f"**{self.name}** aceita até {TEXT_LIMIT} caracteres.")
+            return value
+        number = parse_number(value)
+        if number is None: raise ValueError(f"**{self.name}** precisa ser um número.")
+        if self.minimum is not None and number < self.minimum:
+            raise ValueError(f"**{self.name}** não pode ser menor que {format_number(self.minimum)}.")
+        if self.maximum is not None and number > self.maximum:
+            raise ValueError(f"**{self.name}** não pode ser maior que {format_number(self.maximum)}.")
+        return format_number(number)
+
+
+class SystemSchema:
+    def __init__(self, name: str, attributes: List[AttributeSchema]):
+        self.name = name
+        self.key = name.lower()
+        self.attributes = attributes
+        self._by_key = {attribute.key: attribute for attribute in attributes}
+        # Perguntados na criação da ficha, na ordem do arquivo; os derivados são calculados
+        self.fields = [attribute.name for attribute in attributes if not attribute.derived]
+        self.derived = [attribute for attribute in attributes if attribute.derived]
+
+    def attribute(self, name: str) -> Optional[AttributeSchema]:
+        return self._by_key.get(name.lower())
+
+    def derive(self, values: Dict[str, str]) -> Dict[str, str]:
+        numbers = {formula_name(name): number for name, number in
+                   ((name, parse_number(value)) for name, value in values.items()) if number is not None}
+        derived = {}
+        for attribute in self.derived:
+            number = attribute.evaluate(numbers)
+            derived[attribute.name] = "N/A" if number is None else format_number(number)
+        return derived
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SystemSchema":
+        if not isinstance(data, dict) or not data.get("name") or not isinstance(data.get("attributes"), list):
+            raise ValueError("o sistema precisa de 'name' e de uma lista 'attributes'.")
+        attributes = []
+        for entry in data["attributes"]:
+            if isinstance(entry, str): entry = {"name": entry}
+            if not isinstance(entry, dict): raise ValueError(f"atributo inválido: {entry!r}.")
+            kind = entry.get("type", "text")
+            if not entry.get("name"): raise ValueError("atributo sem 'name'.")
+            if kind not in ATTRIBUTE_TYPES: raise ValueError(f"'{entry['name']}': tipo desconhecido '{kind}'.")
+            minimum, maximum = entry.get("min"), entry.get("max")
+            if minimum is not None and maximum is not None and minimum > maximum:
+                raise ValueError(f"'{entry['name']}': 'min' maior que 'max'.")
+            attributes.append(AttributeSchema(entry["name"], kind, minimum, maximum, entry.get("derived")))
+        known = {formula_name(attribute.name): attribute for attribute in attributes}
+        if len(known) != len(attributes): raise ValueError("atributos com nomes repetidos.")
+        for attribute in attributes:
+            if attribute.derived: attribute.compile(known)
+        return cls(data["name"], attributes)
+
+
+# Sistemas lidos de SYSTEMS_DIR (um arquivo .json, ou .yaml com PyYAML, por sistema).
+# reload_if_changed relê tudo quando algum arquivo muda; se a nova versão tiver erro, a anterior continua valendo.
+class SystemRegistry:
+    def __init__(self, directory: str = SYSTEMS_DIR):
+        self.directory = directory
+        self._systems: Dict[str, SystemSchema] = {}
+        self._signature: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self.version = 0  # avança a cada carga; quem guarda algo calculado com os schemas compara com ele
+
+    def _files(self) -> List[str]:
+        names = os.listdir(self.directory)
+        extensions = (".json",)
+        # Sem PyYAML só os arquivos .json são lidos
+        if any(name.endswith(YAML_EXTENSIONS) for name in names) and _yaml(): extensions += YAML_EXTENSIONS
+        return sorted(os.path.join(self.directory, name) for name in names if name.endswith(extensions))
+
+    def _scan(self) -> Tuple:
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in self._files())
+
+    @staticmethod
+    def _read(path: str) -> Dict:
+        with open(path, encoding="utf-8") as handle:
+            if path.endswith(".json"): return json.load(handle)
+            yaml = _yaml()
+            try:
+                return yaml.safe_load(handle)
+            except yaml.YAMLError as e:
+                raise ValueError(str(e))
+
+    def load(self) -> int:
+        with self._lock:
+            signature = self._scan()
+            systems = {}
+            for path, *_ in signature:
+                try:
+                    schema = SystemSchema.from_dict(self._read(path))
+                    if schema.key in systems: raise ValueError(f"sistema '{schema.name}' repetido.")
+                except ValueError as e:
+                    # Com uma versão anterior carregada, só tenta de novo quando algum arquivo mudar outra vez
+                    if self._systems: self._signature = signature
+                    raise ValueError(f"{os.path.basename(path)}: {e}")
+                systems[schema.key] = schema
+            # Troca o dict inteiro de uma vez: leituras concorrentes veem a versão antiga ou a nova, nunca metade
+            self._systems, self._signature = systems, signature
+            self.version += 1
+            return len(systems)
+
+    def reload_if_changed(self) -> bool:
+        if self._signature is not None and self._scan() == self._signature: return False
+        self.load()
+        return True
+
+    def get(self, name: str) -> Optional[SystemSchema]:
+        if self._signature is None: self.load()
+        return self._systems.get(name.lower())
+
+    def names(self) -> List[str]:
+        if self._signature is None: self.load()
+        return [schema.name for schema in self._systems.values()]
+
+
+registry = SystemRegistry()
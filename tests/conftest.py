@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+# O gateway falso dos benchmarks roda os comandos do cog sem conectar ao Discord
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+if BENCHMARKS not in sys.path: sys.path.insert(1, BENCHMARKS)
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    # Banco vazio num diretório temporário; os testes nunca tocam o rpg_data.db do projeto
+    previous = database.DB_NAME
+    database.DB_NAME = str(tmp_path / "test.db")
+    database.clear_caches()
+    try:
+        yield database.DB_NAME
+    finally:
+        database.close_pools()
+        database.clear_caches()
+        database.DB_NAME = previous
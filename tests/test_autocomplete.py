@@ -0,0 +1,27 @@
+import asyncio
+from types import SimpleNamespace
+
+import database
+from cogs.rpg_commands import complete_characters
+from fake_gateway import FakeChannel, FakeGuild, FakeInteraction, FakeMember
+
+
+def _autocomplete(user: FakeMember, **options) -> SimpleNamespace:
+    return SimpleNamespace(interaction=FakeInteraction(user, FakeChannel(99, user.guild)), options=options, value="")
+
+
+def _names(user: FakeMember, **options) -> list:
+    return asyncio.run(complete_characters(_autocomplete(user, sistema="tormenta20", campanha="mesa", **options)))
+
+
+def test_only_masters_see_other_members_characters(db_path):
+    guild, elsewhere = FakeGuild(1), FakeGuild(2)
+    master, player, outsider = FakeMember(1, guild, master=True), FakeMember(2, guild), FakeMember(3, elsewhere)
+    database.setup_database()
+    for user in (master, player, outsider):
+        database.create_character_sheet(user.id, "tormenta20", "mesa", f"heroi {user.id}", {"pv": "10"})
+
+    assert _names(master, jogador=str(player.id)) == ["heroi 2"]
+    # Sem a permissão de mestre, ou para alguém de outro servidor, sugere as próprias fichas
+    assert _names(player, jogador=str(master.id)) == ["heroi 2"]
+    assert _names(master, jogador=str(outsider.id)) == ["heroi 1"]
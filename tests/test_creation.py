@@ -0,0 +1,43 @@
+import asyncio
+
+import repository
+from cogs.rpg_commands import RPGCog
+from fake_gateway import FakeChannel, FakeContext, FakeGuild, FakeInteraction, FakeMember, invoke, load_cog, \
+    submit_modal
+
+
+def _last_view(interaction: FakeInteraction):
+    return next(sent.kwargs["view"] for sent in reversed(interaction.sent) if "view" in sent.kwargs)
+
+
+async def _create_with_invalid_value():
+    cog = load_cog(RPGCog)
+    guild = FakeGuild(1)
+    member, channel = FakeMember(10, guild), FakeChannel(20, guild)
+    ctx = FakeContext(FakeInteraction(member, channel))
+    await invoke(cog, cog.criar, ctx, system="Ordem Paranormal", campaign="mesa")
+    part_one = FakeInteraction(member, channel)
+    await submit_modal(ctx.sent[0].kwargs["modal"], part_one,
+                       {"Nome": "Arthur", "Classe": "Combatente", "Origem": "Policial", "Pv": "muito",
+                        "Sanidade": "20"})
+    # PV foi recusado: o botão reabre o formulário a partir dele, ainda na parte 1
+    button = FakeInteraction(member, channel)
+    await _last_view(part_one).open_form.callback(button)
+    modal = button.sent[0].kwargs["modal"]
+    assert [item.label for item in modal.children] == ["Pv", "Pe", "Força", "Agilidade", "Intelecto"]
+    await submit_modal(modal, FakeInteraction(member, channel),
+                       {"Pv": "30", "Pe": "5", "Força": "2", "Agilidade": "1", "Intelecto": "3"})
+    return cog.creation.get(member.id, channel.id), await repository.load_creation_drafts()
+
+
+def test_form_after_rejected_value_keeps_accepted_answers(db_path):
+    repository.start()
+    try:
+        session, drafts = asyncio.run(_create_with_invalid_value())
+    finally:
+        repository.shutdown()
+    expected = {"nome": "Arthur", "classe": "Combatente", "origem": "Policial", "sanidade": "20", "pv": "30",
+                "pe": "5", "força": "2", "agilidade": "1", "intelecto": "3"}
+    assert session.data == expected
+    assert session.pending() == "Presença"
+    assert [draft["data"] for draft in drafts] == [expected]
@@ -0,0 +1,33 @@
+import sqlite3
+
+import database
+
+
+def _database_at(path: str, migration) -> sqlite3.Connection:
+    # Banco parado logo antes da migração informada, como um bot antigo o deixaria
+    conn = sqlite3.connect(path)
+    version = database.MIGRATIONS.index(migration)
+    for step in database.MIGRATIONS[:version]: step(conn.cursor())
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    return conn
+
+
+def test_lookup_indexes_renames_npcs_that_differ_only_by_case(db_path, capsys):
+    conn = _database_at(db_path, database._migration_lookup_indexes)
+    conn.executemany("INSERT INTO npcs (id, user_id, name, stats) VALUES (?, ?, ?, '{}')",
+                     [(1, 7, "Goblin"), (2, 7, "goblin"), (3, 7, "GOBLIN"), (4, 8, "goblin"), (5, 7, "Orc")])
+    conn.commit()
+    conn.close()
+
+    database.setup_database()
+
+    with database.connect() as conn:
+        names = dict(conn.execute("SELECT id, name FROM npcs"))
+    assert names == {1: "Goblin", 2: "goblin (2)", 3: "GOBLIN (3)", 4: "goblin", 5: "Orc"}
+    assert database.get_npc(7, "goblin")["name"] == "Goblin"
+    assert database.get_npc(7, "goblin (2)")["name"] == "goblin (2)"
+    report = capsys.readouterr().err
+    assert "NPC 2 do usuário 7 renomeado de 'goblin' para 'goblin (2)'" in report
+    assert "NPC 3 do usuário 7 renomeado de 'GOBLIN' para 'GOBLIN (3)'" in report
+    assert "NPC 4" not in report and "NPC 5" not in report
@@ -0,0 +1,55 @@
+import asyncio
+
+from common import statement_counter
+
+import database
+import pages
+
+
+def _statements(char_id: int, render) -> int:
+    with statement_counter() as counts:
+        # Abre a conexão do shard antes: o PRAGMA e a checagem de migração da abertura não contam
+        with database.connect(database.get_router().for_character(char_id)): pass
+        opened = counts["statements"]
+        render()
+    return counts["statements"] - opened
+
+
+def _character_with_items(count: int) -> int:
+    database.setup_database()
+    database.create_character_sheet(1, "tormenta20", "mesa", "heroi", {"pv": "10"})
+    char_id = database.find_character_id(1, "tormenta20", "mesa", "heroi")
+    for item in range(count): database.add_item(char_id, f"Item {item:02d}", 1, "descrição")
+    database.apply_effect(char_id, "Envenenado", 3, 1)
+    database.clear_caches()
+    return char_id
+
+
+def test_inventory_page_is_one_round_trip(db_path):
+    char_id = _character_with_items(pages.INVENTORY_PAGE_SIZE + 2)
+
+    # Ficha, efeitos, a página e o total vêm da mesma consulta
+    assert _statements(char_id, lambda: asyncio.run(pages.inventory_page(char_id, 2))) == 1
+    embed, total_pages = asyncio.run(pages.inventory_page(char_id, 2))
+    assert total_pages == 2
+    assert [field.name for field in embed.fields] == ["💰 Dinheiro", "Item 10 (x1)", "Item 11 (x1)", "🌀 Efeitos"]
+
+
+def test_sheet_page_is_one_round_trip(db_path):
+    char_id = _character_with_items(3)
+
+    assert _statements(char_id, lambda: asyncio.run(pages.sheet_page(char_id))) == 1
+    embed, _ = asyncio.run(pages.sheet_page(char_id))
+    assert [field.name for field in embed.fields] == ["💰 Dinheiro", "Pv", "🌀 Efeitos"]
+
+
+def test_inventory_page_past_the_end_shows_the_last_page(db_path):
+    char_id = _character_with_items(pages.INVENTORY_PAGE_SIZE + 2)
+    asyncio.run(pages.inventory_page(char_id, 2))
+    database.remove_item(char_id, "Item 11", 1)
+    database.remove_item(char_id, "Item 10", 1)
+
+    embed, total_pages = asyncio.run(pages.inventory_page(char_id, 2))
+
+    assert total_pages == 1
+    assert [field.name for field in embed.fields][1:3] == ["Item 00 (x1)", "Item 01 (x1)"]
@@ -0,0 +1,18 @@
+import time
+
+import database
+
+
+def test_idle_sweep_keeps_the_pool_being_requested(db_path, monkeypatch):
+    monkeypatch.setattr(database, "SHARD_COUNT", 2)
+    shard = database.get_router().path(1)
+    idle = database.get_pool(shard)
+    # O shard ficou parado mais que o limite, e o próprio pedido por ele dispara a varredura
+    past = time.monotonic() - database.SHARD_IDLE_TIMEOUT - 1
+    idle.last_used = past
+    monkeypatch.setattr(database, "_last_sweep", past)
+
+    pool = database.get_pool(shard)
+
+    assert pool is idle and not pool._closed
+    with database.connect(1) as conn: assert conn.execute("SELECT 1").fetchone() == (1,)
@@ -0,0 +1,34 @@
+import asyncio
+
+import database
+import repository
+
+
+async def _queue_money_with_failing_first_flush(char_id: int, monkeypatch):
+    apply = database.apply_queued_writes
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1: raise RuntimeError("disco cheio")
+        return apply(*args)
+
+    monkeypatch.setattr(database, "apply_queued_writes", flaky)
+    await repository.modify_money(char_id, 15)
+    await asyncio.sleep(0.2)
+    return len(calls)
+
+
+def test_failed_timer_flush_is_retried(db_path, monkeypatch, capsys):
+    database.setup_database()
+    database.create_character_sheet(1, "tormenta20", "mesa", "heroi", {"pv": "10"})
+    char_id = database.find_character_id(1, "tormenta20", "mesa", "heroi")
+    repository.enable_write_behind(interval=0.02)
+    try:
+        attempts = asyncio.run(_queue_money_with_failing_first_flush(char_id, monkeypatch))
+    finally:
+        repository.disable_write_behind()
+        repository.shutdown()
+    assert attempts == 2
+    assert "disco cheio" in capsys.readouterr().err
+    assert database.get_character_sheet(char_id)["money"] == 15
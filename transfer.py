@@ -0,0 +1,262 @@
+"""Importação e exportação em lote de personagens e NPCs (NDJSON ou CSV).
+
+Uso:
+    python transfer.py export saida.ndjson [--db rpg_data.db] [--system S] [--campaign C] [--format csv]
+    python transfer.py import entrada.ndjson [--db rpg_data.db] [--format csv] [--chunk-size 1000]
+"""
+import contextlib
+import csv
+import io
+import itertools
+import json
+import sys
+import tempfile
+from typing import BinaryIO, Collection, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+import database
+
+CHUNK_SIZE = 1000
+FORMATS = ("ndjson", "csv")
+
+# Uma linha do CSV por personagem/NPC e mais uma por atributo, item, efeito ou status de NPC
+CSV_COLUMNS = ["record", "user_id", "system", "campaign", "name", "money", "key", "value", "quantity",
+               "description", "duration", "caster_id"]
+
+
+# Exportação
+def export_records(system: Optional[str] = None, campaign: Optional[str] = None,
+                   npc_user_id: Optional[int] = None, include_npcs: bool = True,
+                   user_ids: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+    for record in database.iter_characters(system, campaign, user_ids):
+        yield dict(record, type="character")
+    if include_npcs:
+        for record in database.iter_npcs(npc_user_id):
+            yield dict(record, type="npc")
+
+
+def write_ndjson(records: Iterable[Dict], out: TextIO) -> int:
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(records: Iterable[Dict], out: TextIO) -> int:
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        for row in _flatten(record): writer.writerow(row)
+        count += 1
+    return count
+
+
+def _flatten(record: Dict) -> Iterator[Dict]:
+    if record["type"] == "npc":
+        yield {"record": "npc", "user_id": record["user_id"], "name": record["name"]}
+        for key, value in record["stats"].items(): yield {"record": "npc_stat", "key": key, "value": value}
+        return
+    yield {"record": "character", "user_id": record["user_id"], "system": record["system"],
+           "campaign": record["campaign"], "name": record["character_name"], "money": record["money"]}
+    for key, value in record["attributes"].items(): yield {"record": "attribute", "key": key, "value": value}
+    for item in record["inventory"]:
+        yield {"record": "item", "key": item["item_name"], "quantity": item["quantity"],
+               "description": item["description"]}
+    for effect in record["effects"]:
+        yield {"record": "effect", "key": effect["effect_name"], "duration": effect["duration"],
+               "caster_id": effect["caster_id"]}
+
+
+def export_to(out: TextIO, fmt: str = "ndjson", **filters) -> int:
+    writer = write_csv if fmt == "csv" else write_ndjson
+    return writer(export_records(**filters), out)
+
+
+def export_to_tempfile(fmt: str = "ndjson", **filters) -> Tuple[BinaryIO, int]:
+    # Arquivo temporário em disco para anexar no Discord sem montar tudo em memória
+    handle = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(handle, encoding="utf-8", newline="")
+    count = export_to(text, fmt, **filters)
+    text.flush()
+    text.detach()
+    handle.seek(0)
+    return handle, count
+
+
+# Importação
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_text_map(value) -> bool:
+    return isinstance(value, dict) and all(isinstance(k, str) and isinstance(v, str) for k, v in value.items())
+
+
+def _record_error(record) -> Optional[str]:
+    # Confere os tipos de um registro já lido; None quando ele pode ir para o banco
+    if not isinstance(record, dict): return "o registro precisa ser um objeto"
+    if not _is_int(record.get("user_id")): return "'user_id' precisa ser um número inteiro"
+    kind = record.get("type", "character")
+    if kind == "npc":
+        if not isinstance(record.get("name"), str) or not record["name"]: return "NPC sem 'name'"
+        if not _is_text_map(record.get("stats", {})): return "'stats' precisa mapear nomes para textos"
+        return None
+    if kind != "character": return f"tipo de registro desconhecido: {kind!r}"
+    for key in ("system", "campaign", "character_name"):
+        if not isinstance(record.get(key), str) or not record[key]: return f"personagem sem '{key}'"
+    money = record.get("money")
+    if money is not None and (isinstance(money, bool) or not isinstance(money, (int, float))):
+        return "'money' precisa ser um número"
+    if not _is_text_map(record.get("attributes", {})): return "'attributes' precisa mapear nomes para textos"
+    inventory, effects = record.get("inventory", []), record.get("effects", [])
+    if not isinstance(inventory, list) or not all(
+            isinstance(item, dict) and isinstance(item.get("item_name"), str) and _is_int(item.get("quantity", 1))
+            and isinstance(item.get("description"), (str, type(None))) for item in inventory):
+        return "'inventory' precisa ser uma lista de itens com 'item_name' e 'quantity' inteira"
+    if not isinstance(effects, list) or not all(
+            isinstance(effect, dict) and isinstance(effect.get("effect_name"), str)
+            and _is_int(effect.get("duration")) and _is_int(effect.get("caster_id", 0)) for effect in effects):
+        return "'effects' precisa ser uma lista de efeitos com 'effect_name' e 'duration' inteira"
+    return None
+
+
+def read_ndjson(source: TextIO) -> Iterator[Dict]:
+    for number, line in enumerate(source, start=1):
+        if not line.strip(): continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError(f"Linha {number} não é um JSON válido.")
+        error = _record_error(record)
+        if error: raise ValueError(f"Linha {number}: {error}.")
+        yield record
+
+
+def _csv_number(row: Dict, key: str, convert, number: int, default=None):
+    value = row.get(key) or default
+    if value is None: raise ValueError(f"Linha {number}: '{key}' vazio.")
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"Linha {number}: '{key}' precisa ser um número, não {value!r}.")
+
+
+def read_csv(source: TextIO) -> Iterator[Dict]:
+    # Reagrupa as linhas filhas sob o personagem/NPC que as precede
+    current, start = None, 0
+    reader = csv.DictReader(source)
+    for row in reader:
+        kind, number = row.get("record"), reader.line_num
+        if kind in ("character", "npc"):
+            if current: yield _checked(current, start)
+            user_id, start = _csv_number(row, "user_id", int, number), number
+            if kind == "npc":
+                current = {"type": "npc", "user_id": user_id, "name": row.get("name"), "stats": {}}
+            else:
+                current = {"type": "character", "user_id": user_id, "system": row.get("system"),
+                           "campaign": row.get("campaign"), "character_name": row.get("name"),
+                           "money": _csv_number(row, "money", float, number, 0), "attributes": {},
+                           "inventory": [], "effects": []}
+        elif current is None:
+            raise ValueError(f"Linha {number}: '{kind}' sem personagem ou NPC antes dela.")
+        elif kind == "npc_stat":
+            current["stats"][row.get("key") or ""] = row.get("value") or ""
+        elif kind == "attribute":
+            current["attributes"][row.get("key") or ""] = row.get("value") or ""
+        elif kind == "item":
+            current["inventory"].append({"item_name": row.get("key") or "",
+                                         "quantity": _csv_number(row, "quantity", int, number, 1),
+                                         "description": row.get("description")})
+        elif kind == "effect":
+            current["effects"].append({"effect_name": row.get("key") or "",
+                                       "duration": _csv_number(row, "duration", int, number),
+                                       "caster_id": _csv_number(row, "caster_id", int, number, 0)})
+        else:
+            raise ValueError(f"Linha {number}: tipo de linha desconhecido: '{kind}'.")
+    if current: yield _checked(current, start)
+
+
+def _checked(record: Dict, number: int) -> Dict:
+    error = _record_error(record)
+    if error: raise ValueError(f"Linha {number}: {error}.")
+    return record
+
+
+def import_records(records: Iterable[Dict], chunk_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    # Cada bloco é uma transação; só um bloco fica em memória por vez
+    stats = {"characters": 0, "npcs": 0, "skipped": 0}
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk: break
+        characters = [r for r in chunk if r.get("type", "character") == "character"]
+        npcs = [r for r in chunk if r.get("type") == "npc"]
+        if characters:
+            imported, skipped = database.import_characters(characters)
+            stats["characters"] += imported
+            stats["skipped"] += skipped
+        if npcs:
+            imported, skipped = database.import_npcs(npcs)
+            stats["npcs"] += imported
+            stats["skipped"] += skipped
+    return stats
+
+
+def import_from(source: TextIO, fmt: str = "ndjson", chunk_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    reader = read_csv if fmt == "csv" else read_ndjson
+    return import_records(reader(source), chunk_size)
+
+
+def import_bytes(data: bytes, fmt: str = "ndjson", chunk_size: int = CHUNK_SIZE,
+                 user_ids: Optional[Collection[int]] = None) -> Dict[str, int]:
+    # Com user_ids (os membros do servidor), o arquivo inteiro é conferido antes de gravar qualquer bloco:
+    # um registro de tipo errado ou de alguém de fora recusa a importação toda
+    def source() -> TextIO:
+        return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="")
+
+    reader = read_csv if fmt == "csv" else read_ndjson
+    if user_ids is not None:
+        for position, record in enumerate(reader(source()), start=1):
+            if record["user_id"] not in user_ids:
+                raise ValueError(f"Registro {position}: o usuário {record['user_id']} não é membro deste servidor.")
+    return import_records(reader(source()), chunk_size)
+
+
+def main(argv=None) -> int:
+    import argparse  # só a linha de comando usa; o bot importa este módulo na inicialização
+
+    parser = argparse.ArgumentParser(description="Importa/exporta personagens e NPCs do banco do bot.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Arquivo de entrada/saída ('-' para stdin/stdout)")
+    parser.add_argument("--db", default=database.DB_NAME)
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--system")
+    parser.add_argument("--campaign")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    database.DB_NAME = args.db
+    database.setup_database()
+    try:
+        if args.action == "export":
+            out = contextlib.nullcontext(sys.stdout) if args.path == "-" else \
+                open(args.path, "w", encoding="utf-8", newline="")
+            with out as out:
+                count = export_to(out, fmt, system=args.system, campaign=args.campaign)
+            print(f"{count} registros exportados.", file=sys.stderr)
+        else:
+            source = contextlib.nullcontext(sys.stdin) if args.path == "-" else \
+                open(args.path, encoding="utf-8", newline="")
+            with source as source:
+                stats = import_from(source, fmt, args.chunk_size)
+            print(f"{stats['characters']} personagens e {stats['npcs']} NPCs importados, "
+                  f"{stats['skipped']} já existentes ignorados.", file=sys.stderr)
+    finally:
+        database.close_pools()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import database
+
+FLUSH_INTERVAL = 0.5  # segundos entre a primeira escrita pendente e a gravação
+MAX_PENDING = 64  # operações recebidas que disparam a gravação na hora
+
+
+# Identidade para ("add", (delta, mínimo, máximo)): soma zero, sem limites
+NO_CHANGE = (0, -math.inf, math.inf)
+
+
+# Escritas pendentes de uma ficha, já fundidas
+class PendingWrites:
+    __slots__ = ("money", "attributes", "effects")
+
+    def __init__(self):
+        self.money = 0.0
+        # nome -> ("set", valor) ou ("add", (delta, mínimo, máximo)), isto é, x -> clamp(x + delta, mínimo, máximo)
+        self.attributes: Dict[str, Tuple[str, object]] = {}
+        self.effects: List[Tuple[str, int, int]] = []
+
+    def set_attribute(self, name: str, value: str):
+        self.attributes[name] = ("set", value)
+
+    def add_attribute(self, name: str, delta: float, minimum: Optional[float] = None,
+                      maximum: Optional[float] = None):
+        kind, current = self.attributes.get(name, ("add", NO_CHANGE))
+        if kind == "add":
+            # Somar e limitar duas vezes ainda é somar e limitar uma vez: dano e cura com teto/piso se fundem
+            # sem mudar o resultado (clamp(clamp(x + a, L1, H1) + b, L2, H2) = clamp(x + a + b, L, H))
+            total, low, high = current
+            self.attributes[name] = ("add", (total + delta, database.clamp(low + delta, minimum, maximum),
+                                             database.clamp(high + delta, minimum, maximum)))
+        else:
+            # Um valor fixo seguido de dano vira o valor final; texto não numérico ignora o dano, como no banco
+            total = database.add_number(current, delta, minimum, maximum)
+            if total is not None: self.attributes[name] = ("set", total)
+
+    def merge(self, later: "PendingWrites"):
+        self.money += later.money
+        for name, (kind, value) in later.attributes.items():
+            if kind == "set":
+                self.set_attribute(name, value)
+                continue
+            delta, low, high = value
+            self.add_attribute(name, delta, low, high)
+        self.effects.extend(later.effects)
+
+
+# Fila write-behind para as mutações frequentes de combate (dinheiro, dano/cura, efeitos).
+# Tudo que está pendente é gravado numa única transação; leituras de uma ficha gravam antes as pendências dela.
+class WriteBehindQueue:
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self._pending: Dict[int, PendingWrites] = {}
+        self._received = 0
+        self._lock = threading.Lock()
+        # Serializa as gravações: quem pede um flush espera a gravação em andamento terminar
+        self._flush_lock = threading.Lock()
+        self.operations = self.flushes = 0
+
+    def __len__(self) -> int:
+        return self._received
+
+    def _enqueue(self, char_id: int) -> PendingWrites:
+        self._received += 1
+        self.operations += 1
+        return self._pending.setdefault(char_id, PendingWrites())
+
+    # Retornam True quando a fila atingiu o limite e deve ser gravada já
+    def modify_money(self, char_id: int, amount: float) -> bool:
+        with self._lock:
+            self._enqueue(char_id).money += amount
+            return self._received >= self.max_pending
+
+    def update_attribute(self, char_id: int, attr_name: str, new_value: str) -> bool:
+        with self._lock:
+            self._enqueue(char_id).set_attribute(attr_name.lower(), new_value)
+            return self._received >= self.max_pending
+
+    def adjust_attribute(self, char_id: int, attr_name: str, delta: float, minimum: Optional[float] = None,
+                         maximum: Optional[float] = None) -> bool:
+        with self._lock:
+            self._enqueue(char_id).add_attribute(attr_name.lower(), delta, minimum, maximum)
+            return self._received >= self.max_pending
+
+    def apply_effect(self, char_id: int, effect_name: str, duration: int, caster_id: int) -> bool:
+        with self._lock:
+            self._enqueue(char_id).effects.append((effect_name, duration, caster_id))
+            return self._received >= self.max_pending
+
+    def has_pending(self, char_ids: Optional[Iterable[int]] = None) -> bool:
+        with self._lock:
+            if char_ids is None: return bool(self._pending)
+            return any(char_id in self._pending for char_id in char_ids)
+
+    def flush(self, char_ids: Optional[Iterable[int]] = None) -> int:
+        # Sem char_ids grava tudo; retorna quantas fichas foram gravadas
+        with self._flush_lock:
+            with self._lock:
+                keys = list(self._pending) if char_ids is None else [c for c in char_ids if c in self._pending]
+                batch = {char_id: self._pending.pop(char_id) for char_id in keys}
+                if not self._pending: self._received = 0
+            if not batch: return 0
+            try:
+                database.apply_queued_writes(
+                    {char_id: writes.money for char_id, writes in batch.items()},
+                    [(char_id, name, kind, value)
+                     for char_id, writes in batch.items() for name, (kind, value) in writes.attributes.items()],
+                    [(char_id, *effect) for char_id, writes in batch.items() for effect in writes.effects])
+            except Exception:
+                # Devolve as escritas à fila, antes das que chegaram durante a tentativa
+                with self._lock:
+                    for char_id, writes in batch.items():
+                        later = self._pending.get(char_id)
+                        if later: writes.merge(later)
+                        self._pending[char_id] = writes
+                    # Sem isso a fila pareceria vazia (len 0) e repository.flush nem tentaria de novo
+                    self._received += len(batch)
+                raise
+            self.flushes += 1
+            return len(batch)